@@ -48,7 +48,8 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'author.backends.AuthenticationMiddleware',  # 与Django的认证中间件相同，另外处理其他进程修改密码后缓存的旧用户
+    'blog.ratelimit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -137,6 +138,87 @@ MEDIA_ROOT = BASE_DIR / 'media'
 FILE_UPLOAD_PERMISSIONS = 0o644
 DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
 
+# 博客浏览量缓冲计数配置
+BLOG_VIEW_COUNTER_CACHE = 'default'  # 计数使用的缓存，多进程部署时请配置为Redis等共享缓存
+BLOG_VIEW_DEDUP_WINDOW = 60 * 30  # 同一访客在该时间窗口（秒）内重复访问只计一次
+# 后台线程写回数据库的间隔（秒），使用共享缓存并通过定时任务执行flush_view_counts命令时可设置为0
+BLOG_VIEW_COUNTER_FLUSH_INTERVAL = 60
+
+# 点赞分片计数配置：大于0时点赞增量写入随机分片行，需定时执行fold_like_shards命令合并回likes_count
+BLOG_LIKE_COUNTER_SHARDS = 0
+BLOG_LIKE_COUNTER_CACHE_TTL = 5  # 分片合计的缓存时间（秒）
+
+# 匿名访客整页缓存的过期时间（秒），设置为0关闭整页缓存
+BLOG_PAGE_CACHE_TIMEOUT = 60
+
+# 站内搜索配置：标题中词频的权重、一次搜索最多返回的结果数量，以及搜索结果的缓存时间（秒，0为不缓存）
+BLOG_SEARCH_TITLE_BOOST = 3.0
+BLOG_SEARCH_MAX_RESULTS = 1000
+BLOG_SEARCH_CACHE_TIMEOUT = 300
+
+# 搜索框输入提示配置：每个进程中前缀索引的内存预算（字节），以及整体重新加载的间隔（秒）
+BLOG_AUTOCOMPLETE_MEMORY_BUDGET = 16 * 1024 * 1024
+BLOG_AUTOCOMPLETE_RELOAD_INTERVAL = 600
+
+# 编辑器上传图片的派生图配置：缩放宽度、<img>的sizes属性（详情页正文区域的最大宽度）以及后台生成线程数量
+BLOG_IMAGE_WIDTHS = (320, 640, 1280, 1920)
+BLOG_IMAGE_SIZES = '(max-width: 1400px) 100vw, 1224px'
+BLOG_IMAGE_WORKERS = 2
+
+# 按内容摘要命名的上传文件（内容不会改变）的浏览器缓存时间（秒）
+BLOG_IMMUTABLE_MEDIA_MAX_AGE = 365 * 24 * 3600
+# 编辑器上传的图片不再被任何博客正文引用时删除；该时间（秒）内上传过的图片可能正被编辑中的博客使用，
+# 暂不删除，之后由gc_orphan_uploads清理
+BLOG_UPLOAD_GRACE_PERIOD = 24 * 3600
+
+# 分片上传：单个文件的最大大小、每个分片的最大大小、临时文件目录（None时使用系统临时目录，
+# 与MEDIA_ROOT位于同一文件系统时，完成上传后临时文件直接移动到存储位置），以及未完成的上传保留多久
+BLOG_CHUNKED_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+BLOG_CHUNKED_UPLOAD_CHUNK_SIZE = 1024 * 1024
+BLOG_CHUNKED_UPLOAD_DIR = None
+BLOG_CHUNKED_UPLOAD_EXPIRE = 24 * 3600
+
+# 会话保存在缓存中并同步写入数据库（缓存被清空时从数据库读取），已登录的请求读取会话不再查询数据库；
+# 会话只在内容变化时写入，不在每个请求都保存
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default'  # 多进程部署时请配置为Redis等共享缓存，否则退出登录后其他进程中缓存的会话仍然有效
+SESSION_SAVE_EVERY_REQUEST = False
+
+# 认证后端：按邮箱登录（auth_user上有邮箱的唯一索引），并缓存 request.user（连同用户资料），用户或资料保存时删除缓存；
+# 保留ModelBackend，使用它登录的已有会话仍然有效（不经过缓存，重新登录后改用EmailBackend）
+AUTHENTICATION_BACKENDS = ['author.backends.EmailBackend', 'django.contrib.auth.backends.ModelBackend']
+BLOG_USER_CACHE = 'default'  # 多进程部署时请配置为Redis等共享缓存，否则其他进程中的缓存要到过期才会更新
+BLOG_USER_CACHE_TIMEOUT = 300
+
+# 写接口和登录的频率限制（只限制POST等修改数据的请求），按URL名称配置：
+# user按登录用户计数（未登录时按IP），ip按客户端IP计数；频率写作 次数/时间，如 '5/m'、'100/h'、'10/30s'
+BLOG_RATE_LIMIT_CACHE = 'default'  # 计数使用的缓存，多进程部署时请配置为Redis等共享缓存
+BLOG_RATE_LIMITS = {
+    'author:send_email_captcha': {'ip': '5/m'},
+    'author:login': {'ip': '10/m'},
+    'blog:comment_blog': {'user': '10/m'},
+    'blog:like_blog': {'user': '60/m'},
+    'blog:like_comment': {'user': '60/m'},
+    'blog:upload_image': {'user': '30/m'},
+    'blog:chunked_upload_init': {'user': '30/m'},
+    # 每个分片一个PUT请求，20MB的文件按1MB分片需要20个请求
+    'blog:chunked_upload_chunk': {'user': '300/m'},
+    'blog:chunked_upload_finalize': {'user': '30/m'},
+}
+
+# 邮箱验证码：使用的缓存（多进程部署时请配置为Redis等共享缓存，没有共享缓存时设置为None改用数据库保存），
+# 有效期（秒），以及允许输错的次数
+BLOG_CAPTCHA_CACHE = 'default'
+BLOG_CAPTCHA_TTL = 10 * 60
+BLOG_CAPTCHA_MAX_ATTEMPTS = 5
+
+# 邮件发件箱：每个SMTP连接发送的邮件数量、最多尝试次数、首次重试间隔（秒，之后每次翻倍），
+# 以及是否在Web进程的后台线程中发送（关闭时需要运行 send_outbox_emails --loop 作为发送进程）
+BLOG_EMAIL_OUTBOX_BATCH_SIZE = 50
+BLOG_EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+BLOG_EMAIL_OUTBOX_RETRY_DELAY = 30
+BLOG_EMAIL_OUTBOX_DRAIN_IN_PROCESS = True
+
 # 设置上传文件的最大大小（10MB）
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
 
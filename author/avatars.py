@@ -0,0 +1,67 @@
+"""
+头像缩略图：上传头像时按模板中实际显示的尺寸裁剪成正方形，并为高分屏生成2倍尺寸。
+
+缩略图的文件名由原图推导（x.jpg -> x_s36.webp），已生成的尺寸记录在 UserProfile.avatar_variants 中，
+渲染时无需检查文件是否存在；没有合适尺寸的缩略图时退回原图。
+"""
+import io
+import posixpath
+from functools import lru_cache
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+# 模板中头像的显示尺寸：回复24、导航栏和首页卡片32、评论和文章作者36、作者信息60、个人主页120
+AVATAR_SIZES = (24, 32, 36, 60, 120)
+DEFAULT_AVATAR = 'avatars/default.png'
+WEBP_QUALITY = 85
+
+
+def variant_sizes() -> list:
+    """需要生成的所有尺寸（1倍和2倍）"""
+    return sorted({scale * size for size in AVATAR_SIZES for scale in (1, 2)})
+
+
+def variant_name(name, size) -> str:
+    stem = posixpath.splitext(name)[0]
+    return f'{stem}_s{size}.webp'
+
+
+def generate(name) -> list:
+    """
+    为头像生成正方形缩略图，已存在的文件会被覆盖
+    :param name: 头像在存储中的文件名
+    :return: 生成的尺寸列表，不超过原图的短边（不放大）
+    """
+    from PIL import Image, ImageOps
+
+    with default_storage.open(name) as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        sizes = [size for size in variant_sizes() if size <= min(image.size)]
+        for size in sizes:
+            thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, 'WEBP', quality=WEBP_QUALITY)
+            output_name = variant_name(name, size)
+            if default_storage.exists(output_name):
+                default_storage.delete(output_name)
+            default_storage.save(output_name, ContentFile(buffer.getvalue()))
+    return sizes
+
+
+def delete_variants(name, sizes):
+    """删除旧头像的缩略图"""
+    for size in sizes or ():
+        default_storage.delete(variant_name(name, size))
+
+
+@lru_cache(maxsize=1)
+def default_variants() -> list:
+    """默认头像由所有新用户共享，缩略图由backfill_avatar_variants命令生成，每个进程只检查一次"""
+    return [size for size in variant_sizes() if default_storage.exists(variant_name(DEFAULT_AVATAR, size))]
+
+
+def pick(variants, size):
+    """不小于显示尺寸的最小缩略图，没有时返回None"""
+    return min((variant for variant in variants if variant >= size), default=None)
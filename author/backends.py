@@ -0,0 +1,119 @@
+"""
+认证后端：按邮箱登录，并缓存每个已登录请求的 request.user。
+
+AuthenticationMiddleware 每个请求都会调用 get_user 加载 request.user，默认每次都查询 auth_user。
+这里把用户（连同用于导航栏头像的 UserProfile）缓存一段时间，用户或资料保存、删除时由 author/signals.py 删除缓存，
+修改密码后会话校验使用的是新的密码摘要。
+BLOG_USER_CACHE 为进程内缓存时，修改密码只删除了处理该请求的进程中的缓存；AuthenticationMiddleware 在会话中的
+密码摘要与缓存的用户不一致时改从数据库加载，修改密码后的新会话不会被其他进程中的旧缓存登出。
+其他设备上的旧会话要等其他进程的缓存过期（BLOG_USER_CACHE_TIMEOUT）才会失效，多进程部署时请使用共享缓存。
+
+按邮箱查找用户时使用 NULLIF(LOWER(email), '') 表达式，与迁移 0008 在 auth_user 上创建的唯一函数索引一致，
+查询走索引而不是全表扫描；没有填写邮箱的用户（email为空字符串）不参与唯一约束。
+"""
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.middleware import AuthenticationMiddleware as BaseAuthenticationMiddleware
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Func, UniqueConstraint
+from django.db.models.functions import Lower
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+UserModel = get_user_model()
+
+KEY_PREFIX = 'author:user'
+
+
+class EmptyToNull(Func):
+    """NULLIF(expr, '')，空字符串直接写在SQL中而不是作为参数，查询条件才能与索引表达式完全一致"""
+    template = "NULLIF(%(expressions)s, '')"
+
+
+# 邮箱的唯一索引，见迁移 0008_user_email_unique
+EMAIL_KEY = EmptyToNull(Lower('email'))
+EMAIL_UNIQUE_CONSTRAINT = UniqueConstraint(EMAIL_KEY, name='auth_user_email_key_uniq')
+
+
+def users_with_email(email):
+    """按邮箱（不区分大小写）查找用户，查询条件与唯一索引的表达式相同"""
+    return UserModel._default_manager.alias(email_key=EMAIL_KEY).filter(email_key=(email or '').lower())
+
+
+def get_cache():
+    return caches[getattr(settings, 'BLOG_USER_CACHE', 'default')]
+
+
+def _key(user_id):
+    return f'{KEY_PREFIX}:{user_id}'
+
+
+def invalidate(user_id):
+    """删除用户缓存；事务提交后再删除一次，防止并发请求在提交前把旧数据写回缓存"""
+    cache = get_cache()
+    cache.delete(_key(user_id))
+    transaction.on_commit(lambda: cache.delete(_key(user_id)))
+
+
+def evict_stale(request):
+    """会话中的密码摘要与缓存的用户不一致时（其他进程修改了密码）删除缓存，get_user 从数据库重新加载后再校验"""
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    user_id = request.session.get(SESSION_KEY)
+    if not session_hash or user_id is None:
+        return
+    cache = get_cache()
+    key = _key(UserModel._meta.pk.to_python(user_id))
+    user = cache.get(key)
+    if user is not None and not constant_time_compare(session_hash, user.get_session_auth_hash()):
+        cache.delete(key)
+
+
+def get_user(request):
+    if not hasattr(request, '_cached_user'):
+        evict_stale(request)
+        request._cached_user = auth.get_user(request)
+    return request._cached_user
+
+
+class AuthenticationMiddleware(BaseAuthenticationMiddleware):
+    """与Django的认证中间件相同，加载 request.user 之前先删除与会话中的密码摘要不一致的缓存用户"""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend 的认证逻辑不变，只为 get_user 增加缓存"""
+
+    def get_user(self, user_id):
+        cache = get_cache()
+        key = _key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = UserModel._default_manager.select_related('userprofile').filter(pk=user_id).first()
+            if user is None:
+                return None
+            cache.set(key, user, getattr(settings, 'BLOG_USER_CACHE_TIMEOUT', 300))
+        return user if self.user_can_authenticate(user) else None
+
+
+class EmailBackend(CachedModelBackend):
+    """按邮箱和密码登录；传入username时（如管理后台登录）与ModelBackend相同"""
+
+    def authenticate(self, request, username=None, password=None, email=None, **kwargs):
+        if email is None:
+            return super().authenticate(request, username=username, password=password, **kwargs)
+        if not email or password is None:
+            return None
+        user = users_with_email(email).first()
+        if user is None:
+            # 与用户存在时耗时相同，避免通过响应时间判断邮箱是否已注册
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,132 @@
+"""
+邮箱验证码的存储：默认保存在Django缓存中并设置过期时间，没有共享缓存的部署可以改为保存在 Captcha 表中。
+
+发送时只写入一次（缓存中验证码和错误次数用一次set_many写入），验证成功时删除验证码，
+只有删除成功的一次验证算作通过，同一个验证码不会被并发的两个请求重复使用；
+验证码错误次数达到上限后验证码作废，需要重新获取，防止穷举。
+缓存中的验证码到期后由缓存自动淘汰，占用的空间受缓存的容量上限约束；
+Captcha 表中过期的记录由 purge_captchas 命令分批删除。
+"""
+import random
+import string
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Captcha
+
+KEY_PREFIX = 'author:captcha'
+CAPTCHA_LENGTH = 6
+
+# 验证结果
+VALID = 'valid'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+
+
+def ttl() -> int:
+    return getattr(settings, 'BLOG_CAPTCHA_TTL', 600)
+
+
+def _max_attempts() -> int:
+    return getattr(settings, 'BLOG_CAPTCHA_MAX_ATTEMPTS', 5)
+
+
+def get_cache():
+    """验证码使用的缓存，BLOG_CAPTCHA_CACHE为None时返回None，使用数据库保存"""
+    alias = getattr(settings, 'BLOG_CAPTCHA_CACHE', 'default')
+    return caches[alias] if alias else None
+
+
+def _code_key(email):
+    return f'{KEY_PREFIX}:{email}:code'
+
+
+def _attempts_key(email):
+    return f'{KEY_PREFIX}:{email}:attempts'
+
+
+def generate() -> str:
+    return ''.join(random.sample(string.ascii_uppercase + string.digits, CAPTCHA_LENGTH))
+
+
+def issue(email) -> str:
+    """
+    为邮箱生成新的验证码，替换之前的验证码并重置错误次数
+    :return: 验证码
+    """
+    # 邮箱不区分大小写，与按邮箱登录一致；两种存储都按小写的邮箱保存
+    email = email.lower()
+    captcha = generate()
+    cache = get_cache()
+    if cache is not None:
+        cache.set_many({_code_key(email): captcha, _attempts_key(email): 0}, timeout=ttl())
+    else:
+        Captcha.objects.update_or_create(
+            email=email, defaults={'captcha': captcha, 'attempts': 0, 'created_time': timezone.now()}
+        )
+    return captcha
+
+
+def verify(email, captcha) -> str:
+    """
+    验证并消耗验证码（验证码和邮箱都不区分大小写）
+    :return: VALID验证通过；INVALID验证码错误；EXPIRED验证码不存在、已过期或错误次数过多
+    """
+    email = email.lower()
+    captcha = (captcha or '').upper()
+    cache = get_cache()
+    if cache is not None:
+        return _verify_cache(cache, email, captcha)
+    return _verify_db(email, captcha)
+
+
+def _verify_cache(cache, email, captcha):
+    code_key = _code_key(email)
+    stored = cache.get(code_key)
+    if stored is None:
+        return EXPIRED
+    if stored == captcha:
+        # 删除成功的请求才算通过，并发的另一个请求删除失败
+        return VALID if cache.delete(code_key) else EXPIRED
+    try:
+        attempts = cache.incr(_attempts_key(email))
+    except ValueError:
+        attempts = _max_attempts()
+    if attempts >= _max_attempts():
+        cache.delete_many([code_key, _attempts_key(email)])
+        return EXPIRED
+    return INVALID
+
+
+def _verify_db(email, captcha):
+    valid_since = timezone.now() - timedelta(seconds=ttl())
+    deleted, _ = Captcha.objects.filter(email=email, captcha=captcha, created_time__gte=valid_since).delete()
+    if deleted:
+        return VALID
+    updated = Captcha.objects.filter(email=email, created_time__gte=valid_since).update(attempts=F('attempts') + 1)
+    if not updated:
+        return EXPIRED
+    if Captcha.objects.filter(email=email, attempts__gte=_max_attempts()).delete()[0]:
+        return EXPIRED
+    return INVALID
+
+
+def purge(chunk_size=1000, expired_only=True) -> int:
+    """
+    分批删除 Captcha 表中的记录，每批一次按主键删除，不长时间锁表
+    :param expired_only: 只删除已过期的记录；为False时删除所有记录（已改用缓存保存验证码时）
+    :return: 删除的记录数
+    """
+    queryset = Captcha.objects.all()
+    if expired_only:
+        queryset = queryset.filter(created_time__lt=timezone.now() - timedelta(seconds=ttl()))
+    total = 0
+    while True:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return total
+        total += Captcha.objects.filter(pk__in=ids).delete()[0]
@@ -1,9 +1,7 @@
 from django import forms
-from django.contrib.auth import get_user_model
 
-from .models import Captcha, UserProfile
-
-User = get_user_model()
+from . import backends, captcha_store
+from .models import UserProfile
 
 class RegisterForm(forms.Form):
     username = forms.CharField(
@@ -102,7 +100,7 @@ class UserProfileForm(forms.ModelForm):
     def clean_email(self):
         """验证注册邮箱是否已注册"""
         email = self.cleaned_data.get('email')
-        if User.objects.filter(email=email).exists():
+        if backends.users_with_email(email).exists():
             raise forms.ValidationError("该邮箱已被注册，请前往登录")
         return email
 
@@ -111,20 +109,15 @@ class UserProfileForm(forms.ModelForm):
         captcha = self.cleaned_data.get('captcha')
         email = self.cleaned_data.get('email')
 
-        # 添加更健壮的错误处理
         if not email:
             raise forms.ValidationError("请先填写邮箱")
-            
-        try:
-            captcha_obj = Captcha.objects.filter(email=email, captcha__iexact=captcha).first()
-            if not captcha_obj:
-                raise forms.ValidationError("验证码错误，请重新输入")
-            # 验证完成后删除验证码记录
-            captcha_obj.delete()
-        except Exception as e:
-            print(f"验证码验证异常: {str(e)}")
-            raise forms.ValidationError("验证码验证出错，请重试")
-        
+
+        # 验证通过后验证码被删除，不能重复使用
+        result = captcha_store.verify(email, captcha)
+        if result == captcha_store.EXPIRED:
+            raise forms.ValidationError("验证码已失效，请重新获取")
+        if result != captcha_store.VALID:
+            raise forms.ValidationError("验证码错误，请重新输入")
         return captcha
 
 class LoginForm(forms.Form):
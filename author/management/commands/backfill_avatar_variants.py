@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from author import avatars
+from author.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = '为已有头像生成各显示尺寸的缩略图，包括所有用户共享的默认头像'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200, help='每批处理的用户资料数量')
+        parser.add_argument('--only-missing', action='store_true', help='只处理尚未生成缩略图的头像')
+
+    def handle(self, *args, **options):
+        # 默认头像只生成一次，用户资料中不记录其缩略图
+        try:
+            sizes = avatars.generate(avatars.DEFAULT_AVATAR)
+            avatars.default_variants.cache_clear()
+            self.stdout.write(f'默认头像已生成 {len(sizes)} 个尺寸')
+        except Exception as e:
+            self.stderr.write(f'默认头像处理失败: {e}')
+
+        queryset = UserProfile.objects.exclude(avatar='').exclude(avatar=avatars.DEFAULT_AVATAR).only('id', 'avatar')
+        if options['only_missing']:
+            queryset = queryset.filter(avatar_variants=[])
+
+        # 按id分批读取，bulk_update不触发信号
+        last_id = 0
+        total = failed = 0
+        while True:
+            profiles = list(queryset.filter(id__gt=last_id).order_by('id')[:options['chunk_size']])
+            if not profiles:
+                break
+            for profile in profiles:
+                try:
+                    profile.avatar_variants = avatars.generate(profile.avatar.name)
+                except Exception as e:
+                    failed += 1
+                    profile.avatar_variants = []
+                    self.stderr.write(f'{profile.avatar.name}: {e}')
+            UserProfile.objects.bulk_update(profiles, ['avatar_variants'])
+            last_id = profiles[-1].id
+            total += len(profiles)
+            self.stdout.write(f'已处理 {total} 个头像')
+
+        self.stdout.write(self.style.SUCCESS(f'回填完成，共处理 {total} 个头像，失败 {failed} 个'))
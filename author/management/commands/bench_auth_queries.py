@@ -0,0 +1,83 @@
+import re
+import uuid
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from author.backends import EmailBackend
+
+User = get_user_model()
+
+
+class UncachedEmailBackend(EmailBackend):
+    """对照：按邮箱登录，但每个请求都从数据库加载用户"""
+    get_user = ModelBackend.get_user
+
+
+CONFIGS = [
+    ('数据库会话', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'AUTHENTICATION_BACKENDS': [f'{__name__}.UncachedEmailBackend'],
+    }),
+    ('缓存会话+用户缓存', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'AUTHENTICATION_BACKENDS': ['author.backends.EmailBackend'],
+    }),
+]
+TABLE_RE = re.compile(r'(?:FROM|INTO|UPDATE)\s+[`"]?(\w+)', re.IGNORECASE)
+
+
+class Command(BaseCommand):
+    help = '用测试客户端统计登录和已登录请求的数据库查询次数，对比数据库会话与缓存会话+用户缓存（在本地数据库上运行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20, help='已登录请求的次数')
+        parser.add_argument('--path', default=None, help='请求的页面，默认为个人设置页')
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        password = uuid.uuid4().hex[:16]
+        user = User.objects.create_user(username=f'bench_{tag}', email=f'bench_{tag}@example.com', password=password)
+        path = options['path'] or reverse('author:settings')
+        try:
+            for label, overrides in CONFIGS:
+                with override_settings(ALLOWED_HOSTS=['testserver'], BLOG_RATE_LIMITS={}, **overrides):
+                    self.run_config(label, user, password, path, options['requests'])
+        finally:
+            user.delete()
+
+    def run_config(self, label, user, password, path, requests):
+        client = Client()
+        with CaptureQueriesContext(connection) as login_queries:
+            response = client.post(reverse('author:login'), {'email': user.email, 'password': password})
+        # captured_queries按位置读取查询日志，下一个请求开始时日志会被清空，需要立即取出
+        login_queries = login_queries.captured_queries
+        if response.status_code != 302:
+            self.stdout.write(self.style.ERROR(f'[{label}] 登录失败: {response.status_code}'))
+            return
+
+        # 第一个请求填充缓存，不计入
+        client.get(path)
+        tables = Counter()
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(requests):
+                client.get(path)
+        queries = queries.captured_queries
+        for query in queries:
+            match = TABLE_RE.search(query['sql'])
+            tables[match.group(1) if match else '?'] += 1
+
+        self.stdout.write(f'[{label}] 登录 {len(login_queries)} 次查询（{self.summarize(login_queries)}）')
+        self.stdout.write(f'  每个请求 {len(queries) / requests:.1f} 次查询：' + '，'.join(
+            f'{table} {count / requests:.1f}' for table, count in tables.most_common()
+        ))
+
+    def summarize(self, queries):
+        kinds = Counter(query['sql'].split(None, 1)[0].upper() for query in queries)
+        return '，'.join(f'{kind} {count}' for kind, count in kinds.most_common())
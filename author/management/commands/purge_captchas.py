@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from author import captcha_store
+
+
+class Command(BaseCommand):
+    help = '分批删除Captcha表中过期的验证码记录'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='删除所有记录（验证码已改为保存在缓存中时）')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='每批删除的记录数')
+
+    def handle(self, *args, **options):
+        deleted = captcha_store.purge(options['chunk_size'], expired_only=not options['all'])
+        self.stdout.write(self.style.SUCCESS(f'已删除 {deleted} 条验证码记录'))
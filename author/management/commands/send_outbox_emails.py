@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from author import outbox
+
+
+class Command(BaseCommand):
+    help = '发送发件箱中到期的邮件；指定--loop时作为独立的发送进程持续运行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='每个SMTP连接发送的邮件数量，默认为BLOG_EMAIL_OUTBOX_BATCH_SIZE')
+        parser.add_argument('--loop', action='store_true', help='持续运行，每隔--interval秒检查一次发件箱')
+        parser.add_argument('--interval', type=float, default=2, help='持续运行时的检查间隔（秒）')
+        parser.add_argument('--keep-days', type=int, default=7, help='已发送或已失败的邮件保留天数')
+
+    def handle(self, *args, **options):
+        last_purge = None
+        while True:
+            sent, failed = outbox.drain(options['batch_size'])
+            if sent or failed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'已发送 {sent} 封邮件，失败 {failed} 封'))
+            # 每小时清理一次旧邮件
+            if last_purge is None or time.monotonic() - last_purge > 3600:
+                purged = outbox.purge(options['keep_days'])
+                last_purge = time.monotonic()
+                if purged:
+                    self.stdout.write(f'已删除 {purged} 封旧邮件')
+            if not options['loop']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
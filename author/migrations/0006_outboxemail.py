@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('author', '0005_userprofile_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=200)),
+                ('body', models.TextField()),
+                ('to', models.EmailField(max_length=254)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_time', models.DateTimeField(default=django.utils.timezone.now)),
+                ('sent_time', models.DateTimeField(blank=True, null=True)),
+                ('failed', models.BooleanField(default=False)),
+                ('last_error', models.CharField(blank=True, max_length=500)),
+                ('create_time', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sent_time', 'failed', 'next_attempt_time'], name='author_outb_sent_ti_9f59fd_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('author', '0006_outboxemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='captcha',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='captcha',
+            name='created_time',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
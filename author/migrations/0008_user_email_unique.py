@@ -0,0 +1,36 @@
+# auth_user 属于 django.contrib.auth，不能为其增加 Meta 约束，这里直接在数据库上创建唯一函数索引
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def add_email_index(apps, schema_editor):
+    from author.backends import EMAIL_KEY, EMAIL_UNIQUE_CONSTRAINT
+
+    User = apps.get_model('auth', 'User')
+    duplicates = list(
+        User.objects.annotate(email_key=EMAIL_KEY).exclude(email='')
+        .values('email_key').annotate(count=Count('id')).filter(count__gt=1)
+        .values_list('email_key', flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(f"以下邮箱被多个用户使用（不区分大小写），请先处理后再迁移: {', '.join(duplicates)}")
+    schema_editor.add_constraint(User, EMAIL_UNIQUE_CONSTRAINT)
+
+
+def remove_email_index(apps, schema_editor):
+    from author.backends import EMAIL_UNIQUE_CONSTRAINT
+
+    schema_editor.remove_constraint(apps.get_model('auth', 'User'), EMAIL_UNIQUE_CONSTRAINT)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('author', '0007_captcha_attempts_alter_captcha_created_time'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_email_index, remove_email_index),
+    ]
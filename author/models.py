@@ -1,14 +1,42 @@
+import logging
+
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from . import avatars
+
+logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
 # Create your models here.
 
 class Captcha(models.Model):
+    """没有共享缓存时保存邮箱验证码，见 author/captcha_store.py"""
     email = models.EmailField(unique=True)
     captcha = models.CharField(max_length=6)
-    created_time = models.DateTimeField(auto_now_add=True)
+    # 验证码错误的次数，达到上限后验证码作废
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_time = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class OutboxEmail(models.Model):
+    """待发送的邮件，请求中只写入一行，由 author/outbox.py 在请求之外批量发送"""
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    to = models.EmailField()
+    # 已尝试发送的次数；达到上限后标记为失败，不再重试
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # 下次可以发送的时间：重试的退避时间，或被某个发送进程领取后的租约到期时间
+    next_attempt_time = models.DateTimeField(default=timezone.now)
+    sent_time = models.DateTimeField(null=True, blank=True)
+    failed = models.BooleanField(default=False)
+    last_error = models.CharField(max_length=500, blank=True)
+    create_time = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['sent_time', 'failed', 'next_attempt_time'])]
 
 
 class UserProfile(models.Model):
@@ -20,10 +48,44 @@ class UserProfile(models.Model):
         verbose_name='用户头像',
         blank=True
     )
+    # 已生成的头像缩略图尺寸，见 author/avatars.py
+    avatar_variants = models.JSONField(default=list, blank=True, verbose_name='头像缩略图尺寸')
     bio = models.TextField(max_length=500, blank=True, verbose_name='个人简介')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def _avatar_variants(self):
+        if self.avatar_variants:
+            return self.avatar_variants
+        return avatars.default_variants() if self.avatar.name == avatars.DEFAULT_AVATAR else []
+
+    def avatar_url(self, size=None):
+        """
+        按显示尺寸选择头像地址
+        :param size: 显示尺寸（像素），为空时返回原图
+        :return: 不小于该尺寸的最小缩略图地址，没有缩略图时返回原图地址
+        """
+        if not self.avatar:
+            return ''
+        variant = avatars.pick(self._avatar_variants(), size) if size else None
+        if variant is None:
+            return self.avatar.url
+        return self.avatar.storage.url(avatars.variant_name(self.avatar.name, variant))
+
+    def avatar_srcset(self, size):
+        """高分屏使用的srcset（1x和2x），没有缩略图时为空字符串"""
+        if not self.avatar or not self._avatar_variants():
+            return ''
+        return f'{self.avatar_url(size)} 1x, {self.avatar_url(size * 2)} 2x'
+
+    def refresh_avatar_variants(self):
+        """为当前头像生成缩略图（不保存），头像文件无法读取时清空"""
+        try:
+            self.avatar_variants = avatars.generate(self.avatar.name) if self.avatar else []
+        except Exception:
+            logger.exception('生成头像缩略图失败: %s', self.avatar.name)
+            self.avatar_variants = []
+
     class Meta:
         verbose_name = '用户资料'
         verbose_name_plural = '用户资料'
\ No newline at end of file
@@ -0,0 +1,208 @@
+"""
+邮件发件箱：视图只把邮件写入 OutboxEmail 表并立即返回，不在请求中连接SMTP服务器。
+
+发送进程按批领取到期的邮件，每批复用同一个SMTP连接（get_connection），避免每封邮件都重新建立TLS连接；
+发送失败的邮件按指数退避重试，达到次数上限后标记为失败。领取时把下次发送时间推迟一个租约时长，
+多个发送进程不会同时发送同一封邮件，发送进程中途退出时租约到期后邮件会被重新领取（至少发送一次）。
+
+默认在当前进程的后台线程中发送（事务提交后触发）；也可以关闭 BLOG_EMAIL_OUTBOX_DRAIN_IN_PROCESS，
+改为用 send_outbox_emails 命令作为独立的发送进程运行。
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, connection as db_connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+# 领取后的租约时长（秒），超过这个时间仍未发送完成的邮件会被重新领取
+LEASE_SECONDS = 300
+# 重试间隔的上限（秒）
+MAX_RETRY_DELAY = 3600
+
+
+def _batch_size() -> int:
+    return getattr(settings, 'BLOG_EMAIL_OUTBOX_BATCH_SIZE', 50)
+
+
+def _max_attempts() -> int:
+    return getattr(settings, 'BLOG_EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+
+
+def _retry_delay() -> int:
+    return getattr(settings, 'BLOG_EMAIL_OUTBOX_RETRY_DELAY', 30)
+
+
+def enqueue(subject, body, to) -> OutboxEmail:
+    """
+    把邮件加入发件箱
+    :param to: 收件人邮箱
+    :return: 发件箱中的记录
+    """
+    email = OutboxEmail.objects.create(subject=subject, body=body, to=to)
+    if getattr(settings, 'BLOG_EMAIL_OUTBOX_DRAIN_IN_PROCESS', True):
+        transaction.on_commit(schedule_drain)
+    return email
+
+
+def _claim(batch_size) -> list:
+    """领取一批到期的邮件：增加尝试次数，并把下次发送时间推迟一个租约时长"""
+    now = timezone.now()
+    skip_locked = db_connection.features.has_select_for_update_skip_locked
+    with transaction.atomic():
+        ids = list(
+            OutboxEmail.objects.select_for_update(skip_locked=skip_locked)
+            .filter(sent_time__isnull=True, failed=False, next_attempt_time__lte=now)
+            .order_by('next_attempt_time')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if ids:
+            OutboxEmail.objects.filter(id__in=ids).update(
+                attempts=F('attempts') + 1, next_attempt_time=now + timedelta(seconds=LEASE_SECONDS)
+            )
+    return list(OutboxEmail.objects.filter(id__in=ids).order_by('id'))
+
+
+def _retry(email, error):
+    """发送失败：未达到次数上限时按指数退避安排下次发送，否则标记为失败"""
+    fields = {'last_error': str(error)[:500]}
+    if email.attempts >= _max_attempts():
+        fields['failed'] = True
+        logger.error('邮件发送失败，不再重试: %s (%s)', email.to, error)
+    else:
+        delay = min(_retry_delay() * 2 ** (email.attempts - 1), MAX_RETRY_DELAY)
+        fields['next_attempt_time'] = timezone.now() + timedelta(seconds=delay)
+    OutboxEmail.objects.filter(pk=email.pk).update(**fields)
+
+
+def _send_batch(emails) -> int:
+    """
+    通过同一个SMTP连接发送一批邮件
+    :return: 发送成功的数量
+    """
+    connection = get_connection(fail_silently=False)
+    sent = []
+    try:
+        connection.open()
+        for index, email in enumerate(emails):
+            message = EmailMessage(
+                email.subject, email.body, settings.DEFAULT_FROM_EMAIL, [email.to], connection=connection
+            )
+            try:
+                message.send()
+            except Exception as e:
+                _retry(email, e)
+                # 服务器可能已断开连接，重新连接后继续发送剩余的邮件
+                connection.close()
+                try:
+                    connection.open()
+                except Exception as e:
+                    for remaining in emails[index + 1:]:
+                        _retry(remaining, e)
+                    break
+            else:
+                sent.append(email.pk)
+    except Exception as e:
+        # 无法连接服务器，整批邮件稍后重试
+        for email in emails:
+            _retry(email, e)
+    finally:
+        connection.close()
+        if sent:
+            OutboxEmail.objects.filter(pk__in=sent).update(sent_time=timezone.now())
+    return len(sent)
+
+
+def drain(batch_size=None) -> tuple:
+    """
+    发送发件箱中所有到期的邮件
+    :param batch_size: 每批（每个SMTP连接）发送的邮件数量
+    :return: (发送成功的数量, 发送失败的数量)
+    """
+    batch_size = batch_size or _batch_size()
+    sent = attempted = 0
+    while True:
+        emails = _claim(batch_size)
+        if not emails:
+            break
+        attempted += len(emails)
+        count = _send_batch(emails)
+        sent += count
+        if count < len(emails):
+            # 本批有失败的邮件，可能是服务器暂时不可用，剩余的邮件等下次发送
+            break
+    return sent, attempted - sent
+
+
+def purge(keep_days) -> int:
+    """删除keep_days天前已发送或已失败的邮件，邮件中包含验证码，不长期保存"""
+    cutoff = timezone.now() - timedelta(days=keep_days)
+    deleted, _ = OutboxEmail.objects.filter(create_time__lt=cutoff).exclude(
+        sent_time__isnull=True, failed=False
+    ).delete()
+    return deleted
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_drain_pending = False
+_retry_timer = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='email-outbox')
+    return _executor
+
+
+def _schedule_retry(delay):
+    """只保留一个重试定时器，新的定时器替换旧的"""
+    global _retry_timer
+    with _executor_lock:
+        if _retry_timer is not None:
+            _retry_timer.cancel()
+        _retry_timer = threading.Timer(delay, schedule_drain)
+        _retry_timer.daemon = True
+        _retry_timer.start()
+
+
+def _drain_logged():
+    global _drain_pending
+    # 先清除标记，发送期间加入的邮件会再触发一次发送
+    with _executor_lock:
+        _drain_pending = False
+    close_old_connections()
+    try:
+        drain()
+        # 等待重试的邮件到期后再发送一次
+        retry_time = (
+            OutboxEmail.objects.filter(sent_time__isnull=True, failed=False)
+            .order_by('next_attempt_time').values_list('next_attempt_time', flat=True).first()
+        )
+        if retry_time is not None:
+            _schedule_retry(max((retry_time - timezone.now()).total_seconds(), 1))
+    except Exception:
+        logger.exception('发件箱发送失败')
+    finally:
+        close_old_connections()
+
+
+def schedule_drain():
+    """在后台线程中发送发件箱中的邮件，已有等待执行的发送任务时不重复提交"""
+    global _drain_pending
+    with _executor_lock:
+        if _drain_pending:
+            return
+        _drain_pending = True
+    _get_executor().submit(_drain_logged)
@@ -1,20 +1,41 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+
+from . import backends
 from .models import UserProfile
 
 User = get_user_model()
 
 
 @receiver(post_save, sender=User)
-def create_or_update_user_profile(sender, instance, created, **kwargs):
-    """当用户创建或更新时，自动创建或更新对应的UserProfile"""
+def create_or_update_user_profile(sender, instance, created, update_fields=None, **kwargs):
+    """用户创建时自动创建UserProfile；更新时只在资料缺失时补建，不重复保存资料"""
     if created:
         # 用户新创建时，自动创建UserProfile
         UserProfile.objects.create(user=instance)
-    else:
-        # 用户更新时，确保UserProfile存在
-        try:
-            instance.userprofile.save()
-        except UserProfile.DoesNotExist:
-            UserProfile.objects.create(user=instance)
\ No newline at end of file
+        return
+    if update_fields is not None:
+        # 指定了更新字段的保存（如登录时更新last_login）不涉及资料
+        return
+    # 用户更新时，确保UserProfile存在；资料已随用户加载时不需要查询
+    try:
+        instance.userprofile
+    except UserProfile.DoesNotExist:
+        UserProfile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, update_fields=None, **kwargs):
+    """用户信息或密码修改后删除缓存的用户；只更新last_login时缓存的用户仍然可用"""
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    backends.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_user_profile(sender, instance, **kwargs):
+    """缓存的用户中带有资料（导航栏头像），资料修改后同样删除"""
+    backends.invalidate(instance.user_id)
@@ -0,0 +1,15 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def avatar_url(profile, size):
+    """按显示尺寸选择头像缩略图：{{ profile|avatar_url:36 }}"""
+    return profile.avatar_url(int(size)) if profile else ''
+
+
+@register.filter
+def avatar_srcset(profile, size):
+    """高分屏头像的srcset：{{ profile|avatar_srcset:36 }}"""
+    return profile.avatar_srcset(int(size)) if profile else ''
@@ -1,3 +1,427 @@
-from django.test import TestCase
+import io
+import tempfile
+import time
+from datetime import timedelta
+from smtplib import SMTPException, SMTPRecipientsRefused
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from blog import view_counter
+from blog.models import Blog, BlogCategory
+from blog.reactions import toggle_blog_like
+
+from . import avatars, backends, captcha_store, outbox
+from .models import Captcha, OutboxEmail, UserProfile
+
+User = get_user_model()
+
+
+class CountingBackend(EmailBackend):
+    """记录打开连接次数的内存邮件后端，可以指定拒收的收件人或让连接失败"""
+    opened = 0
+    refused = set()
+    unavailable = False
+
+    def open(self):
+        if CountingBackend.unavailable:
+            raise SMTPException('服务器不可用')
+        CountingBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        for message in messages:
+            if set(message.to) & CountingBackend.refused:
+                raise SMTPRecipientsRefused({message.to[0]: (550, b'refused')})
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND='author.tests.CountingBackend',
+    BLOG_EMAIL_OUTBOX_DRAIN_IN_PROCESS=False,
+    BLOG_EMAIL_OUTBOX_BATCH_SIZE=10,
+    BLOG_EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+)
+class EmailOutboxTests(TestCase):
+    """邮件发件箱的测试"""
+
+    def setUp(self):
+        CountingBackend.opened = 0
+        CountingBackend.refused = set()
+        CountingBackend.unavailable = False
+
+    def test_captcha_view_enqueues_without_sending(self):
+        response = self.client.post(reverse('author:send_email_captcha'), {'email': 'new@example.com'})
+        self.assertEqual(response.json()['code'], 200)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(CountingBackend.opened, 0)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.to, 'new@example.com')
+
+        self.assertEqual(outbox.drain(), (1, 0))
+        self.assertEqual(mail.outbox[0].to, ['new@example.com'])
+        self.assertIn('验证码', mail.outbox[0].subject)
+
+    def test_drain_reuses_one_connection_per_batch(self):
+        for i in range(25):
+            outbox.enqueue('验证码', f'内容{i}', f'user{i}@example.com')
+        self.assertEqual(outbox.drain(), (25, 0))
+        self.assertEqual(len(mail.outbox), 25)
+        self.assertEqual(CountingBackend.opened, 3)
+        self.assertFalse(OutboxEmail.objects.filter(sent_time__isnull=True).exists())
+        # 已发送的邮件不会被再次发送
+        self.assertEqual(outbox.drain(), (0, 0))
+
+    def test_failed_email_backs_off_then_gives_up(self):
+        outbox.enqueue('验证码', '内容', 'ok@example.com')
+        outbox.enqueue('验证码', '内容', 'bad@example.com')
+        CountingBackend.refused = {'bad@example.com'}
+        self.assertEqual(outbox.drain(), (1, 1))
+        bad = OutboxEmail.objects.get(to='bad@example.com')
+        self.assertEqual(bad.attempts, 1)
+        self.assertGreater(bad.next_attempt_time, timezone.now())
+        self.assertIn('refused', bad.last_error)
+
+        # 退避时间未到时不会重试
+        self.assertEqual(outbox.drain(), (0, 0))
+        OutboxEmail.objects.filter(pk=bad.pk).update(next_attempt_time=timezone.now())
+        self.assertEqual(outbox.drain(), (0, 1))
+        bad.refresh_from_db()
+        self.assertTrue(bad.failed)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_unavailable_server_retries_whole_batch(self):
+        outbox.enqueue('验证码', '内容', 'a@example.com')
+        outbox.enqueue('验证码', '内容', 'b@example.com')
+        CountingBackend.unavailable = True
+        self.assertEqual(outbox.drain(), (0, 2))
+        self.assertEqual(OutboxEmail.objects.filter(attempts=1, failed=False).count(), 2)
+
+        CountingBackend.unavailable = False
+        OutboxEmail.objects.update(next_attempt_time=timezone.now())
+        self.assertEqual(outbox.drain(), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+
+
+class EmailLoginTests(TestCase):
+    """邮箱登录的测试"""
+
+    def setUp(self):
+        # 清空登录的频率限制计数
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', email='Reader@example.com', password='password123')
+
+    def login(self, email, password='password123'):
+        """
+        :return: (响应, 登录过程中执行的SQL)，事务语句不计入
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('author:login'), {'email': email, 'password': password})
+        statements = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].split(None, 1)[0].upper() in ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+        ]
+        return response, statements
+
+    def test_login_queries(self):
+        profile_updated_at = UserProfile.objects.get(user=self.user).updated_at
+        response, statements = self.login('reader@EXAMPLE.com')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, reverse('blog:index'))
+        # 按邮箱查询用户、检查并创建会话、更新登录时间、保存会话过期时间
+        self.assertEqual(len(statements), 5, statements)
+        self.assertEqual(sum(sql.startswith('UPDATE') and 'auth_user' in sql for sql in statements), 1)
+        # 更新登录时间不再保存用户资料
+        self.assertFalse([sql for sql in statements if 'author_userprofile' in sql])
+        self.assertEqual(UserProfile.objects.get(user=self.user).updated_at, profile_updated_at)
+
+    def test_login_errors(self):
+        wrong_password, statements = self.login('reader@example.com', password='wrong-password')
+        self.assertEqual(wrong_password.status_code, 200)
+        # 只按邮箱查询一次用户
+        self.assertEqual(len(statements), 1, statements)
+        unknown_email, statements = self.login('nobody@example.com')
+        self.assertEqual(len(statements), 1, statements)
+        # 两种情况的提示相同，不透露邮箱是否已注册
+        self.assertEqual(wrong_password.context['form'].errors, {'__all__': ['邮箱或密码错误']})
+        self.assertEqual(unknown_email.context['form'].errors, wrong_password.context['form'].errors)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_email_is_unique_ignoring_case(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user(username='copy', email='reader@example.COM', password='password123')
+        # 没有填写邮箱的用户不受唯一约束影响
+        User.objects.create_user(username='no-email-1', password='password123')
+        User.objects.create_user(username='no-email-2', password='password123')
+
+
+class UserCacheTests(TestCase):
+    """已登录请求的会话和用户缓存的测试，缓存使用本地内存缓存"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='password123')
+        self.client.force_login(self.user)
+
+    def cached_user(self):
+        return backends.get_cache().get(backends._key(self.user.pk))
+
+    def test_authenticated_request_skips_session_and_user_queries(self):
+        # 第一个请求把用户写入缓存
+        self.assertEqual(self.client.get(reverse('author:settings')).status_code, 200)
+        self.assertIsNotNone(self.cached_user())
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('blog:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['user'], self.user)
+        statements = [query['sql'] for query in queries.captured_queries]
+        self.assertFalse([sql for sql in statements if 'django_session' in sql], statements)
+        self.assertFalse([sql for sql in statements if 'FROM "auth_user"' in sql], statements)
+
+    def test_profile_and_password_changes_evict_cached_user(self):
+        self.client.get(reverse('author:settings'))
+        self.client.post(reverse('author:settings'), {'username': 'renamed', 'email': 'reader@example.com', 'bio': ''})
+        self.assertIsNone(self.cached_user())
+
+        self.client.get(reverse('author:settings'))
+        self.client.post(reverse('author:settings'), {
+            'password_change': '1', 'current_password': 'password123',
+            'new_password': 'password456', 'confirm_password': 'password456',
+        })
+        self.assertIsNone(self.cached_user())
+
+        self.client.get(reverse('author:settings'))
+        self.client.post(reverse('author:update_password'), {
+            'current-password': 'password456', 'new_password': 'password789', 'confirm_password': 'password789',
+        })
+        self.assertIsNone(self.cached_user())
+        # 修改密码的会话仍然有效，并重新缓存新的用户
+        self.assertEqual(self.client.get(reverse('author:settings')).status_code, 200)
+        self.assertTrue(self.cached_user().check_password('password789'))
+
+    def change_password(self):
+        response = self.client.post(reverse('author:update_password'), {
+            'current-password': 'password123', 'new_password': 'password456', 'confirm_password': 'password456',
+        })
+        self.assertEqual(response.status_code, 200)
+
+    def test_password_change_logs_out_other_devices(self):
+        other = Client()
+        other.force_login(self.user)
+        self.assertEqual(other.get(reverse('author:settings')).status_code, 200)
+        self.change_password()
+        self.assertEqual(self.client.get(reverse('author:settings')).status_code, 200)
+        self.assertEqual(other.get(reverse('author:settings')).status_code, 302)
+
+    def test_stale_cached_user_does_not_log_out_new_session(self):
+        self.client.get(reverse('author:settings'))
+        stale = self.cached_user()
+        self.change_password()
+        # 模拟其他进程：修改密码只删除了处理请求的进程中的缓存，这里的缓存仍是旧的密码摘要
+        backends.get_cache().set(backends._key(self.user.pk), stale)
+        self.assertEqual(self.client.get(reverse('author:settings')).status_code, 200)
+        self.assertTrue(self.cached_user().check_password('password456'))
+
+    def test_model_backend_sessions_still_resolve(self):
+        other = Client()
+        other.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        self.assertEqual(other.get(reverse('author:settings')).status_code, 200)
+
+
+@override_settings(BLOG_VIEW_COUNTER_CACHE='default', BLOG_VIEW_COUNTER_FLUSH_INTERVAL=0)
+class UserPageConditionalGetTests(TestCase):
+    """用户个人页ETag/Last-Modified的测试"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author', password='password123')
+        self.category = BlogCategory.objects.create(name='技术')
+        self.blog = Blog.objects.create(title='标题', content='<p>内容</p>', category=self.category, author=self.user)
+        self.url = reverse('author:user_page', kwargs={'user_id': self.user.pk})
+
+    def test_matching_etag_returns_304_without_rendering(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0), self.assertTemplateNotUsed('user_page.html'):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_blogs_and_likes_change_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        Blog.objects.create(title='新博客', content='<p>内容</p>', category=self.category, author=self.user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        toggle_blog_like(self.blog.id, self.user)
+        self.assertNotEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_users_get_different_etags(self):
+        other = User.objects.create_user(username='reader', password='password123')
+        first, second = Client(), Client()
+        first.force_login(self.user)
+        second.force_login(other)
+        etag = first.get(self.url)['ETag']
+        self.assertEqual(second.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_view_count_flush_updates_last_modified(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        with mock.patch('time.time', return_value=time.time() + 10):
+            view_counter.flush()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+
+class AvatarVariantTests(TestCase):
+    """头像缩略图的测试"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # 默认头像的缩略图每个进程只检查一次，换了MEDIA_ROOT需要重新检查
+        avatars.default_variants.cache_clear()
+        self.addCleanup(avatars.default_variants.cache_clear)
+        self.user = User.objects.create_user(username='author', password='password123')
+        self.client.force_login(self.user)
+
+    def upload(self, content, name='avatar.png'):
+        response = self.client.post(reverse('author:upload_avatar'), {
+            'avatar': SimpleUploadedFile(name, content, content_type='image/png'),
+        })
+        return response.json()
+
+    def png(self, size):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGBA', size, (255, 0, 0, 128)).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def test_upload_generates_variants_up_to_short_side(self):
+        data = self.upload(self.png((100, 80)))
+        self.assertEqual(data['code'], 200)
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.avatar_variants, [24, 32, 36, 48, 60, 64, 72])
+        for size in profile.avatar_variants:
+            self.assertTrue(default_storage.exists(avatars.variant_name(profile.avatar.name, size)))
+
+        base = profile.avatar.url.rsplit('.', 1)[0]
+        self.assertEqual(profile.avatar_url(36), f'{base}_s36.webp')
+        self.assertEqual(profile.avatar_url(30), f'{base}_s32.webp')
+        # 没有足够大的缩略图时退回原图
+        self.assertEqual(profile.avatar_url(120), profile.avatar.url)
+        self.assertEqual(profile.avatar_url(), profile.avatar.url)
+        self.assertEqual(profile.avatar_srcset(36), f'{base}_s36.webp 1x, {base}_s72.webp 2x')
+        self.assertEqual(data['data']['avatar_urls']['36'], f'{base}_s36.webp')
+
+    def test_unreadable_image_is_logged_and_falls_back(self):
+        with self.assertLogs('author.models', 'ERROR') as logs:
+            data = self.upload(b'not an image')
+        self.assertEqual(data['code'], 200)
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertIn(profile.avatar.name, logs.output[0])
+        self.assertEqual(profile.avatar_variants, [])
+        self.assertEqual(profile.avatar_url(36), profile.avatar.url)
+        self.assertEqual(profile.avatar_srcset(36), '')
+
+    def test_default_avatar_uses_backfilled_variants(self):
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.avatar.name, avatars.DEFAULT_AVATAR)
+        self.assertEqual(profile.avatar_url(36), profile.avatar.url)
+        self.assertEqual(profile.avatar_srcset(36), '')
+
+        default_storage.save(avatars.DEFAULT_AVATAR, ContentFile(self.png((240, 240))))
+        avatars.generate(avatars.DEFAULT_AVATAR)
+        avatars.default_variants.cache_clear()
+        self.assertEqual(profile.avatar_url(36), default_storage.url('avatars/default_s36.webp'))
+        self.assertIn('default_s72.webp 2x', profile.avatar_srcset(36))
+
+
+class CaptchaStoreTestsMixin:
+    """两种验证码存储共用的测试"""
+    email = 'new@example.com'
+
+    def setUp(self):
+        cache.clear()
+
+    def verify_after_ttl(self, captcha):
+        raise NotImplementedError
+
+    def test_code_is_single_use(self):
+        captcha = captcha_store.issue(self.email)
+        self.assertEqual(captcha_store.verify('NEW@example.com', captcha.lower()), captcha_store.VALID)
+        self.assertEqual(captcha_store.verify(self.email, captcha), captcha_store.EXPIRED)
+
+    def test_new_code_replaces_old_one(self):
+        old = captcha_store.issue(self.email)
+        new = captcha_store.issue(self.email)
+        if old != new:
+            self.assertEqual(captcha_store.verify(self.email, old), captcha_store.INVALID)
+        self.assertEqual(captcha_store.verify(self.email, new), captcha_store.VALID)
+
+    def test_wrong_codes_invalidate_after_limit(self):
+        captcha = captcha_store.issue(self.email)
+        other = captcha_store.issue('other@example.com')
+        self.assertEqual(captcha_store.verify(self.email, 'WRONG1'), captcha_store.INVALID)
+        self.assertEqual(captcha_store.verify(self.email, 'WRONG2'), captcha_store.INVALID)
+        # 第三次错误达到上限，验证码作废，之后正确的验证码也不再通过
+        self.assertEqual(captcha_store.verify(self.email, 'WRONG3'), captcha_store.EXPIRED)
+        self.assertEqual(captcha_store.verify(self.email, captcha), captcha_store.EXPIRED)
+        # 错误次数按邮箱分别计算
+        self.assertEqual(captcha_store.verify('other@example.com', other), captcha_store.VALID)
+
+    def test_expires_after_ttl(self):
+        captcha = captcha_store.issue(self.email)
+        self.assertEqual(self.verify_after_ttl(captcha), captcha_store.EXPIRED)
+
+    def test_missing_code(self):
+        self.assertEqual(captcha_store.verify(self.email, 'ABCDEF'), captcha_store.EXPIRED)
+        self.assertEqual(captcha_store.verify(self.email, ''), captcha_store.EXPIRED)
+
+
+@override_settings(BLOG_CAPTCHA_CACHE='default', BLOG_CAPTCHA_MAX_ATTEMPTS=3)
+class CacheCaptchaStoreTests(CaptchaStoreTestsMixin, TestCase):
+    """验证码保存在缓存中"""
+
+    def verify_after_ttl(self, captcha):
+        with mock.patch('time.time', return_value=time.time() + captcha_store.ttl() + 1):
+            return captcha_store.verify(self.email, captcha)
+
+    def test_does_not_write_to_database(self):
+        captcha_store.issue(self.email)
+        self.assertFalse(Captcha.objects.exists())
+
+
+@override_settings(BLOG_CAPTCHA_CACHE=None, BLOG_CAPTCHA_MAX_ATTEMPTS=3)
+class DatabaseCaptchaStoreTests(CaptchaStoreTestsMixin, TestCase):
+    """没有共享缓存时验证码保存在Captcha表中"""
+
+    def verify_after_ttl(self, captcha):
+        Captcha.objects.update(created_time=timezone.now() - timedelta(seconds=captcha_store.ttl() + 1))
+        return captcha_store.verify(self.email, captcha)
+
+    def test_consumed_and_expired_rows_are_deleted(self):
+        captcha = captcha_store.issue(self.email)
+        self.assertEqual(Captcha.objects.get(email=self.email).captcha, captcha)
+        captcha_store.verify(self.email, captcha)
+        self.assertFalse(Captcha.objects.filter(email=self.email).exists())
+
+        captcha_store.issue('old@example.com')
+        captcha_store.issue(self.email)
+        Captcha.objects.filter(email='old@example.com').update(
+            created_time=timezone.now() - timedelta(seconds=captcha_store.ttl() + 1)
+        )
+        self.assertEqual(captcha_store.purge(chunk_size=1), 1)
+        self.assertEqual(list(Captcha.objects.values_list('email', flat=True)), [self.email])
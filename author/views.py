@@ -1,26 +1,23 @@
-import os
-import random
-import string
 import traceback
-import uuid  # 添加uuid模块用于生成唯一ID
-from datetime import datetime  # 添加datetime模块
 
 from django.conf import settings
 from django.contrib import messages
-from django.contrib.auth import get_user_model, login, logout
+from django.contrib.auth import authenticate, get_user_model, login, logout, update_session_auth_hash
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
+from django.db.models import Count, Sum
 from django.http import BadHeaderError, HttpResponse
 from django.http import JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
-from django.utils import timezone
 from django.views.decorators.http import require_http_methods, require_POST, require_GET
+
+from blog import conditional, media_store, page_cache, view_counter
 from blog.models import Blog
 
+from . import avatars, backends, captcha_store, outbox
 from .forms import RegisterForm, LoginForm, UserProfileForm
-from .models import Captcha, UserProfile
+from .models import UserProfile
 
 # Create your views here.
 
@@ -37,27 +34,23 @@ def blog_login(request) -> HttpResponse|JsonResponse|None:
             email = form.cleaned_data.get('email')
             password = form.cleaned_data.get('password')
             remember = form.cleaned_data.get('remember')
-            user = User.objects.filter(email=email).first()
+            # 按邮箱认证，查询走auth_user上的邮箱唯一索引
+            user = authenticate(request, email=email, password=password)
             if user:
-                if user.check_password(password):
-                    login(request, user)
-                    # 是否使用记住我
-                    if not remember:
-                        # 设置过期时间为0， 退出浏览器就过期
-                        request.session.set_expiry(0)
-                    else:
-                        # 设置过期时间为7天
-                        request.session.set_expiry(60 * 60 * 24 * 7)
-                    # 登录成功后提示用户，跳转到首页
-                    messages.success(request, '登录成功')
-                    return redirect(reverse('blog:index'))
+                login(request, user)
+                # 是否使用记住我
+                if not remember:
+                    # 设置过期时间为0， 退出浏览器就过期
+                    request.session.set_expiry(0)
                 else:
-                    # 密码错误，返回错误信息
-                    form.add_error('password', '密码错误')
-                    return render(request, 'login.html', {'form': form})
+                    # 设置过期时间为7天
+                    request.session.set_expiry(60 * 60 * 24 * 7)
+                # 登录成功后提示用户，跳转到首页
+                messages.success(request, '登录成功')
+                return redirect(reverse('blog:index'))
             else:
-                # 邮箱不存在，返回错误信息
-                form.add_error('email', '该邮箱未注册')
+                # 邮箱未注册和密码错误返回相同的提示，不透露邮箱是否已注册，也不需要再查询一次
+                form.add_error(None, '邮箱或密码错误')
                 return render(request, 'login.html', {'form': form})
         else:
             # 表单验证失败，返回错误信息
@@ -77,19 +70,13 @@ def send_email_captcha(request) -> HttpResponse:
         return JsonResponse({'code': 400, 'msg': '邮箱不能为空'})
 
     try:
-        # 生成验证码
-        captcha = ''.join(random.sample(string.ascii_uppercase + string.digits, 6))
-        # 保存验证码到数据库
-        Captcha.objects.update_or_create(email=email, defaults={'captcha': captcha})
-        # 更新验证码发送时间
-        Captcha.objects.filter(email=email).update(created_time=timezone.now())
-        # 发送邮件
-        send_mail(
+        # 生成验证码并保存（缓存中带过期时间）
+        captcha = captcha_store.issue(email)
+        # 加入发件箱后立即返回，邮件在请求之外发送
+        outbox.enqueue(
             "DjangoBlog验证码", # 邮件标题
             f"您的验证码是：{captcha}", # 邮件内容
-            settings.DEFAULT_FROM_EMAIL, # 使用settings中配置的发送方邮箱
-            [email], # 接收方邮箱
-            fail_silently=False, # 是否静默失败
+            email, # 接收方邮箱
         )
         return JsonResponse({'code': 200, 'msg': '验证码发送成功'})
     except BadHeaderError:
@@ -176,10 +163,9 @@ def settings_view(request) -> HttpResponse|JsonResponse|None:
             # 如果没有错误，更新密码
             if not password_error:
                 request.user.set_password(new_password)
-                request.user.save()
-                # 重新登录用户
-                from django.contrib.auth import login as auth_login
-                auth_login(request, request.user)
+                request.user.save(update_fields=['password'])
+                # 更新会话中的密码摘要，修改密码后不会被登出
+                update_session_auth_hash(request, request.user)
                 messages.success(request, '密码修改成功')
                 return redirect(reverse('author:settings'))
             else:
@@ -226,7 +212,7 @@ def settings_view(request) -> HttpResponse|JsonResponse|None:
                     return render(request, 'settings.html', {'form': form, 'profile': profile, 'password_error': password_error})
                 
                 # 检查邮箱是否已被使用
-                if User.objects.filter(email=new_email).exclude(id=request.user.id).exists():
+                if backends.users_with_email(new_email).exclude(id=request.user.id).exists():
                     messages.error(request, '该邮箱已被注册')
                     return render(request, 'settings.html', {'form': form, 'profile': profile, 'password_error': password_error})
                 
@@ -258,17 +244,14 @@ def settings_view(request) -> HttpResponse|JsonResponse|None:
                     messages.error(request, '头像大小不能超过2MB')
                     return render(request, 'settings.html', {'form': form, 'profile': profile, 'password_error': password_error})
                 
-                # 如果用户已经有头像了，先删除旧头像
+                # 如果用户已经有头像了，释放旧头像，没有其他用户使用同一文件时连同缩略图一起删除
                 if original_avatar and original_avatar != 'avatars/default.png':
-                    old_avatar_path = os.path.join(settings.MEDIA_ROOT, str(original_avatar))
-                    if os.path.exists(old_avatar_path):
-                        try:
-                            os.remove(old_avatar_path)
-                        except Exception as e:
-                            print(f"删除旧头像失败: {str(e)}")
+                    _release_avatar(str(original_avatar), profile.avatar_variants)
                 
-                # 保存新头像
-                profile.avatar = file
+                # 按内容摘要保存新头像，相同的图片只保存一份
+                file_extension = file.name.split('.')[-1].lower()
+                profile.avatar = media_store.store(file, 'avatars', file_extension)
+                profile.avatar_variants = []
                 has_changes = True
             
             # 只有当有变化时才保存数据
@@ -276,6 +259,10 @@ def settings_view(request) -> HttpResponse|JsonResponse|None:
                 # 保存用户信息和资料
                 request.user.save()
                 profile.save()
+                # 新头像写入存储后按模板中的显示尺寸生成缩略图
+                if 'avatar' in request.FILES:
+                    profile.refresh_avatar_variants()
+                    profile.save(update_fields=['avatar_variants'])
                 messages.success(request, '资料更新成功')
             else:
                 messages.info(request, '没有检测到数据变化')
@@ -283,6 +270,15 @@ def settings_view(request) -> HttpResponse|JsonResponse|None:
             return redirect(reverse('author:settings'))
 
 
+def _release_avatar(name, variants):
+    """释放旧头像的引用，文件被删除时同时删除其缩略图"""
+    try:
+        if media_store.release(name):
+            avatars.delete_variants(name, variants)
+    except Exception as e:
+        print(f"删除旧头像失败: {str(e)}")
+
+
 @login_required(login_url='author:login')
 @require_POST
 def upload_avatar(request) -> HttpResponse|JsonResponse|None:
@@ -307,38 +303,17 @@ def upload_avatar(request) -> HttpResponse|JsonResponse|None:
         # 获取或创建用户资料
         profile, created = UserProfile.objects.get_or_create(user=request.user)
         
-        # 如果用户已经有头像了，先删除旧头像
+        # 如果用户已经有头像了，释放旧头像，没有其他用户使用同一文件时连同缩略图一起删除
         if profile.avatar and profile.avatar != 'avatars/default.png':
-            # 构建旧头像的完整文件路径
-            old_avatar_path = os.path.join(settings.MEDIA_ROOT, str(profile.avatar))
-            # 检查旧头像文件是否存在，如果存在则删除
-            if os.path.exists(old_avatar_path):
-                try:
-                    os.remove(old_avatar_path)
-                except Exception as e:
-                    print(f"删除旧头像失败: {str(e)}")
+            _release_avatar(str(profile.avatar), profile.avatar_variants)
         
-        # 生成唯一的文件名
+        # 按内容摘要保存头像，相同的图片只保存一份
         file_extension = file.name.split('.')[-1].lower()  # 获取文件扩展名
-        unique_filename = f"{uuid.uuid4().hex}.{file_extension}"  # 生成唯一文件名
-        
-        # 创建上传目录（按年月日）
-        today = datetime.now()
-        upload_dir = f"avatars/{today.year}/{today.month}/{today.day}"
+        file_path = media_store.store(file, 'avatars', file_extension)
         
-        # 构建完整的文件路径
-        file_path = os.path.join(upload_dir, unique_filename)
-        
-        # 确保上传目录存在
-        os.makedirs(os.path.join(settings.MEDIA_ROOT, upload_dir), exist_ok=True)
-        
-        # 保存文件到指定路径
-        with open(os.path.join(settings.MEDIA_ROOT, file_path), 'wb+') as destination:
-            for chunk in file.chunks():
-                destination.write(chunk)
-        
-        # 设置头像路径
+        # 设置头像路径，并按模板中的显示尺寸生成缩略图
         profile.avatar = file_path
+        profile.refresh_avatar_variants()
         profile.save()
         
         # 返回成功响应
@@ -346,7 +321,8 @@ def upload_avatar(request) -> HttpResponse|JsonResponse|None:
             'code': 200,
             'msg': '头像上传成功',
             'data': {
-                'avatar_url': profile.avatar.url
+                'avatar_url': profile.avatar.url,
+                'avatar_urls': {size: profile.avatar_url(size) for size in avatars.AVATAR_SIZES}
             }
         })
     
@@ -415,9 +391,10 @@ def update_password(request):
     if user.check_password(new_password):
         return JsonResponse({'code': 400, 'msg': '新密码不能与旧密码相同'})
 
-    # 更新密码
+    # 更新密码，并更新会话中的密码摘要，修改密码后不会被登出
     user.set_password(new_password)
-    user.save()
+    user.save(update_fields=['password'])
+    update_session_auth_hash(request, user)
 
     # 返回成功响应
     return render(request, 'settings.html', {'user': user, 'msg': '密码更新成功'})
@@ -430,23 +407,43 @@ def user_page(request, user_id) -> HttpResponse:
     :param user_id: 用户ID
     :return: 渲染用户个人页面
     """
+    # 内容未变化时直接返回304：用户资料和博客列表的变化记录在用户的缓存版本号中，
+    # 点赞数和浏览量分别由点赞排序首页的版本号和浏览量计数代数体现
+    user_scope = page_cache.user_scope(user_id)
+    likes_scope = page_cache.feed_scope('most_likes')
+    etag = conditional.make_etag(
+        request, user_id, page_cache.version(user_scope),
+        page_cache.version(likes_scope), view_counter.generation(),
+    )
+    last_modified = max(
+        page_cache.last_modified(user_scope), page_cache.last_modified(likes_scope), view_counter.last_flush(),
+    )
+    not_modified = conditional.check(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+
     # 获取用户信息
     viewed_user = get_object_or_404(User, pk=user_id)
     
     # 获取用户资料
     user_profile, created = UserProfile.objects.get_or_create(user=viewed_user)
     
-    # 获取用户发布的博客，按创建时间倒序
-    user_blogs = Blog.objects.filter(author=viewed_user).order_by('-create_time')
-    
+    # 获取用户发布的博客，按创建时间倒序，卡片使用预先计算的摘要，不读取正文
+    user_blogs = Blog.objects.filter(author=viewed_user).select_related('category').defer('content').order_by('-create_time')
+    stats = user_blogs.aggregate(
+        total_blogs=Count('id'),
+        total_views=Sum('views_count'),
+        total_likes=Sum('likes_count'),
+    )
+
     # 准备上下文数据
     context = {
         'viewed_user': viewed_user,
         'user_profile': user_profile,
         'user_blogs': user_blogs,
-        'total_blogs': user_blogs.count(),
-        'total_views': sum(blog.views_count for blog in user_blogs),
-        'total_likes': sum(blog.likes_count for blog in user_blogs)
+        'total_blogs': stats['total_blogs'],
+        'total_views': stats['total_views'] or 0,
+        'total_likes': stats['total_likes'] or 0
     }
     
-    return render(request, 'user_page.html', context)
\ No newline at end of file
+    return conditional.set_headers(render(request, 'user_page.html', context), etag, last_modified)
\ No newline at end of file
@@ -11,6 +11,12 @@ class BlogCategoryAdmin(admin.ModelAdmin):
 class BlogAdmin(admin.ModelAdmin):
     """博客模型的Admin类"""
     list_display = ('title', 'content', 'create_time', 'update_time', 'category', 'author')
+    readonly_fields = ('rendered_content', 'images', 'outline')
+
+    def save_model(self, request, obj, form, change):
+        # 后台修改正文后同样重新预处理
+        obj.process_content()
+        super().save_model(request, obj, form, change)
 
 
 class BlogCommentAdmin(admin.ModelAdmin):
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BlgConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        # 导入signals以确保它们被注册
+        import blog.signals
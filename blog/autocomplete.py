@@ -0,0 +1,269 @@
+"""
+搜索框输入提示：进程内的前缀索引，避免每次按键都对数据库执行 icontains 查询。
+
+索引是按键排序的数组，用二分查找定位前缀范围（比逐字符的字典树节省大量内存）；
+每个前缀的前k个结果在首次查询后放入LRU缓存，条目变化时只清除受影响前缀的缓存。
+提示包括博客标题、分类名称和作者用户名，按浏览量排序（分类和作者按其博客的总浏览量）。
+
+索引在第一次查询时从数据库加载，之后由博客、分类、用户的保存/删除信号增量更新；
+浏览量的变化不触发信号，每隔 BLOG_AUTOCOMPLETE_RELOAD_INTERVAL 秒整体重新加载一次。
+每个进程各有一份索引，超过 BLOG_AUTOCOMPLETE_MEMORY_BUDGET 时只保留浏览量最高的条目。
+"""
+import bisect
+import heapq
+import re
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Sum
+from django.urls import reverse
+
+from .models import Blog, BlogCategory
+
+User = get_user_model()
+
+KINDS = ('blog', 'category', 'user')
+
+# 每个前缀缓存的结果数量（也是单次查询的最大数量），以及最多缓存的前缀数量
+MAX_SUGGESTIONS = 10
+MAX_CACHED_PREFIXES = 20000
+
+# 标题中英文单词的起始位置也作为索引键，输入标题中间的单词也能匹配
+WORD_START_RE = re.compile(r'(?<![a-z0-9])[a-z0-9]')
+
+# 每个条目除字符串以外的固定开销估算（元组、对象和列表槽位）
+ENTRY_OVERHEAD = 200
+
+
+def _memory_budget():
+    return getattr(settings, 'BLOG_AUTOCOMPLETE_MEMORY_BUDGET', 16 * 1024 * 1024)
+
+
+def _reload_interval():
+    return getattr(settings, 'BLOG_AUTOCOMPLETE_RELOAD_INTERVAL', 600)
+
+
+def normalize(text) -> str:
+    """统一全角/半角和大小写"""
+    return unicodedata.normalize('NFKC', text or '').lower().strip()
+
+
+@dataclass
+class Entry:
+    kind: str
+    object_id: int
+    label: str
+    weight: int
+    keys: list = field(default_factory=list)
+    size: int = 0
+
+
+def make_entry(kind, object_id, label, weight) -> Entry:
+    """生成条目及其索引键：完整名称，博客标题还包括其中每个英文单词开始的后缀"""
+    key = normalize(label)
+    keys = [key] if key else []
+    if kind == 'blog':
+        keys += [key[match.start():] for match in WORD_START_RE.finditer(key) if match.start() > 0]
+    size = ENTRY_OVERHEAD + sys.getsizeof(label) + sum(sys.getsizeof(key) + 64 for key in keys)
+    return Entry(kind, object_id, label, weight or 0, keys, size)
+
+
+class PrefixIndex:
+    """
+    按键排序的前缀索引
+    _keys 是排序的 (键, 类型, 对象ID) 列表，_entries 保存条目详情，_top 是前缀查询结果的LRU缓存
+    """
+
+    def __init__(self, entries=(), memory_budget=None):
+        self.memory_budget = memory_budget if memory_budget is not None else _memory_budget()
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._keys = []
+        self._top = OrderedDict()
+        self.memory = 0
+        self.dropped = 0
+        # 优先保留浏览量高的条目，超出内存预算的条目不进入索引
+        for entry in sorted(entries, key=lambda item: -item.weight):
+            if self.memory + entry.size > self.memory_budget:
+                self.dropped += 1
+                continue
+            self._entries[(entry.kind, entry.object_id)] = entry
+            self.memory += entry.size
+            self._keys.extend((key, entry.kind, entry.object_id) for key in entry.keys)
+        self._keys.sort()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _range(self, prefix):
+        lo = bisect.bisect_left(self._keys, (prefix,))
+        hi = bisect.bisect_left(self._keys, (prefix + '\U0010ffff',))
+        return lo, hi
+
+    def _top_k(self, prefix, kind):
+        lo, hi = self._range(prefix)
+        seen = set()
+        for _, entry_kind, object_id in self._keys[lo:hi]:
+            if kind is None or entry_kind == kind:
+                seen.add((entry_kind, object_id))
+        entries = (self._entries[ident] for ident in seen)
+        return heapq.nlargest(MAX_SUGGESTIONS, entries, key=lambda entry: (entry.weight, -entry.object_id))
+
+    def lookup(self, prefix, limit=MAX_SUGGESTIONS, kind=None):
+        """
+        前缀查询
+        :param prefix: 用户输入
+        :param limit: 返回数量，最多 MAX_SUGGESTIONS
+        :param kind: 只返回某一类条目（blog、category、user），为空时返回全部
+        :return: 按浏览量从高到低排列的条目列表
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        cache_key = (prefix, kind)
+        with self._lock:
+            top = self._top.get(cache_key)
+            if top is None:
+                top = self._top[cache_key] = self._top_k(prefix, kind)
+                if len(self._top) > MAX_CACHED_PREFIXES:
+                    self._top.popitem(last=False)
+            else:
+                self._top.move_to_end(cache_key)
+            return top[:limit]
+
+    def get(self, kind, object_id):
+        return self._entries.get((kind, object_id))
+
+    def upsert(self, entry):
+        """新增或更新条目，只清除受影响前缀的缓存"""
+        with self._lock:
+            old = self.remove(entry.kind, entry.object_id)
+            if old is None and self.memory + entry.size > self.memory_budget:
+                # 超出内存预算时不再加入新条目，等下次整体加载时按浏览量重新取舍
+                self.dropped += 1
+                return
+            self._entries[(entry.kind, entry.object_id)] = entry
+            self.memory += entry.size
+            for key in entry.keys:
+                bisect.insort(self._keys, (key, entry.kind, entry.object_id))
+            self._invalidate(entry.keys)
+
+    def remove(self, kind, object_id):
+        """删除条目，返回被删除的条目"""
+        with self._lock:
+            entry = self._entries.pop((kind, object_id), None)
+            if entry is None:
+                return None
+            self.memory -= entry.size
+            for key in entry.keys:
+                index = bisect.bisect_left(self._keys, (key, kind, object_id))
+                if index < len(self._keys) and self._keys[index] == (key, kind, object_id):
+                    del self._keys[index]
+            self._invalidate(entry.keys)
+            return entry
+
+    def _invalidate(self, keys):
+        prefixes = {key[:length] for key in keys for length in range(1, len(key) + 1)}
+        for kind in (None, *KINDS):
+            for prefix in prefixes:
+                self._top.pop((prefix, kind), None)
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._entries),
+            'keys': len(self._keys),
+            'memory': self.memory,
+            'memory_budget': self.memory_budget,
+            'dropped': self.dropped,
+            'cached_prefixes': len(self._top),
+        }
+
+
+def load_entries():
+    """从数据库读取所有条目，每类一次查询，不读取博客正文"""
+    entries = [
+        make_entry('blog', blog_id, title, views_count)
+        for blog_id, title, views_count in Blog.objects.values_list('id', 'title', 'views_count').iterator()
+    ]
+    entries += [
+        make_entry('category', category_id, name, views)
+        for category_id, name, views in BlogCategory.objects.annotate(views=Sum('blog__views_count'))
+        .values_list('id', 'name', 'views')
+    ]
+    entries += [
+        make_entry('user', user_id, username, views)
+        for user_id, username, views in User.objects.filter(is_active=True)
+        .annotate(views=Sum('blog__views_count')).values_list('id', 'username', 'views').iterator()
+    ]
+    return entries
+
+
+_index = None
+_loaded_at = 0.0
+_load_lock = threading.Lock()
+
+
+def _expired() -> bool:
+    interval = _reload_interval()
+    return bool(interval) and time.monotonic() - _loaded_at >= interval
+
+
+def get_index() -> PrefixIndex:
+    """获取当前进程的索引，首次调用或超过重新加载间隔时从数据库加载"""
+    global _index, _loaded_at
+    index = _index
+    if index is not None and not _expired():
+        return index
+    if index is None:
+        _load_lock.acquire()
+    elif not _load_lock.acquire(blocking=False):
+        # 其他线程正在重新加载，继续使用旧索引
+        return index
+    try:
+        if _index is None or _expired():
+            _index = PrefixIndex(load_entries())
+            _loaded_at = time.monotonic()
+        return _index
+    finally:
+        _load_lock.release()
+
+
+def reset():
+    """丢弃当前进程的索引，下次查询时重新加载"""
+    global _index
+    _index = None
+
+
+def update(kind, object_id, label, weight=None):
+    """
+    信号中调用：索引已加载时增量更新，未加载时不做任何事
+    :param weight: 浏览量，为空时沿用索引中原有的值（分类和作者的总浏览量在整体加载时计算）
+    """
+    index = _index
+    if index is None:
+        return
+    if weight is None:
+        old = index.get(kind, object_id)
+        weight = old.weight if old else 0
+    index.upsert(make_entry(kind, object_id, label, weight))
+
+
+def remove(kind, object_id):
+    if _index is not None:
+        _index.remove(kind, object_id)
+
+
+def entry_url(entry) -> str:
+    """提示条目的跳转地址，分类没有单独的页面，跳转到以分类名搜索的结果"""
+    if entry.kind == 'blog':
+        return reverse('blog:blog_detail', kwargs={'blog_id': entry.object_id})
+    if entry.kind == 'user':
+        return reverse('author:user_page', kwargs={'user_id': entry.object_id})
+    return f"{reverse('blog:search_blog')}?{urlencode({'Q': entry.label})}"
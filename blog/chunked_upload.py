@@ -0,0 +1,211 @@
+"""
+可续传的分片上传：init 创建会话 -> 多次 PUT 字节范围 -> finalize 校验并保存。
+
+请求体从 request 流中按固定大小的缓冲区读取并直接写入临时文件，不经过Django的上传处理器，
+也不会把整个文件读入内存；连接中断后客户端查询已接收的字节数，从该位置继续上传。
+全部接收后按文件头的魔数判断图片类型（不信任扩展名），再交给 media_store 按内容摘要保存，
+FileSystemStorage中临时文件被直接移动到目标位置，保存是原子的。
+"""
+import os
+import re
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import media_store
+from .models import ChunkedUpload
+
+# 文件头魔数 -> 扩展名
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+COPY_BUFFER_SIZE = 64 * 1024
+# 每个用户同时进行中的上传数量上限，避免占满临时目录
+MAX_ACTIVE_UPLOADS = 10
+
+
+class UploadError(Exception):
+    """分片上传的错误，status为返回的HTTP状态码，offset为服务器已接收的字节数（客户端据此续传）"""
+
+    def __init__(self, msg, status=400, offset=None):
+        super().__init__(msg)
+        self.msg = msg
+        self.status = status
+        self.offset = offset
+
+
+def max_size() -> int:
+    return getattr(settings, 'BLOG_CHUNKED_UPLOAD_MAX_SIZE', 20 * 1024 * 1024)
+
+
+def chunk_size() -> int:
+    return getattr(settings, 'BLOG_CHUNKED_UPLOAD_CHUNK_SIZE', 1024 * 1024)
+
+
+def expire_seconds() -> int:
+    return getattr(settings, 'BLOG_CHUNKED_UPLOAD_EXPIRE', 24 * 3600)
+
+
+def _upload_dir() -> str:
+    default = os.path.join(settings.FILE_UPLOAD_TEMP_DIR or tempfile.gettempdir(), 'blog-chunked-uploads')
+    return getattr(settings, 'BLOG_CHUNKED_UPLOAD_DIR', None) or default
+
+
+def part_path(upload_id) -> str:
+    return os.path.join(_upload_dir(), f'{upload_id}.part')
+
+
+def sniff_image(head) -> str | None:
+    """
+    按文件头判断图片类型
+    :param head: 文件开头的至少12个字节
+    :return: 扩展名，不是支持的图片格式时返回None
+    """
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    return None
+
+
+def _remove_part(upload_id):
+    try:
+        os.remove(part_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+
+def create(user, size, filename='') -> ChunkedUpload:
+    """
+    创建上传会话，并创建空的临时文件
+    :param size: 文件的总字节数
+    """
+    if size <= 0 or size > max_size():
+        raise UploadError(f'文件大小不能超过{max_size() // 1024 // 1024}MB')
+    if ChunkedUpload.objects.filter(user=user).count() >= MAX_ACTIVE_UPLOADS:
+        raise UploadError('进行中的上传过多，请稍后再试', status=429)
+    upload = ChunkedUpload(id=uuid.uuid4().hex, user=user, filename=filename[:255], size=size)
+    os.makedirs(_upload_dir(), exist_ok=True)
+    open(part_path(upload.id), 'xb').close()
+    upload.save(force_insert=True)
+    return upload
+
+
+def get(user, upload_id) -> ChunkedUpload:
+    upload = ChunkedUpload.objects.filter(pk=upload_id, user=user).first()
+    if upload is None:
+        raise UploadError('上传不存在或已过期', status=404)
+    return upload
+
+
+def write_chunk(upload, content_range, stream, content_length) -> int:
+    """
+    把一个字节范围写入临时文件
+    重复发送已接收的范围是安全的（内容相同），只有从已接收位置开始或与其重叠的范围才会被接受
+    :param content_range: Content-Range请求头，如 bytes 0-1048575/5242880
+    :param stream: 请求体的流，按缓冲区大小逐块读取
+    :param content_length: Content-Length请求头
+    :return: 写入后服务器已接收的字节数
+    """
+    match = CONTENT_RANGE_RE.match(content_range or '')
+    if not match:
+        raise UploadError('缺少或无效的Content-Range请求头', offset=upload.offset)
+    start, end, total = (int(value) for value in match.groups())
+    length = end - start + 1
+    if total != upload.size or end < start or end >= upload.size:
+        raise UploadError('字节范围与文件大小不符', status=416, offset=upload.offset)
+    if length > chunk_size():
+        raise UploadError(f'每个分片不能超过{chunk_size()}字节', status=413, offset=upload.offset)
+    if content_length != length:
+        raise UploadError('Content-Length与字节范围不符', offset=upload.offset)
+    if start > upload.offset:
+        # 中间有尚未接收的字节，客户端应从offset处继续
+        raise UploadError('分片不连续', status=409, offset=upload.offset)
+    if end < upload.offset:
+        return upload.offset
+
+    received = 0
+    with open(part_path(upload.id), 'r+b') as part:
+        part.seek(start)
+        while received < length:
+            data = stream.read(min(COPY_BUFFER_SIZE, length - received))
+            if not data:
+                break
+            part.write(data)
+            received += len(data)
+    if received != length:
+        # 连接中断，已写入的字节不计入，客户端重新发送该分片
+        raise UploadError('分片数据不完整', offset=upload.offset)
+
+    # 只向前推进，并发重复发送同一分片时不会回退
+    ChunkedUpload.objects.filter(pk=upload.pk, offset__gte=start, offset__lte=end).update(
+        offset=end + 1, update_time=timezone.now()
+    )
+    return ChunkedUpload.objects.values_list('offset', flat=True).get(pk=upload.pk)
+
+
+class _PartFile:
+    """让 media_store 直接对临时文件计算摘要并移动，而不是再复制一遍"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def finalize(upload, directory='uploads/images') -> str:
+    """
+    校验已接收的文件并保存到存储
+    :return: 文件在存储中的名称
+    """
+    upload_id = upload.id
+    path = part_path(upload_id)
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().filter(pk=upload.pk).first()
+        if upload is None:
+            raise UploadError('上传不存在或已过期', status=404)
+        if upload.offset != upload.size:
+            raise UploadError('文件尚未上传完成', status=409, offset=upload.offset)
+        with open(path, 'rb') as part:
+            extension = sniff_image(part.read(16))
+        upload.delete()
+        # 与普通上传一样，发布博客时才计入引用次数
+        name = media_store.store(_PartFile(path), directory, extension, acquire=False) if extension else None
+    # 不是图片，或内容已存在（临时文件没有被移动）时，在这里删除临时文件
+    _remove_part(upload_id)
+    if name is None:
+        raise UploadError('只允许上传jpg、png、gif、webp格式的图片')
+    return name
+
+
+def purge_expired(max_age) -> int:
+    """
+    删除超过max_age秒没有更新的上传会话及其临时文件，以及没有对应会话的临时文件
+    :return: 删除的会话数量
+    """
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    expired = list(ChunkedUpload.objects.filter(update_time__lt=cutoff).values_list('id', flat=True))
+    ChunkedUpload.objects.filter(id__in=expired).delete()
+    for upload_id in expired:
+        _remove_part(upload_id)
+
+    directory = _upload_dir()
+    if os.path.isdir(directory):
+        stale = time.time() - max_age
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.endswith('.part') and entry.stat().st_mtime < stale:
+                    if not ChunkedUpload.objects.filter(pk=entry.name[:-len('.part')]).exists():
+                        _remove_part(entry.name[:-len('.part')])
+    return len(expired)
@@ -0,0 +1,115 @@
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from . import counters
+from .models import BlogComment, CommentLike
+from .pagination import encode_cursor, keyset_paginate
+
+# 评论按创建时间倒序分页，游标标记与排序字段相同
+COMMENT_ORDER_FIELD = 'create_time'
+
+
+def _comment_queryset():
+    """评论查询集，一次性关联作者和头像信息"""
+    return BlogComment.objects.select_related('author', 'author__userprofile')
+
+
+def annotate_like_status(comments, user):
+    """
+    为评论设置当前用户的点赞状态，只需一次CommentLike查询
+    :param comments: 评论列表
+    :param user: 当前用户
+    """
+    liked_ids = set()
+    if user is not None and user.is_authenticated and comments:
+        liked_ids = set(CommentLike.objects.filter(
+            comment_id__in=[comment.id for comment in comments],
+            user=user
+        ).values_list('comment_id', flat=True))
+    for comment in comments:
+        comment.is_liked = comment.id in liked_ids
+
+
+def attach_reply_previews(roots, preview_size):
+    """
+    一次查询为每条顶级评论加载最新的preview_size条回复和回复总数
+    :param roots: 顶级评论列表
+    :param preview_size: 每条评论预先展示的回复数量
+    :return: 所有加载到的回复列表
+    """
+    by_id = {root.id: root for root in roots}
+    for root in roots:
+        root.children = []
+        root.reply_count = 0
+        root.replies_cursor = None
+    if not roots:
+        return []
+
+    order = [F(COMMENT_ORDER_FIELD).desc(), F('id').desc()]
+    replies = list(
+        _comment_queryset()
+        .filter(parent_comment_id__in=by_id)
+        .annotate(
+            thread_position=Window(RowNumber(), partition_by=F('parent_comment_id'), order_by=order),
+            thread_size=Window(Count('id'), partition_by=F('parent_comment_id')),
+        )
+        .filter(thread_position__lte=max(preview_size, 1))
+        .order_by('parent_comment_id', *order)
+    )
+
+    previews = []
+    for reply in replies:
+        parent = by_id[reply.parent_comment_id]
+        # 直接设置父评论对象，模板访问parent_comment时不再触发查询
+        reply.parent_comment = parent
+        parent.reply_count = reply.thread_size
+        if reply.thread_position <= preview_size:
+            parent.children.append(reply)
+            previews.append(reply)
+
+    for root in roots:
+        if root.children and root.reply_count > len(root.children):
+            # 剩余的回复从最后一条预览回复之后继续分页加载
+            last = root.children[-1]
+            root.replies_cursor = encode_cursor(COMMENT_ORDER_FIELD, last.create_time, last.id)
+    return previews
+
+
+def load_comment_page(blog, user=None, cursor=None, page_size=20, preview_size=3):
+    """
+    分页加载博客的顶级评论，并附带每条评论的最新几条回复，查询次数与评论数量无关
+    :param blog: 博客对象
+    :param user: 当前用户，用于标记点赞状态
+    :param cursor: 上一页返回的游标，为空时返回第一页
+    :param page_size: 每页顶级评论数量
+    :param preview_size: 每条评论预先展示的回复数量
+    :return: (顶级评论列表, 下一页游标或None)
+    """
+    roots, next_cursor = keyset_paginate(
+        _comment_queryset().filter(blog=blog, parent_comment__isnull=True),
+        COMMENT_ORDER_FIELD, cursor, page_size
+    )
+    previews = attach_reply_previews(roots, preview_size)
+    annotate_like_status(roots + previews, user)
+    counters.apply_pending('comment', roots + previews)
+    return roots, next_cursor
+
+
+def load_replies(parent, user=None, cursor=None, page_size=20):
+    """
+    分页加载某条评论的回复
+    :param parent: 父评论对象
+    :param user: 当前用户，用于标记点赞状态
+    :param cursor: 上一页返回的游标，为空时返回第一页
+    :param page_size: 每页回复数量
+    :return: (回复列表, 下一页游标或None)
+    """
+    replies, next_cursor = keyset_paginate(
+        _comment_queryset().filter(parent_comment=parent),
+        COMMENT_ORDER_FIELD, cursor, page_size
+    )
+    for reply in replies:
+        reply.parent_comment = parent
+    annotate_like_status(replies, user)
+    counters.apply_pending('comment', replies)
+    return replies, next_cursor
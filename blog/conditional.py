@@ -0,0 +1,76 @@
+"""
+条件GET：根据缓存版本号、浏览量代数和更新时间计算ETag/Last-Modified，不需要渲染页面。
+浏览器或反向代理带着If-None-Match/If-Modified-Since重新请求时，内容未变化则直接返回304。
+
+页面顶部导航栏显示当前用户，表单中带有CSRF Token，所以ETag中包含访客的身份（用户ID、用户资料版本号和CSRF Cookie），
+不同访客之间不会误用彼此的缓存。
+"""
+import hashlib
+
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from . import page_cache
+
+
+def _viewer_parts(request):
+    # 页面中的表单会使用CSRF Token，首次访问时在这里生成，保证304和200响应计算出相同的ETag
+    get_token(request)
+    csrf_secret = request.META.get('CSRF_COOKIE', '')
+    parts = [hashlib.md5(csrf_secret.encode()).hexdigest()]
+    if request.user.is_authenticated:
+        parts += [request.user.pk, page_cache.version(page_cache.user_scope(request.user.pk))]
+    return parts
+
+
+def make_etag(request, *parts) -> str:
+    """
+    根据页面内容的版本信息和当前访客计算ETag
+    :param request: 请求对象
+    :param parts: 页面内容的版本信息（版本号、时间戳等）
+    :return: 带引号的ETag
+    """
+    raw = '|'.join(str(part) for part in (*parts, *_viewer_parts(request)))
+    return f'"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+
+def _timestamp(value):
+    # 同时支持datetime和时间戳，HTTP日期只精确到秒
+    if value is None:
+        return None
+    if hasattr(value, 'timestamp'):
+        value = value.timestamp()
+    return int(value)
+
+
+def check(request, etag, last_modified=None):
+    """
+    验证请求中的条件头
+    :param request: 请求对象
+    :param etag: make_etag生成的ETag
+    :param last_modified: 最后修改时间（datetime或时间戳）
+    :return: 内容未变化时返回304响应，否则返回None
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    response = get_conditional_response(request, etag=etag, last_modified=_timestamp(last_modified))
+    if response is not None:
+        _patch_headers(response, etag, last_modified)
+    return response
+
+
+def set_headers(response, etag, last_modified=None):
+    """给完整渲染的200响应加上ETag和Last-Modified"""
+    if etag is not None and response.status_code == 200:
+        _patch_headers(response, etag, last_modified)
+    return response
+
+
+def _patch_headers(response, etag, last_modified):
+    response.headers['ETag'] = etag
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(_timestamp(last_modified))
+    # 每次使用缓存前都需要重新验证，内容随登录状态变化
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
@@ -0,0 +1,54 @@
+import html
+import math
+import re
+
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+# 卡片摘要的最大字符数，与原模板中的 truncatechars:120 保持一致
+EXCERPT_LENGTH = 120
+
+# 阅读速度（每分钟字数），中文按字计，英文按词计
+READING_SPEED = 300
+
+CJK_CHAR_RE = re.compile(r'[㐀-䶿一-鿿豈-﫿]')
+LATIN_WORD_RE = re.compile(r'[A-Za-z0-9]+(?:[\'\-][A-Za-z0-9]+)*')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def html_to_text(content) -> str:
+    """将富文本内容转换为纯文本：去除标签、还原实体并合并空白"""
+    text = html.unescape(strip_tags(content or ''))
+    return WHITESPACE_RE.sub(' ', text).strip()
+
+
+def build_excerpt(text) -> str:
+    """根据纯文本生成卡片摘要"""
+    return Truncator(text).chars(EXCERPT_LENGTH)
+
+
+def count_words(text) -> int:
+    """统计字数：每个中日韩字符计为一个字，英文和数字按单词计"""
+    return len(CJK_CHAR_RE.findall(text)) + len(LATIN_WORD_RE.findall(text))
+
+
+def estimate_reading_time(word_count) -> int:
+    """估算阅读时间（分钟），非空内容至少为1分钟"""
+    if word_count <= 0:
+        return 0
+    return max(1, math.ceil(word_count / READING_SPEED))
+
+
+def summarize(content) -> dict:
+    """
+    计算列表页卡片需要的派生字段
+    :param content: 博客的富文本内容
+    :return: 包含excerpt、word_count、reading_time的字典
+    """
+    text = html_to_text(content)
+    word_count = count_words(text)
+    return {
+        'excerpt': build_excerpt(text),
+        'word_count': word_count,
+        'reading_time': estimate_reading_time(word_count),
+    }
@@ -0,0 +1,142 @@
+"""
+点赞分片计数：开启后（BLOG_LIKE_COUNTER_SHARDS > 0）点赞增量写入随机的分片行，而不是每次都
+UPDATE同一行 Blog/BlogComment，热门博客的点赞不再在同一行上排队等锁。
+
+展示的点赞数 = likes_count 字段 + 未合并的分片增量，分片合计会短时间缓存；
+fold_like_shards 命令定期把分片增量合并回 likes_count 字段。
+"""
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from .models import Blog, BlogComment, LikeCounterShard
+
+TARGET_MODELS = {
+    'blog': Blog,
+    'comment': BlogComment,
+}
+
+KEY_PREFIX = 'blog:likes'
+
+
+def shard_count() -> int:
+    return getattr(settings, 'BLOG_LIKE_COUNTER_SHARDS', 0)
+
+
+def sharding_enabled() -> bool:
+    return shard_count() > 0
+
+
+def _cache_key(kind, object_id):
+    return f'{KEY_PREFIX}:{kind}:{object_id}'
+
+
+def _cache_ttl():
+    return getattr(settings, 'BLOG_LIKE_COUNTER_CACHE_TTL', 5)
+
+
+def increment(kind, object_id, delta):
+    """
+    把点赞增量写入一个随机分片
+    :param kind: 对象类型（blog、comment）
+    :param object_id: 对象ID
+    :param delta: 增量（1或-1）
+    """
+    shard = random.randrange(shard_count())
+    shard_row = LikeCounterShard.objects.filter(target_type=kind, object_id=object_id, shard=shard)
+    if not shard_row.update(delta=F('delta') + delta):
+        try:
+            # 使用保存点，分片行被并发创建时只回滚这一次插入
+            with transaction.atomic():
+                LikeCounterShard.objects.create(target_type=kind, object_id=object_id, shard=shard, delta=delta)
+        except IntegrityError:
+            shard_row.update(delta=F('delta') + delta)
+    cache.delete(_cache_key(kind, object_id))
+
+
+def _sum_shards(kind, object_ids) -> dict:
+    rows = (
+        LikeCounterShard.objects.filter(target_type=kind, object_id__in=object_ids)
+        .order_by().values_list('object_id').annotate(total=Sum('delta'))
+    )
+    return {object_id: total or 0 for object_id, total in rows}
+
+
+def pending_counts(kind, object_ids) -> dict:
+    """
+    获取未合并的分片增量，优先读取缓存，缓存未命中的对象一次查询补齐
+    :return: {对象ID: 增量}
+    """
+    keys = {_cache_key(kind, object_id): object_id for object_id in object_ids}
+    cached = cache.get_many(list(keys))
+    counts = {keys[key]: value for key, value in cached.items()}
+    missing = [object_id for object_id in object_ids if object_id not in counts]
+    if missing:
+        sums = _sum_shards(kind, missing)
+        fresh = {object_id: sums.get(object_id, 0) for object_id in missing}
+        cache.set_many({_cache_key(kind, object_id): value for object_id, value in fresh.items()}, _cache_ttl())
+        counts.update(fresh)
+    return counts
+
+
+def apply_pending(kind, objects):
+    """把未合并的分片增量加到对象的likes_count属性上（仅用于展示，不保存），未开启分片时不做任何查询"""
+    if not sharding_enabled() or not objects:
+        return
+    counts = pending_counts(kind, [obj.id for obj in objects])
+    for obj in objects:
+        obj.likes_count += counts.get(obj.id, 0)
+
+
+def current_count(kind, object_id) -> int:
+    """读取最新的点赞数（字段值 + 分片增量），不存在时抛出DoesNotExist"""
+    model = TARGET_MODELS[kind]
+    base = model.objects.filter(pk=object_id).values_list('likes_count', flat=True).get()
+    pending = _sum_shards(kind, [object_id]).get(object_id, 0)
+    cache.set(_cache_key(kind, object_id), pending, _cache_ttl())
+    return base + pending
+
+
+def fold(chunk_size=500) -> int:
+    """
+    把分片增量合并回likes_count字段
+    :param chunk_size: 每批处理的对象数量
+    :return: 合并的对象数量
+    """
+    folded = 0
+    last = ('', 0)
+    while True:
+        targets = list(
+            LikeCounterShard.objects.exclude(delta=0)
+            .filter(target_type__gte=last[0])
+            .exclude(target_type=last[0], object_id__lte=last[1])
+            .order_by('target_type', 'object_id')
+            .values_list('target_type', 'object_id').distinct()[:chunk_size]
+        )
+        if not targets:
+            break
+        for kind, object_id in targets:
+            _fold_one(kind, object_id)
+        folded += len(targets)
+        last = targets[-1]
+    return folded
+
+
+def _fold_one(kind, object_id):
+    shards = list(
+        LikeCounterShard.objects.filter(target_type=kind, object_id=object_id)
+        .exclude(delta=0).values_list('id', 'delta')
+    )
+    total = sum(delta for _, delta in shards)
+    with transaction.atomic():
+        if not TARGET_MODELS[kind].objects.filter(pk=object_id).update(likes_count=F('likes_count') + total):
+            # 对象已被删除，分片没有保留的意义
+            LikeCounterShard.objects.filter(target_type=kind, object_id=object_id).delete()
+        else:
+            # 只减去读到的增量，合并期间并发写入的增量保留在分片中
+            for shard_id, delta in shards:
+                LikeCounterShard.objects.filter(pk=shard_id).update(delta=F('delta') - delta)
+    cache.delete(_cache_key(kind, object_id))
@@ -32,6 +32,14 @@ class BlogForm(forms.ModelForm):
             raise forms.ValidationError('请选择博客分类')
         return category_id
 
+    def save(self, commit=True):
+        # 发布时清理并预处理正文，同时计算大纲、图片以及列表页使用的摘要、字数和阅读时间
+        blog = super().save(commit=False)
+        blog.process_content()
+        if commit:
+            blog.save()
+        return blog
+
     class Meta:
         model = Blog
         fields = ['title', 'content', 'category']
@@ -0,0 +1,199 @@
+"""
+编辑器上传图片的派生图：按几种宽度缩放，并为每种尺寸生成WebP版本。
+
+派生图的文件名由原图文件名推导（photo.jpg -> photo_w640.jpg、photo_w640.webp、photo.webp），
+不需要额外记录；生成工作在后台线程池中执行，上传请求只读取图片头部后立即返回。
+发布博客时正文处理流程根据已生成的派生图为 <img> 补充srcset，并用 <picture> 提供WebP版本；
+派生图生成完成前已经发布的博客，在生成完成后重新处理。进程重启时丢失的任务由 generate_image_derivatives 补齐。
+"""
+import io
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+# 生成派生图的格式（扩展名 -> Pillow格式），GIF可能是动图，缩放会丢失动画，不生成派生图
+SOURCE_FORMATS = {'jpg': 'JPEG', 'jpeg': 'JPEG', 'png': 'PNG', 'webp': 'WEBP'}
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+
+def _widths():
+    return sorted(getattr(settings, 'BLOG_IMAGE_WIDTHS', (320, 640, 1280, 1920)))
+
+
+def _workers():
+    return getattr(settings, 'BLOG_IMAGE_WORKERS', 2)
+
+
+def sizes_attr() -> str:
+    return getattr(settings, 'BLOG_IMAGE_SIZES', '(max-width: 1400px) 100vw, 1224px')
+
+
+def _split(name):
+    stem, ext = posixpath.splitext(name)
+    return stem, ext[1:].lower()
+
+
+def supports_derivatives(name) -> bool:
+    return _split(name)[1] in SOURCE_FORMATS
+
+
+def derivative_widths(width) -> list:
+    """原图宽度为width时需要生成的缩放宽度，只缩小不放大"""
+    return [target for target in _widths() if target < width]
+
+
+def derivative_name(name, width=None, webp=False) -> str:
+    """
+    派生图在存储中的文件名
+    :param name: 原图文件名
+    :param width: 缩放宽度，为空时表示原尺寸
+    :param webp: 是否为WebP版本
+    """
+    stem, ext = _split(name)
+    suffix = f'_w{width}' if width else ''
+    return f"{stem}{suffix}.{'webp' if webp else ext}"
+
+
+def variants(name, width):
+    """
+    原图宽度为width时所有派生图，按宽度从小到大排列
+    :return: [(宽度, 原格式的文件名, WebP的文件名)]，最后一项为原尺寸（原格式即原图本身）
+    """
+    items = [(target, derivative_name(name, target), derivative_name(name, target, webp=True))
+             for target in derivative_widths(width)]
+    items.append((width, name, derivative_name(name, webp=True)))
+    return items
+
+
+def build_srcset(url, name, items, webp=False) -> str:
+    """
+    构造srcset
+    :param url: 原图在正文中的地址，派生图地址使用相同的前缀
+    :param name: 原图在存储中的文件名
+    :param items: variants() 或 existing_variants() 的结果
+    :param webp: 是否使用WebP版本，缺少WebP版本的尺寸会被跳过
+    """
+    prefix = url[:len(url) - len(name)] if url.endswith(name) else '/'
+    candidates = []
+    for target, plain_name, webp_name in items:
+        output_name = webp_name if webp else plain_name
+        if output_name:
+            candidates.append(f'{prefix}{output_name} {target}w')
+    return ', '.join(candidates)
+
+
+def generate(name) -> list:
+    """
+    为原图生成所有缺少的派生图
+    :param name: 原图在存储中的文件名
+    :return: 新生成的文件名列表
+    """
+    from PIL import Image, ImageOps
+
+    image_format = SOURCE_FORMATS.get(_split(name)[1])
+    if image_format is None:
+        return []
+    created = []
+    with default_storage.open(name) as file, Image.open(file) as image:
+        # 按EXIF方向旋转，否则手机照片缩放后方向错误
+        image = ImageOps.exif_transpose(image)
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        for target, plain_name, webp_name in variants(name, image.width):
+            resized = None
+            for output_name, output_format in ((plain_name, image_format), (webp_name, 'WEBP')):
+                if output_name == name or default_storage.exists(output_name):
+                    continue
+                if resized is None:
+                    height = max(1, round(image.height * target / image.width))
+                    resized = image if target == image.width else image.resize((target, height), Image.LANCZOS)
+                default_storage.save(output_name, ContentFile(_encode(resized, output_format)))
+                created.append(output_name)
+    return created
+
+
+def _encode(image, image_format) -> bytes:
+    buffer = io.BytesIO()
+    if image_format == 'JPEG':
+        image.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    elif image_format == 'WEBP':
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    else:
+        image.save(buffer, image_format, optimize=True)
+    return buffer.getvalue()
+
+
+def delete_derivatives(name):
+    """删除原图的所有派生图，原图被删除时调用；派生图按文件名推导，不存在的文件忽略"""
+    if not supports_derivatives(name):
+        return
+    names = [derivative_name(name, webp=True)]
+    for target in _widths():
+        names.extend((derivative_name(name, target), derivative_name(name, target, webp=True)))
+    for output_name in names:
+        default_storage.delete(output_name)
+
+
+def existing_variants(name, width):
+    """已经生成的派生图（后台任务尚未完成或失败时只返回存在的部分）"""
+    return [
+        (target, plain_name, webp_name if default_storage.exists(webp_name) else None)
+        for target, plain_name, webp_name in variants(name, width)
+        if plain_name == name or default_storage.exists(plain_name)
+    ]
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=_workers(), thread_name_prefix='blog-images')
+    return _executor
+
+
+def reprocess_referencing(name) -> int:
+    """
+    重新处理正文引用了该图片的博客，补充新生成的派生图的srcset
+    :param name: 原图在存储中的文件名
+    :return: 更新的博客数量
+    """
+    from . import page_cache, rendering
+    from .models import Blog
+
+    updated = []
+    for blog_id, content in Blog.objects.filter(content__contains=name).values_list('id', 'content'):
+        processed = rendering.process(content)
+        # 正文在处理期间被修改时不覆盖，修改时保存的处理结果已经使用了现有的派生图
+        if Blog.objects.filter(pk=blog_id, content=content).update(**processed):
+            updated.append(blog_id)
+    page_cache.invalidate(*(page_cache.blog_scope(blog_id) for blog_id in updated))
+    return len(updated)
+
+
+def _generate_logged(name):
+    try:
+        created = generate(name)
+        if created:
+            reprocess_referencing(name)
+        return created
+    except Exception:
+        logger.exception('生成图片派生图失败: %s', name)
+        return []
+
+
+def schedule(name):
+    """在后台线程池中生成派生图，立即返回Future"""
+    return _get_executor().submit(_generate_logged, name)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import Blog
+
+
+class Command(BaseCommand):
+    help = '为已有博客回填摘要、字数和阅读时间字段'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='每批处理的博客数量')
+        parser.add_argument('--only-missing', action='store_true', help='只处理摘要为空的博客')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        queryset = Blog.objects.only('id', 'content')
+        if options['only_missing']:
+            queryset = queryset.filter(excerpt='')
+
+        # 按id分批读取，避免一次性把所有正文加载到内存
+        last_id = 0
+        total = 0
+        while True:
+            blogs = list(queryset.filter(id__gt=last_id).order_by('id')[:chunk_size])
+            if not blogs:
+                break
+            for blog in blogs:
+                blog.refresh_summary()
+            Blog.objects.bulk_update(blogs, ['excerpt', 'word_count', 'reading_time'])
+            last_id = blogs[-1].id
+            total += len(blogs)
+            self.stdout.write(f'已处理 {total} 篇博客')
+
+        self.stdout.write(self.style.SUCCESS(f'回填完成，共处理 {total} 篇博客'))
@@ -0,0 +1,69 @@
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from blog import autocomplete
+
+WORDS = ['django', 'python', 'mysql', 'cache', 'index', 'query', 'template', 'signal', 'redis', 'nginx',
+         '数据库', '性能优化', '缓存', '全文检索', '模板', '并发', '消息队列', '分布式', '入门', '实战']
+
+
+class Command(BaseCommand):
+    help = '输入提示前缀索引的微基准测试：构建耗时、内存占用和查询延迟（p50/p99），不访问数据库'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=50000, help='生成的博客标题数量')
+        parser.add_argument('--lookups', type=int, default=20000, help='查询次数')
+        parser.add_argument('--budget', type=int, default=None, help='内存预算（字节），默认使用配置')
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        entries = [
+            autocomplete.make_entry(
+                'blog', i, ' '.join(random.choice(WORDS) for _ in range(random.randint(2, 6))),
+                random.randint(0, 100000)
+            )
+            for i in range(options['entries'])
+        ]
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        index = autocomplete.PrefixIndex(entries, memory_budget=options['budget'])
+        build_time = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # 随机截取已有标题的前缀作为查询，覆盖1个字到整个单词的长度
+        prefixes = []
+        for _ in range(options['lookups']):
+            word = random.choice(WORDS)
+            prefixes.append(word[:random.randint(1, len(word))])
+
+        # 第一轮缓存为空（冷），第二轮前缀结果已缓存（热）
+        rounds = []
+        for _ in range(2):
+            latencies = []
+            for prefix in prefixes:
+                start = time.perf_counter()
+                index.lookup(prefix, limit=8)
+                latencies.append((time.perf_counter() - start) * 1e6)
+            latencies.sort()
+            rounds.append(latencies)
+
+        stats = index.stats()
+        self.stdout.write(
+            f"条目 {stats['entries']}（超出预算丢弃 {stats['dropped']}），索引键 {stats['keys']}，"
+            f"构建耗时 {build_time * 1000:.0f}ms"
+        )
+        self.stdout.write(
+            f"估算内存 {stats['memory'] / 1024 / 1024:.1f}MB / 预算 {stats['memory_budget'] / 1024 / 1024:.1f}MB，"
+            f"构建时实际分配峰值 {peak / 1024 / 1024:.1f}MB"
+        )
+        for label, latencies in zip(('冷缓存', '热缓存'), rounds):
+            self.stdout.write(
+                f'{label}查询 {len(latencies)} 次：p50 {statistics.median(latencies):.1f}μs，'
+                f'p99 {latencies[int(len(latencies) * 0.99)]:.1f}μs，最大 {latencies[-1]:.1f}μs'
+            )
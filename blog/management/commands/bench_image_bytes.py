@@ -0,0 +1,116 @@
+import io
+import os
+import re
+import uuid
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from blog import images, rendering
+
+# (视口宽度, 设备像素比)
+VIEWPORTS = [(375, 3), (390, 2), (768, 2), (1366, 1), (1920, 1), (1920, 2)]
+
+SIZES_ITEM_RE = re.compile(r'^\(max-width:\s*(\d+)px\)\s*(\d+)(vw|px)$')
+
+
+def slot_width(sizes, viewport) -> float:
+    """按sizes属性计算图片在视口中的显示宽度（只支持 (max-width: Npx) 加vw/px 的写法）"""
+    for item in (part.strip() for part in sizes.split(',')):
+        match = SIZES_ITEM_RE.match(item)
+        if match:
+            if viewport <= int(match.group(1)):
+                return viewport * int(match.group(2)) / 100 if match.group(3) == 'vw' else int(match.group(2))
+            continue
+        value = int(item[:-2])
+        return viewport * value / 100 if item.endswith('vw') else value
+    return viewport
+
+
+def choose(candidates, slot, dpr):
+    """按浏览器的规则选择srcset候选：像素密度不低于设备像素比的最小候选，都不满足时选最大的"""
+    for width, name in sorted(candidates):
+        if width / slot >= dpr:
+            return name
+    return max(candidates)[1]
+
+
+class Command(BaseCommand):
+    help = '对比详情页图片的传输字节数：直接使用原图 vs srcset选择缩放图（原格式和WebP）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--photos', type=int, default=6, help='生成的测试照片数量（JPEG）')
+        parser.add_argument('--screenshots', type=int, default=2, help='生成的测试截图数量（PNG）')
+        parser.add_argument('--width', type=int, default=3000, help='测试照片的宽度')
+
+    def handle(self, *args, **options):
+        directory = f'uploads/images/bench-{uuid.uuid4().hex[:8]}'
+        names = []
+        try:
+            for i in range(options['photos']):
+                names.append(self.save(f'{directory}/photo{i}.jpg', self.make_photo(options['width']), 'JPEG'))
+            for i in range(options['screenshots']):
+                names.append(self.save(f'{directory}/screen{i}.png', self.make_screenshot(), 'PNG'))
+            for name in names:
+                images.generate(name)
+
+            # 与发布时相同的处理流程，确认正文中输出了srcset和WebP版本
+            rendered = rendering.process(''.join(f'<p><img src="/{name}"></p>' for name in names))['rendered_content']
+            self.stdout.write(
+                f"{len(names)} 张图片，正文中 srcset {rendered.count(' srcset=')} 处，<picture> {rendered.count('<picture>')} 处"
+            )
+
+            sizes = images.sizes_attr()
+            variants = {}
+            for name in names:
+                width = rendering.image_size(name)[0]
+                variants[name] = images.existing_variants(name, width)
+            original_bytes = sum(default_storage.size(name) for name in names)
+
+            self.stdout.write(f"{'视口':>12} {'原图':>10} {'srcset':>10} {'WebP':>10} {'节省':>8}")
+            for viewport, dpr in VIEWPORTS:
+                slot = slot_width(sizes, viewport)
+                plain_bytes = webp_bytes = 0
+                for name in names:
+                    items = variants[name]
+                    plain_bytes += default_storage.size(choose([(w, plain) for w, plain, _ in items], slot, dpr))
+                    webp = [(w, webp_name) for w, _, webp_name in items if webp_name]
+                    webp_bytes += default_storage.size(choose(webp, slot, dpr)) if webp else 0
+                saved = 1 - webp_bytes / original_bytes
+                self.stdout.write(
+                    f'{f"{viewport}px@{dpr}x":>12} {original_bytes / 1024:>8.0f}KB {plain_bytes / 1024:>8.0f}KB '
+                    f'{webp_bytes / 1024:>8.0f}KB {saved:>8.0%}'
+                )
+        finally:
+            files = default_storage.listdir(directory)[1] if default_storage.exists(directory) else []
+            for file in files:
+                default_storage.delete(f'{directory}/{file}')
+            try:
+                os.rmdir(default_storage.path(directory))
+            except (NotImplementedError, OSError):
+                pass
+
+    def save(self, name, image, image_format):
+        buffer = io.BytesIO()
+        image.save(buffer, image_format, quality=92)
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def make_photo(self, width):
+        """带噪点的渐变图，压缩率接近真实照片"""
+        from PIL import Image
+
+        height = width * 2 // 3
+        noise = Image.effect_noise((width, height), 40).convert('RGB')
+        gradient = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+        return Image.blend(gradient, noise, 0.35)
+
+    def make_screenshot(self):
+        """色块和线条组成的截图"""
+        from PIL import Image, ImageDraw
+
+        image = Image.new('RGB', (1920, 1080), 'white')
+        draw = ImageDraw.Draw(image)
+        for i in range(0, 1080, 24):
+            draw.rectangle((40, i, 40 + (i * 7) % 1600, i + 12), fill=((i * 3) % 255, 120, 200))
+        return image
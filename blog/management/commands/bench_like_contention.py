@@ -0,0 +1,107 @@
+import statistics
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from blog import reactions
+from blog.models import Blog, BlogCategory, LikeCounterShard
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = '多线程并发点赞同一篇博客，对比开启分片计数前后的点赞延迟和行锁等待时间（在本地数据库上运行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='并发线程数')
+        parser.add_argument('--toggles', type=int, default=50, help='每个线程的点赞/取消点赞次数')
+        parser.add_argument('--shards', type=int, default=16, help='开启分片计数时的分片数量')
+        parser.add_argument(
+            '--confirm', action='store_true',
+            help='确认在当前配置的数据库中创建测试用户和博客（结束后删除）',
+        )
+
+    def handle(self, *args, **options):
+        # 并发线程使用各自的数据库连接，测试数据必须提交后才可见，无法放在回滚的事务中
+        if not options['confirm']:
+            raise CommandError(
+                f"该命令会在数据库 {connection.settings_dict['NAME']} 中创建测试用户和博客，"
+                f'请在本地数据库上运行并添加 --confirm 参数'
+            )
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('SQLite使用库级锁，结果不能反映行锁竞争，请在MySQL上运行'))
+
+        tag = uuid.uuid4().hex[:8]
+        category = BlogCategory.objects.create(name=f'bench-{tag}')
+        users = [
+            User.objects.create_user(username=f'bench_{tag}_{i}', password=None)
+            for i in range(options['threads'])
+        ]
+        blog = Blog.objects.create(title='点赞压测', content='', category=category, author=users[0])
+        try:
+            for shards in (0, options['shards']):
+                with override_settings(BLOG_LIKE_COUNTER_SHARDS=shards):
+                    self.run_round(blog, users, options['toggles'], shards)
+        finally:
+            LikeCounterShard.objects.filter(target_type='blog', object_id=blog.id).delete()
+            blog.delete()
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+            category.delete()
+
+    def run_round(self, blog, users, toggles, shards):
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def worker(user):
+            local = []
+            try:
+                for _ in range(toggles):
+                    start = time.perf_counter()
+                    reactions.toggle_blog_like(blog.id, user)
+                    local.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+            with lock:
+                latencies.extend(local)
+
+        before = self.row_lock_status()
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        after = self.row_lock_status()
+
+        label = f'分片数 {shards}' if shards else '不分片'
+        self.stdout.write(f'[{label}] {len(latencies)} 次操作，耗时 {elapsed:.2f}s，吞吐 {len(latencies) / elapsed:.0f} ops/s')
+        if latencies:
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            self.stdout.write(
+                f'  延迟 p50 {statistics.median(latencies) * 1000:.2f}ms，p99 {p99 * 1000:.2f}ms'
+            )
+        if before and after:
+            self.stdout.write(
+                f"  行锁等待 {after['Innodb_row_lock_waits'] - before['Innodb_row_lock_waits']} 次，"
+                f"累计等待 {after['Innodb_row_lock_time'] - before['Innodb_row_lock_time']}ms"
+            )
+        if errors:
+            self.stdout.write(self.style.ERROR(f'  {len(errors)} 个线程出错: {errors[0]}'))
+
+    def row_lock_status(self):
+        """读取MySQL的InnoDB行锁统计，其他数据库返回None"""
+        if connection.vendor != 'mysql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute("SHOW GLOBAL STATUS LIKE 'Innodb_row_lock_%%'")
+            return {name: int(value) for name, value in cursor.fetchall()}
@@ -0,0 +1,92 @@
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.urls import resolve
+
+from blog import ratelimit
+
+
+class Command(BaseCommand):
+    help = '频率限制的微基准测试：使用本地内存缓存时每个请求的检查耗时，不访问数据库'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100000, help='请求次数')
+        parser.add_argument('--clients', type=int, default=1000, help='不同客户端IP的数量')
+        parser.add_argument('--rules', type=int, default=1, choices=(1, 2), help='每个请求检查的规则数量')
+
+    def handle(self, *args, **options):
+        cache = LocMemCache('bench-rate-limit', {'OPTIONS': {'MAX_ENTRIES': 100000}})
+        rates = {'ip': '1000000/m', 'user': '1000000/h'} if options['rules'] == 2 else {'ip': '1000000/m'}
+        rules = ratelimit.compile_rules(rates, 'bench')
+        factory = RequestFactory()
+        requests = []
+        for i in range(options['clients']):
+            request = factory.post('/', REMOTE_ADDR=f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}')
+            request.user = AnonymousUser()
+            requests.append(request)
+
+        # 预热：为每个客户端创建当前窗口的计数
+        for request in requests:
+            ratelimit.check(request, rules, cache)
+
+        latencies = []
+        clients = len(requests)
+        for i in range(options['requests']):
+            request = requests[i % clients]
+            start = time.perf_counter()
+            ratelimit.check(request, rules, cache)
+            latencies.append((time.perf_counter() - start) * 1e6)
+        latencies.sort()
+
+        # 被拒绝的请求：当前窗口已超出，不读取上一窗口
+        limited = ratelimit.compile_rules({'ip': '1/h'}, 'bench-limited')
+        ratelimit.check(requests[0], limited, cache)
+        rejected = []
+        for _ in range(min(options['requests'], 10000)):
+            start = time.perf_counter()
+            ratelimit.check(requests[0], limited, cache)
+            rejected.append((time.perf_counter() - start) * 1e6)
+        rejected.sort()
+
+        # 对照：一次缓存读取；没有配置规则的请求（大多数请求）经过中间件的耗时
+        baseline = []
+        for _ in range(min(options['requests'], 10000)):
+            start = time.perf_counter()
+            cache.get('bench-baseline')
+            baseline.append((time.perf_counter() - start) * 1e6)
+        baseline.sort()
+        middleware = ratelimit.RateLimitMiddleware(lambda request: None)
+        request = requests[0]
+        request.resolver_match = resolve('/')
+        unmatched = []
+        for _ in range(min(options['requests'], 10000)):
+            start = time.perf_counter()
+            middleware.process_view(request, None, (), {})
+            unmatched.append((time.perf_counter() - start) * 1e6)
+        unmatched.sort()
+        # 对照：rate_limit 装饰器在GET请求（不计数）上的开销
+        view = ratelimit.rate_limit(name='bench-decorated', ip='1/h')(lambda request: None)
+        safe_request = factory.get('/')
+        decorated = []
+        for _ in range(min(options['requests'], 10000)):
+            start = time.perf_counter()
+            view(safe_request)
+            decorated.append((time.perf_counter() - start) * 1e6)
+        decorated.sort()
+
+        def summary(values):
+            return (
+                f'平均 {statistics.fmean(values):.2f}µs，p50 {values[len(values) // 2]:.2f}µs，'
+                f'p99 {values[int(len(values) * 0.99)]:.2f}µs'
+            )
+
+        self.stdout.write(f"{options['requests']} 次请求，{clients} 个客户端，每个请求 {len(rules)} 条规则")
+        self.stdout.write(f'允许的请求：{summary(latencies)}')
+        self.stdout.write(f'被拒绝的请求：{summary(rejected)}')
+        self.stdout.write(f'对照-一次本地内存缓存读取：{summary(baseline)}')
+        self.stdout.write(f'对照-没有规则的请求经过中间件：{summary(unmatched)}')
+        self.stdout.write(f'对照-装饰器放行的GET请求：{summary(decorated)}')
@@ -0,0 +1,94 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from blog import search
+from blog.content import html_to_text
+from blog.models import Blog, BlogCategory
+
+User = get_user_model()
+
+WORDS = ['django', 'python', 'mysql', 'cache', 'index', 'query', 'template', 'signal', 'redis', 'nginx']
+PHRASES = ['数据库', '性能优化', '缓存失效', '全文检索', '模板渲染', '并发请求', '消息队列', '分布式锁']
+
+QUERIES = ['数据库', '缓存失效', 'django cache', '全文检索 python', '消息队列 redis']
+
+
+class Command(BaseCommand):
+    help = '对比搜索结果摘要的两种生成方式：基于倒排位置只读取命中分段 vs 读取整篇正文重新扫描'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=200, help='生成的测试博客数量')
+        parser.add_argument('--paragraphs', type=int, default=60, help='每篇博客的段落数量')
+        parser.add_argument('--rounds', type=int, default=20, help='每个查询重复的次数')
+        parser.add_argument('--page-size', type=int, default=12, help='每页的搜索结果数量')
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        category = BlogCategory.objects.create(name=f'bench-{tag}')
+        author = User.objects.create_user(username=f'bench_{tag}', password=None)
+        try:
+            blogs = Blog.objects.bulk_create([
+                Blog(title=f'压测博客 {i}', content=self.make_content(options['paragraphs']),
+                     category=category, author=author)
+                for i in range(options['posts'])
+            ])
+            # bulk_create不触发信号，按批建立索引
+            for i in range(0, len(blogs), 100):
+                search.index_blogs(blogs[i:i + 100])
+
+            for query in QUERIES:
+                blog_ids = [blog_id for blog_id, _ in search.search(query)[:options['page_size']]]
+                if not blog_ids:
+                    continue
+                indexed = self.measure(lambda: search.build_snippets(query, blog_ids), options['rounds'])
+                naive = self.measure(lambda: self.naive_snippets(query, blog_ids), options['rounds'])
+                content_bytes = sum(
+                    len(content.encode()) for content in
+                    Blog.objects.filter(id__in=blog_ids).values_list('content', flat=True)
+                )
+                self.stdout.write(f'查询 "{query}"（{len(blog_ids)} 条结果）')
+                self.stdout.write(f'  倒排位置+分段: p50 {indexed[0]:.2f}ms，{indexed[1]} 次查询')
+                self.stdout.write(
+                    f'  读取正文重新扫描: p50 {naive[0]:.2f}ms，{naive[1]} 次查询，读取正文 {content_bytes / 1024:.0f}KB'
+                )
+        finally:
+            Blog.objects.filter(category=category).delete()
+            author.delete()
+            category.delete()
+
+    def make_content(self, paragraphs):
+        parts = []
+        for _ in range(paragraphs):
+            words = [random.choice(WORDS + PHRASES) for _ in range(8)]
+            parts.append(f"<p>这是一段用于压测的正文，{'，'.join(words)}。</p>")
+        return ''.join(parts)
+
+    def measure(self, func, rounds):
+        """返回 (耗时中位数ms, 每次执行的查询数)"""
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(rounds):
+                start = time.perf_counter()
+                func()
+                timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings), len(queries) // rounds
+
+    def naive_snippets(self, keyword, blog_ids):
+        """对照组：读取整篇正文，转换为纯文本后扫描全部命中位置，再用相同的规则截取片段"""
+        terms = set(search.tokenize(keyword))
+        snippets = {}
+        for blog_id, content in Blog.objects.filter(id__in=blog_ids).values_list('id', 'content'):
+            text = html_to_text(content)
+            occurrences = [(start, token) for token, start, _ in search._iter_tokens(text) if token in terms]
+            if not occurrences:
+                continue
+            start = max(0, search._best_window(occurrences) - search.SNIPPET_CONTEXT)
+            snippets[blog_id] = search.highlight(text[start:start + search.SNIPPET_LENGTH], terms)
+        return snippets
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog import view_counter
+
+
+class Command(BaseCommand):
+    help = '将缓存中缓冲的博客浏览量批量写回数据库，建议通过定时任务周期执行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='同时刷新当前正在写入的一代计数')
+
+    def handle(self, *args, **options):
+        flushed = view_counter.flush(force=options['force'])
+        self.stdout.write(self.style.SUCCESS(f'已写回 {flushed} 次浏览'))
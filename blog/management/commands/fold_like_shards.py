@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog import counters
+
+
+class Command(BaseCommand):
+    help = '将点赞计数分片中的增量合并回likes_count字段，建议通过定时任务周期执行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='每批合并的对象数量')
+
+    def handle(self, *args, **options):
+        folded = counters.fold(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'已合并 {folded} 个对象的点赞分片'))
@@ -0,0 +1,159 @@
+import hashlib
+import os
+import posixpath
+import re
+import shutil
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from author.models import UserProfile
+from blog.models import Blog, StoredFile
+from blog.rendering import referenced_names
+
+# 缩略图、缩放图的后缀（x_w640.webp、x_s36.webp），与原图共用同一个引用键
+DERIVATIVE_SUFFIX_RE = re.compile(r'_[ws]\d+$')
+# 默认头像（及部署时放在 avatars/default/ 下的默认图片）始终保留
+PROTECTED_PREFIXES = ('avatars/default',)
+
+
+def reference_key(name) -> bytes:
+    """
+    文件的引用键：去掉扩展名和派生图后缀后取8字节摘要，原图被引用时其所有派生图（包括同名的WebP）都视为被引用
+    只保存摘要，集合的内存占用与被引用的文件数量成正比，与文件名长度无关；摘要碰撞只会让孤立文件被保留
+    """
+    stem = DERIVATIVE_SUFFIX_RE.sub('', posixpath.splitext(name)[0])
+    return hashlib.blake2b(stem.encode(), digest_size=8).digest()
+
+
+def scan(root, prefix):
+    """
+    用os.scandir遍历目录树，逐个产出 (DirEntry, 存储中的文件名)
+    使用显式的栈而不是递归，每次只持有当前目录的迭代器，不一次性列出所有文件
+    """
+    stack = [(root, prefix)]
+    while stack:
+        path, name_prefix = stack.pop()
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    name = f'{name_prefix}/{entry.name}'
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, name))
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry, name
+        except FileNotFoundError:
+            continue
+
+
+class Command(BaseCommand):
+    help = '清理没有被任何博客正文或用户头像引用的上传文件（删除或移动到隔离目录）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只统计，不删除或移动文件')
+        parser.add_argument('--grace-hours', type=float, default=24, help='最近多少小时内上传的文件不清理（可能正在编辑中）')
+        parser.add_argument('--quarantine', help='隔离目录，指定时把孤立文件移动到该目录（保持相对路径），而不是删除')
+        parser.add_argument('--directory', action='append', help='MEDIA_ROOT下要清理的目录，可指定多次，默认为uploads和avatars')
+        parser.add_argument('--chunk-size', type=int, default=500, help='每批读取的博客数量')
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批处理的孤立文件数量')
+
+    def handle(self, *args, **options):
+        media_root = os.path.abspath(settings.MEDIA_ROOT)
+        quarantine = os.path.abspath(options['quarantine']) if options['quarantine'] else None
+        if quarantine and (quarantine + os.sep).startswith(media_root + os.sep):
+            # MEDIA_ROOT下的文件可以被直接访问，隔离目录必须在其之外
+            raise CommandError('隔离目录不能位于MEDIA_ROOT之下')
+        self.dry_run = options['dry_run']
+        self.quarantine = quarantine
+        self.verbosity = options['verbosity']
+        self.cutoff = time.time() - options['grace_hours'] * 3600
+        self.cutoff_time = timezone.now() - timedelta(hours=options['grace_hours'])
+
+        started = time.monotonic()
+        self.started_at = timezone.now()
+        # 宽限期内重新上传过相同内容（按内容寻址返回了已有文件）的文件，及其派生图，同样不清理
+        self.recent = self.recently_uploaded(self.cutoff_time)
+        referenced = self.collect_references(options['chunk_size'])
+        self.stdout.write(f'引用的文件 {len(referenced)} 个（{time.monotonic() - started:.1f}s）')
+
+        self.stats = {'scanned': 0, 'recent': 0, 'orphans': 0, 'bytes': 0}
+        batch = []
+        for directory in options['directory'] or ['uploads', 'avatars']:
+            directory = directory.strip('/')
+            for entry, name in scan(os.path.join(media_root, directory), directory):
+                self.stats['scanned'] += 1
+                if name.startswith(PROTECTED_PREFIXES) or reference_key(name) in referenced:
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                if stat.st_mtime > self.cutoff:
+                    self.stats['recent'] += 1
+                    continue
+                batch.append((name, entry.path, stat.st_size))
+                if len(batch) >= options['batch_size']:
+                    self.process(batch)
+                    batch = []
+        if batch:
+            self.process(batch)
+
+        stats = self.stats
+        action = '可清理' if self.dry_run else ('已隔离' if quarantine else '已删除')
+        self.stdout.write(self.style.SUCCESS(
+            f"扫描 {stats['scanned']} 个文件，宽限期内 {stats['recent']} 个，"
+            f"{action} {stats['orphans']} 个孤立文件（{stats['bytes'] / 1024 / 1024:.1f}MB），"
+            f'耗时 {time.monotonic() - started:.1f}s'
+        ))
+
+    def collect_references(self, chunk_size) -> set:
+        """按id分批读取博客正文，以及所有头像，得到被引用文件的引用键集合"""
+        referenced = set()
+        last_id = 0
+        while True:
+            rows = list(
+                Blog.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'content')[:chunk_size]
+            )
+            if not rows:
+                break
+            for _, content in rows:
+                referenced.update(reference_key(name) for name in referenced_names(content))
+            last_id = rows[-1][0]
+
+        for avatar in UserProfile.objects.exclude(avatar='').values_list('avatar', flat=True).iterator(chunk_size=2000):
+            referenced.add(reference_key(avatar))
+        return referenced
+
+    def recently_uploaded(self, since) -> set:
+        return {
+            reference_key(name)
+            for name in StoredFile.objects.filter(update_time__gt=since).values_list('name', flat=True)
+        }
+
+    def process(self, batch):
+        """处理一批孤立文件：跳过宽限期内重新上传过相同内容的文件，删除或隔离其余文件及其引用记录"""
+        # 清理过程中又有新的上传时，同样跳过
+        self.recent |= self.recently_uploaded(self.started_at)
+        removed = []
+        for name, path, size in batch:
+            if reference_key(name) in self.recent:
+                self.stats['recent'] += 1
+                continue
+            self.stats['orphans'] += 1
+            self.stats['bytes'] += size
+            if self.verbosity > 1:
+                self.stdout.write(name)
+            if self.dry_run:
+                continue
+            try:
+                if self.quarantine:
+                    target = os.path.join(self.quarantine, name)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.move(path, target)
+                else:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+            removed.append(name)
+        if removed:
+            StoredFile.objects.filter(name__in=removed).delete()
@@ -0,0 +1,68 @@
+import posixpath
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from blog import images
+
+DERIVATIVE_STEM_RE = re.compile(r'_w\d+$')
+
+
+def _walk(directory):
+    """递归列出存储目录下的所有文件，按目录返回 (目录, 文件名列表)"""
+    subdirs, files = default_storage.listdir(directory)
+    yield directory, files
+    for subdir in subdirs:
+        yield from _walk(posixpath.join(directory, subdir))
+
+
+def _originals(files):
+    """从同一目录的文件中挑出原图：去掉 _wN 缩放图，以及与其他格式原图同名的WebP版本"""
+    stems = {}
+    for file in files:
+        stem, ext = posixpath.splitext(file)
+        stems.setdefault(stem, set()).add(ext[1:].lower())
+    for file in files:
+        stem, ext = posixpath.splitext(file)
+        ext = ext[1:].lower()
+        if DERIVATIVE_STEM_RE.search(stem) or not images.supports_derivatives(file):
+            continue
+        if ext == 'webp' and len(stems[stem]) > 1:
+            continue
+        yield file
+
+
+class Command(BaseCommand):
+    help = '为已上传的编辑器图片生成缺少的缩放图和WebP版本（如进程重启时丢失的后台任务），并重新处理引用这些图片的博客'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default='uploads/images', help='扫描的存储目录')
+        parser.add_argument('--workers', type=int, default=4, help='并行生成的线程数量')
+
+    def handle(self, *args, **options):
+        names = [
+            posixpath.join(directory, file)
+            for directory, files in _walk(options['directory'])
+            for file in _originals(files)
+        ]
+        self.stdout.write(f'找到 {len(names)} 张原图')
+
+        created = failed = reprocessed = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            futures = {name: executor.submit(images.generate, name) for name in names}
+            for name, future in futures.items():
+                try:
+                    new_files = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'{name}: {e}')
+                    continue
+                created += len(new_files)
+                if new_files:
+                    reprocessed += images.reprocess_referencing(name)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'生成完成，新增 {created} 个派生图，失败 {failed} 张，重新处理 {reprocessed} 篇博客'
+        ))
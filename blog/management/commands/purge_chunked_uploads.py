@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from blog import chunked_upload
+
+
+class Command(BaseCommand):
+    help = '删除过期未完成的分片上传会话及其临时文件，建议通过定时任务周期执行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, help='超过多少秒没有更新的上传视为过期，默认为BLOG_CHUNKED_UPLOAD_EXPIRE')
+
+    def handle(self, *args, **options):
+        max_age = options['max_age'] if options['max_age'] is not None else chunked_upload.expire_seconds()
+        purged = chunked_upload.purge_expired(max_age)
+        self.stdout.write(self.style.SUCCESS(f'已删除 {purged} 个过期的上传'))
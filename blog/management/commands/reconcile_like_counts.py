@@ -0,0 +1,79 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from blog.models import Blog, BlogComment, BlogLike, CommentLike, LikeCounterShard
+
+# (被点赞模型, 点赞记录模型, 点赞记录中的外键名)
+TARGETS = {
+    'blog': (Blog, BlogLike, 'blog'),
+    'comment': (BlogComment, CommentLike, 'comment'),
+}
+
+
+class Command(BaseCommand):
+    help = '按id分批比对点赞表，修复Blog.likes_count和BlogComment.likes_count的计数偏差（计入未合并的点赞分片）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=['all', *TARGETS], default='all', help='需要修复的对象类型')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='每批检查的记录数量')
+        parser.add_argument('--sleep', type=float, default=0, help='每批之间暂停的秒数，用于降低数据库压力')
+        parser.add_argument('--dry-run', action='store_true', help='只输出存在偏差的记录，不写入数据库')
+
+    def handle(self, *args, **options):
+        targets = TARGETS if options['target'] == 'all' else {options['target']: TARGETS[options['target']]}
+        for name, (model, like_model, field) in targets.items():
+            fixed = self.reconcile(model, like_model, field, options)
+            self.stdout.write(self.style.SUCCESS(f'{name}: 修复了 {fixed} 条计数'))
+
+    def reconcile(self, model, like_model, field, options):
+        chunk_size = options['chunk_size']
+        # 用于原子修正的相关子查询：直接从点赞表统计真实数量，并扣除尚未合并的分片增量
+        actual_count = Coalesce(Subquery(
+            like_model.objects.filter(**{field: OuterRef('pk')})
+            .order_by().values(field).annotate(total=Count('id')).values('total'),
+            output_field=IntegerField()
+        ), 0) - Coalesce(Subquery(
+            LikeCounterShard.objects.filter(target_type=field, object_id=OuterRef('pk'))
+            .order_by().values('object_id').annotate(total=Sum('delta')).values('total'),
+            output_field=IntegerField()
+        ), 0)
+
+        last_id = 0
+        fixed = 0
+        while True:
+            # 只读取一小段id范围，每批都是独立的短查询，不会长时间锁表
+            rows = list(
+                model.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'likes_count')[:chunk_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            ids = [row_id for row_id, _ in rows]
+            counts = dict(
+                like_model.objects.filter(**{f'{field}_id__in': ids})
+                .order_by().values_list(f'{field}_id').annotate(total=Count('id'))
+            )
+            pending = dict(
+                LikeCounterShard.objects.filter(target_type=field, object_id__in=ids)
+                .order_by().values_list('object_id').annotate(total=Sum('delta'))
+            )
+            drifted = []
+            for row_id, likes_count in rows:
+                likes_count += pending.get(row_id) or 0
+                if counts.get(row_id, 0) != likes_count:
+                    drifted.append(row_id)
+                    self.stdout.write(f'  id={row_id}: {likes_count} -> {counts.get(row_id, 0)}')
+            if drifted:
+                if not options['dry_run']:
+                    # 以当前点赞表为准重新计算，避免覆盖比对期间发生的并发点赞
+                    model.objects.filter(id__in=drifted).update(likes_count=actual_count)
+                fixed += len(drifted)
+
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        return fixed
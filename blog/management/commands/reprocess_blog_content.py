@@ -0,0 +1,54 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from blog import page_cache, rendering
+from blog.models import Blog
+
+
+class Command(BaseCommand):
+    help = '重新处理已有博客的正文（清理HTML、改写图片、提取大纲），按批读取并在多个进程中并行处理'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200, help='每批处理的博客数量')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='并行处理的进程数量，1为不使用进程池')
+        parser.add_argument('--only-missing', action='store_true', help='只处理尚未预处理的博客')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        workers = max(1, options['workers'])
+        queryset = Blog.objects.only('id', 'content')
+        if options['only_missing']:
+            queryset = queryset.filter(rendered_content='')
+
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        # 按id分批读取，每批的正文分给各进程处理，主进程只负责读写数据库
+        last_id = 0
+        total = 0
+        try:
+            while True:
+                blogs = list(queryset.filter(id__gt=last_id).order_by('id')[:chunk_size])
+                if not blogs:
+                    break
+                contents = [blog.content for blog in blogs]
+                if executor:
+                    results = executor.map(rendering.process, contents, chunksize=max(1, len(contents) // (workers * 4)))
+                else:
+                    results = map(rendering.process, contents)
+                for blog, processed in zip(blogs, results):
+                    for field, value in processed.items():
+                        setattr(blog, field, value)
+                Blog.objects.bulk_update(blogs, rendering.PROCESSED_FIELDS)
+                # bulk_update不触发信号，手动使详情页缓存失效
+                page_cache.invalidate(*(page_cache.blog_scope(blog.id) for blog in blogs))
+                last_id = blogs[-1].id
+                total += len(blogs)
+                self.stdout.write(f'已处理 {total} 篇博客')
+        finally:
+            if executor:
+                executor.shutdown()
+
+        # 摘要可能变化，使所有首页缓存失效
+        page_cache.invalidate(*(page_cache.feed_scope(sort_by) for sort_by in page_cache.ALL_FEEDS))
+        self.stdout.write(self.style.SUCCESS(f'处理完成，共处理 {total} 篇博客'))
@@ -0,0 +1,186 @@
+"""
+按内容寻址的上传文件存储：相同内容的文件只保存一份。
+
+上传的文件在写入临时文件的同时计算SHA-256，按摘要保存为 <目录>/<摘要前两位>/<摘要>.<扩展名>；
+内容已存在时直接返回已有的文件并增加引用次数，删除时引用次数减到0才删除文件。
+引用次数为引用文件的头像和博客正文的数量：头像在上传时计入；编辑器上传的图片在博客保存时
+按新旧正文引用的差异增减，还没有被发布的图片引用次数为0，由 gc_orphan_uploads 在宽限期后清理。
+文件名由内容决定，同一地址的内容永远不变，因此可以设置长期缓存。
+"""
+import hashlib
+import os
+import re
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import StoredFile
+
+# 内容寻址的文件及由其派生的缩略图（x_w640.webp、x_s36.webp），地址中的内容不会改变
+IMMUTABLE_PATH_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}(_[a-z]\d+)?\.[a-z0-9]+$')
+
+
+def immutable_max_age() -> int:
+    return getattr(settings, 'BLOG_IMMUTABLE_MEDIA_MAX_AGE', 365 * 24 * 3600)
+
+
+def upload_grace() -> int:
+    return getattr(settings, 'BLOG_UPLOAD_GRACE_PERIOD', 24 * 3600)
+
+
+def is_immutable(path) -> bool:
+    return bool(IMMUTABLE_PATH_RE.search(path))
+
+
+class _SpooledUpload(File):
+    """已计算摘要的临时文件；提供temporary_file_path，FileSystemStorage保存时直接移动而不是再复制一遍"""
+
+    def __init__(self, path):
+        super().__init__(open(path, 'rb'))
+        self.path = path
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(File.DEFAULT_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _spool(file):
+    """
+    把上传的文件逐块写入临时文件，同时计算摘要；已经在磁盘上的临时文件（大文件上传、分片上传）直接计算摘要，不再复制
+    :return: (SHA-256摘要, 文件大小, 临时文件路径, 临时文件是否由本模块创建)
+    """
+    if hasattr(file, 'temporary_file_path'):
+        path = file.temporary_file_path()
+        return (*_hash_file(path), path, False)
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR, suffix='.upload', delete=False) as temp:
+        try:
+            for chunk in file.chunks():
+                digest.update(chunk)
+                size += len(chunk)
+                temp.write(chunk)
+        except BaseException:
+            temp.close()
+            os.unlink(temp.name)
+            raise
+    return digest.hexdigest(), size, temp.name, True
+
+
+def _save(name, path):
+    # 文件缺失时（例如被手动删除）重新写入；按摘要命名，同名文件的内容一定相同
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    upload = _SpooledUpload(path)
+    try:
+        return default_storage.save(name, upload)
+    finally:
+        upload.close()
+
+
+def store(file, directory, extension, acquire=True) -> str:
+    """
+    按内容保存上传的文件
+    :param file: 上传的文件（UploadedFile或其他支持chunks()的File）；
+                 提供temporary_file_path()的文件在FileSystemStorage中会被直接移动到目标位置
+    :param directory: 存储目录，如 uploads/images
+    :param extension: 文件扩展名（不含点），应已通过校验
+    :param acquire: 是否立即计入一次引用；编辑器上传的图片传False，在博客保存时按正文引用计入
+    :return: 文件在存储中的名称，内容相同时返回已有文件的名称
+    """
+    digest, size, path, owned = _spool(file)
+    name = f'{directory}/{digest[:2]}/{digest}.{extension}'
+    try:
+        # 两个请求同时上传相同内容时，后插入的一方违反唯一约束，重试一次即走增加引用次数的分支
+        for attempt in range(2):
+            try:
+                with transaction.atomic():
+                    stored = StoredFile.objects.select_for_update().filter(digest=digest).first()
+                    if stored is not None:
+                        StoredFile.objects.filter(pk=stored.pk).update(
+                            ref_count=F('ref_count') + int(acquire), update_time=timezone.now()
+                        )
+                        if not default_storage.exists(stored.name):
+                            _save(stored.name, path)
+                        return stored.name
+                    StoredFile.objects.create(digest=digest, name=name, size=size, ref_count=int(acquire))
+                    # 文件写入失败时插入的记录随事务回滚
+                    return _save(name, path)
+            except IntegrityError:
+                if attempt:
+                    raise
+    finally:
+        if owned and os.path.exists(path):
+            os.unlink(path)
+
+
+def release(name) -> bool:
+    """
+    释放一次对文件的引用，引用次数减到0时在事务提交后删除文件
+    不是通过store保存的旧文件没有引用记录，直接删除
+    :param name: 文件在存储中的名称
+    :return: 文件是否被删除（调用方据此决定是否同时删除缩略图等派生文件）
+    """
+    with transaction.atomic():
+        stored = StoredFile.objects.select_for_update().filter(name=name).first()
+        if stored is not None and stored.ref_count > 1:
+            StoredFile.objects.filter(pk=stored.pk).update(ref_count=F('ref_count') - 1)
+            return False
+        if stored is not None:
+            stored.delete()
+        transaction.on_commit(lambda: default_storage.delete(name))
+    return True
+
+
+def acquire(names):
+    """
+    为博客正文新引用的文件各增加一次引用
+    没有引用记录的文件（按内容保存之前上传的文件、派生图、外部地址）不受影响
+    :param names: 文件在存储中的名称集合
+    """
+    if names:
+        StoredFile.objects.filter(name__in=names).update(ref_count=F('ref_count') + 1)
+
+
+def release_many(names) -> list:
+    """
+    释放博客正文不再引用的文件，引用次数减到0的文件在事务提交后删除
+    与release不同，没有引用记录的文件不会被删除；宽限期内重新上传过的文件可能正被编辑中的博客使用，
+    同样不删除，之后由 gc_orphan_uploads 清理
+    :param names: 文件在存储中的名称集合
+    :return: 被删除的文件名列表（调用方据此删除派生图）
+    """
+    if not names:
+        return []
+    cutoff = timezone.now() - timedelta(seconds=upload_grace())
+    with transaction.atomic():
+        StoredFile.objects.filter(name__in=names, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+        unused = list(
+            StoredFile.objects.select_for_update()
+            .filter(name__in=names, ref_count=0, update_time__lt=cutoff)
+            .values_list('name', flat=True)
+        )
+        if unused:
+            StoredFile.objects.filter(name__in=unused).delete()
+            transaction.on_commit(lambda: _delete_files(unused))
+    return unused
+
+
+def _delete_files(names):
+    for name in names:
+        default_storage.delete(name)
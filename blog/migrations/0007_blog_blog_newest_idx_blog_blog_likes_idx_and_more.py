@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_blogcomment_is_reply_blogcomment_reply_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['-create_time', '-id'], name='blog_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['-likes_count', '-id'], name='blog_likes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['-views_count', '-id'], name='blog_views_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_blog_blog_newest_idx_blog_blog_likes_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='excerpt',
+            field=models.CharField(blank=True, default='', max_length=150, verbose_name='摘要'),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='reading_time',
+            field=models.IntegerField(default=0, verbose_name='阅读时间（分钟）'),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='word_count',
+            field=models.IntegerField(default=0, verbose_name='字数'),
+        ),
+    ]
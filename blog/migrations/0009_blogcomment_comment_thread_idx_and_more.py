@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_blog_excerpt_blog_reading_time_blog_word_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogcomment',
+            index=models.Index(fields=['blog', 'parent_comment', '-create_time', '-id'], name='comment_thread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogcomment',
+            index=models.Index(fields=['parent_comment', '-create_time', '-id'], name='comment_reply_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_blogcomment_comment_thread_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LikeCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_type', models.CharField(choices=[('blog', '博客'), ('comment', '评论')], max_length=10, verbose_name='对象类型')),
+                ('object_id', models.BigIntegerField(verbose_name='对象ID')),
+                ('shard', models.PositiveSmallIntegerField(verbose_name='分片编号')),
+                ('delta', models.IntegerField(default=0, verbose_name='未合并的点赞增量')),
+            ],
+            options={
+                'verbose_name': '点赞计数分片',
+                'verbose_name_plural': '点赞计数分片',
+                'unique_together': {('target_type', 'object_id', 'shard')},
+            },
+        ),
+    ]
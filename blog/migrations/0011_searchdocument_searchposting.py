@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_likecountershard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('blog', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='blog.blog', verbose_name='博客')),
+                ('title_length', models.IntegerField(default=0, verbose_name='标题词数')),
+                ('content_length', models.IntegerField(default=0, verbose_name='正文词数')),
+            ],
+            options={
+                'verbose_name': '搜索文档',
+                'verbose_name_plural': '搜索文档',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=32, verbose_name='词')),
+                ('title_tf', models.IntegerField(default=0, verbose_name='标题词频')),
+                ('content_tf', models.IntegerField(default=0, verbose_name='正文词频')),
+                ('blog', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='blog.blog', verbose_name='博客')),
+            ],
+            options={
+                'verbose_name': '搜索倒排索引',
+                'verbose_name_plural': '搜索倒排索引',
+                'unique_together': {('token', 'blog')},
+            },
+        ),
+    ]
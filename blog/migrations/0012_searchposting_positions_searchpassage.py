@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_searchdocument_searchposting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchposting',
+            name='positions',
+            field=models.TextField(blank=True, default='', verbose_name='正文中的位置'),
+        ),
+        migrations.CreateModel(
+            name='SearchPassage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.IntegerField(verbose_name='分段序号')),
+                ('text', models.CharField(max_length=200, verbose_name='分段文本')),
+                ('blog', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_passages', to='blog.blog', verbose_name='博客')),
+            ],
+            options={
+                'verbose_name': '搜索正文分段',
+                'verbose_name_plural': '搜索正文分段',
+                'unique_together': {('blog', 'number')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_searchposting_positions_searchpassage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='images',
+            field=models.JSONField(blank=True, default=list, verbose_name='图片列表'),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='outline',
+            field=models.JSONField(blank=True, default=list, verbose_name='标题大纲'),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='rendered_content',
+            field=models.TextField(blank=True, default='', verbose_name='处理后的内容'),
+        ),
+    ]
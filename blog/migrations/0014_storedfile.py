@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_blog_images_blog_outline_blog_rendered_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True, verbose_name='SHA-256摘要')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='存储中的文件名')),
+                ('size', models.BigIntegerField(default=0, verbose_name='文件大小')),
+                ('ref_count', models.IntegerField(default=0, verbose_name='引用次数')),
+                ('create_time', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '上传文件',
+                'verbose_name_plural': '上传文件',
+            },
+        ),
+    ]
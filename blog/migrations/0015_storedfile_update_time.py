@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_storedfile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storedfile',
+            name='update_time',
+            field=models.DateTimeField(auto_now=True, verbose_name='最近上传时间'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_storedfile_update_time'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChunkedUpload',
+            fields=[
+                ('id', models.CharField(max_length=32, primary_key=True, serialize=False, verbose_name='上传ID')),
+                ('filename', models.CharField(blank=True, default='', max_length=255, verbose_name='原文件名')),
+                ('size', models.BigIntegerField(verbose_name='文件大小')),
+                ('offset', models.BigIntegerField(default=0, verbose_name='已接收的字节数')),
+                ('create_time', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('update_time', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunked_uploads', to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '分片上传',
+                'verbose_name_plural': '分片上传',
+            },
+        ),
+    ]
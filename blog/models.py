@@ -1,6 +1,9 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from .content import summarize
+from . import rendering
+
 User = get_user_model()
 
 # Create your models here.
@@ -26,14 +29,44 @@ class Blog(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='作者')
     views_count = models.IntegerField(default=0, verbose_name='浏览量')
     likes_count = models.IntegerField(default=0, verbose_name='点赞数')
+    # 列表页卡片使用的派生字段，发布时计算，列表查询无需读取content
+    excerpt = models.CharField(max_length=150, blank=True, default='', verbose_name='摘要')
+    word_count = models.IntegerField(default=0, verbose_name='字数')
+    reading_time = models.IntegerField(default=0, verbose_name='阅读时间（分钟）')
+    # 发布时处理好的正文：清理后的HTML、图片列表和标题大纲，详情页直接输出
+    rendered_content = models.TextField(blank=True, default='', verbose_name='处理后的内容')
+    images = models.JSONField(blank=True, default=list, verbose_name='图片列表')
+    outline = models.JSONField(blank=True, default=list, verbose_name='标题大纲')
 
     def __str__(self):
         return self.title
 
+    def refresh_summary(self):
+        """根据当前content重新计算摘要、字数和阅读时间（不保存）"""
+        for field, value in summarize(self.content).items():
+            setattr(self, field, value)
+
+    def process_content(self):
+        """清理并预处理content，同时计算大纲、图片和摘要字段（不保存）"""
+        for field, value in rendering.process(self.content).items():
+            setattr(self, field, value)
+
+    def save(self, *args, **kwargs):
+        # 未经过表单发布流程创建的博客（如直接调用create）在保存时补充预处理
+        if not self.rendered_content and self.content and 'update_fields' not in kwargs:
+            self.process_content()
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = '博客'
         verbose_name_plural = verbose_name
         ordering = ['-create_time']
+        # 首页三种排序方式的游标分页索引，id作为稳定的次级排序键
+        indexes = [
+            models.Index(fields=['-create_time', '-id'], name='blog_newest_idx'),
+            models.Index(fields=['-likes_count', '-id'], name='blog_likes_idx'),
+            models.Index(fields=['-views_count', '-id'], name='blog_views_idx'),
+        ]
 
 class BlogComment(models.Model):
     """博客的评论模型"""
@@ -64,6 +97,11 @@ class BlogComment(models.Model):
         verbose_name = '博客评论'
         verbose_name_plural = verbose_name
         ordering = ['-create_time']
+        # 评论分页的范围扫描索引：顶级评论按博客分页，回复按父评论分页
+        indexes = [
+            models.Index(fields=['blog', 'parent_comment', '-create_time', '-id'], name='comment_thread_idx'),
+            models.Index(fields=['parent_comment', '-create_time', '-id'], name='comment_reply_idx'),
+        ]
 
 class CommentLike(models.Model):
     """评论点赞模型"""
@@ -85,4 +123,90 @@ class BlogLike(models.Model):
     class Meta:
         unique_together = ('blog', 'user')  # 确保一个用户对一篇博客只能点赞一次
         verbose_name = '博客点赞'
-        verbose_name_plural = verbose_name
\ No newline at end of file
+        verbose_name_plural = verbose_name
+
+class LikeCounterShard(models.Model):
+    """点赞计数分片：热门对象的点赞增量分散写入多行，定期合并回likes_count字段"""
+    TARGET_CHOICES = (
+        ('blog', '博客'),
+        ('comment', '评论'),
+    )
+    target_type = models.CharField(max_length=10, choices=TARGET_CHOICES, verbose_name='对象类型')
+    object_id = models.BigIntegerField(verbose_name='对象ID')
+    shard = models.PositiveSmallIntegerField(verbose_name='分片编号')
+    delta = models.IntegerField(default=0, verbose_name='未合并的点赞增量')
+
+    class Meta:
+        unique_together = ('target_type', 'object_id', 'shard')  # 每个对象的每个分片只有一行
+        verbose_name = '点赞计数分片'
+        verbose_name_plural = verbose_name
+
+class SearchDocument(models.Model):
+    """搜索索引中的文档统计，用于BM25按文档长度归一化"""
+    blog = models.OneToOneField(Blog, on_delete=models.CASCADE, primary_key=True, related_name='search_document', verbose_name='博客')
+    title_length = models.IntegerField(default=0, verbose_name='标题词数')
+    content_length = models.IntegerField(default=0, verbose_name='正文词数')
+
+    class Meta:
+        verbose_name = '搜索文档'
+        verbose_name_plural = verbose_name
+
+class SearchPosting(models.Model):
+    """倒排索引：每个词在每篇博客中的词频，同一个词的所有记录构成该词的倒排列表"""
+    token = models.CharField(max_length=32, verbose_name='词')
+    blog = models.ForeignKey(Blog, on_delete=models.CASCADE, related_name='search_postings', verbose_name='博客')
+    title_tf = models.IntegerField(default=0, verbose_name='标题词频')
+    content_tf = models.IntegerField(default=0, verbose_name='正文词频')
+    # 正文纯文本中出现位置的字符偏移，逗号分隔，只保存前若干个，用于生成搜索结果摘要
+    positions = models.TextField(blank=True, default='', verbose_name='正文中的位置')
+
+    class Meta:
+        unique_together = ('token', 'blog')  # 联合唯一索引以token开头，按词读取倒排列表
+        verbose_name = '搜索倒排索引'
+        verbose_name_plural = verbose_name
+
+class SearchPassage(models.Model):
+    """正文纯文本按固定长度切分的分段，生成搜索结果摘要时只读取命中位置所在的分段，不读取整篇正文"""
+    blog = models.ForeignKey(Blog, on_delete=models.CASCADE, related_name='search_passages', verbose_name='博客')
+    number = models.IntegerField(verbose_name='分段序号')
+    text = models.CharField(max_length=200, verbose_name='分段文本')
+
+    class Meta:
+        unique_together = ('blog', 'number')  # 每篇博客的每个分段只有一行
+        verbose_name = '搜索正文分段'
+        verbose_name_plural = verbose_name
+
+class StoredFile(models.Model):
+    """按内容摘要保存的上传文件，相同内容只保存一份，引用次数减到0时才删除文件"""
+    digest = models.CharField(max_length=64, unique=True, verbose_name='SHA-256摘要')
+    name = models.CharField(max_length=255, unique=True, verbose_name='存储中的文件名')
+    size = models.BigIntegerField(default=0, verbose_name='文件大小')
+    # 引用文件的头像和博客正文的数量；编辑器上传的图片在博客发布时才计入
+    ref_count = models.IntegerField(default=0, verbose_name='引用次数')
+    create_time = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    # 最近一次上传相同内容的时间，清理孤立文件时在宽限期内的不删除
+    update_time = models.DateTimeField(auto_now=True, verbose_name='最近上传时间')
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = '上传文件'
+        verbose_name_plural = verbose_name
+
+class ChunkedUpload(models.Model):
+    """分片上传的会话：已接收的字节追加写入临时文件，全部接收后校验并保存到存储"""
+    id = models.CharField(max_length=32, primary_key=True, verbose_name='上传ID')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads', verbose_name='用户')
+    filename = models.CharField(max_length=255, blank=True, default='', verbose_name='原文件名')
+    size = models.BigIntegerField(verbose_name='文件大小')
+    offset = models.BigIntegerField(default=0, verbose_name='已接收的字节数')
+    create_time = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    update_time = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    def __str__(self):
+        return f'{self.filename} ({self.offset}/{self.size})'
+
+    class Meta:
+        verbose_name = '分片上传'
+        verbose_name_plural = verbose_name
@@ -0,0 +1,198 @@
+"""
+匿名访客的整页缓存，以及所有用户共享的页面片段缓存
+
+缓存键中带有版本号：每篇博客一个版本（详情页），每种首页排序一个版本（首页）。
+博客、评论、点赞变化时由信号递增对应的版本号，旧版本的缓存不再被读取，等待自然过期，
+不需要扫描或逐个删除缓存键。版本号和最后失效时间同时用于生成条件GET的ETag/Last-Modified。
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import render
+from django.utils.safestring import mark_safe
+
+from .pagination import FEED_SORT_FIELDS
+
+KEY_PREFIX = 'blog:page'
+
+STAT_NAMES = ('hit', 'miss', 'invalidation', 'fragment_hit', 'fragment_miss')
+
+# 缓存页面和共享片段中CSRF Token的占位符，返回响应前替换为当前请求的Token
+CSRF_PLACEHOLDER = '__BLOG_CSRF_TOKEN__'
+
+ALL_FEEDS = tuple(FEED_SORT_FIELDS)
+
+
+def _timeout():
+    return getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', 60)
+
+
+def enabled() -> bool:
+    return _timeout() > 0
+
+
+def blog_scope(blog_id) -> str:
+    return f'blog:{blog_id}'
+
+
+def feed_scope(sort_by) -> str:
+    return f'feed:{sort_by}'
+
+
+def user_scope(user_id) -> str:
+    return f'user:{user_id}'
+
+
+def _version_key(scope):
+    return f'{KEY_PREFIX}:ver:{scope}'
+
+
+def _mtime_key(scope):
+    return f'{KEY_PREFIX}:mtime:{scope}'
+
+
+def _stat_key(name):
+    return f'{KEY_PREFIX}:stats:{name}'
+
+
+def _incr(key):
+    # 版本号和统计计数都不过期
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, timeout=None)
+
+
+def _init_version(scope) -> bool:
+    # 用当前毫秒时间初始化版本号，缓存重启后不会与重启前的版本号重复；无法确定此前的修改时间，按刚刚修改处理
+    if cache.add(_version_key(scope), int(time.time() * 1000), timeout=None):
+        cache.set(_mtime_key(scope), time.time(), timeout=None)
+        return True
+    return False
+
+
+def version(scope) -> int:
+    """获取缓存范围当前的版本号"""
+    value = cache.get(_version_key(scope))
+    if value is None:
+        _init_version(scope)
+        value = cache.get(_version_key(scope))
+    return value
+
+
+def last_modified(scope) -> float:
+    """获取缓存范围最后一次失效的时间戳"""
+    value = cache.get(_mtime_key(scope))
+    if value is None:
+        version(scope)
+        value = cache.get(_mtime_key(scope), time.time())
+    return value
+
+
+def _page_key(request, scope):
+    path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'{KEY_PREFIX}:{scope}:{version(scope)}:{path_hash}'
+
+
+def is_cacheable(request) -> bool:
+    """只缓存匿名用户的GET请求"""
+    return enabled() and request.method == 'GET' and not request.user.is_authenticated
+
+
+def get_page(request, scope):
+    """
+    读取缓存的页面
+    :param request: 请求对象
+    :param scope: 缓存范围（blog_scope或feed_scope）
+    :return: 命中时返回替换了CSRF Token的HttpResponse，否则返回None
+    """
+    if not is_cacheable(request):
+        return None
+    cached = cache.get(_page_key(request, scope))
+    if cached is None:
+        _incr(_stat_key('miss'))
+        return None
+    _incr(_stat_key('hit'))
+    content, content_type = cached
+    return _with_csrf_token(request, HttpResponse(content, content_type=content_type))
+
+
+def render_page(request, scope, template_name, context):
+    """
+    渲染页面，并缓存匿名用户的页面
+    页面中的CSRF Token使用占位符渲染，缓存的内容与访客无关，返回前再替换为当前请求的Token
+    :param request: 请求对象
+    :param scope: 缓存范围（blog_scope或feed_scope）
+    :param template_name: 模板名称
+    :param context: 模板上下文
+    :return: HttpResponse
+    """
+    response = render(request, template_name, {**context, 'csrf_token': CSRF_PLACEHOLDER})
+    if is_cacheable(request) and response.status_code == 200:
+        cache.set(_page_key(request, scope), (response.content, response['Content-Type']), _timeout())
+    return _with_csrf_token(request, response)
+
+
+def _with_csrf_token(request, response):
+    # get_token同时让CSRF中间件为没有Cookie的访客设置csrftoken
+    placeholder = CSRF_PLACEHOLDER.encode()
+    if placeholder in response.content:
+        response.content = response.content.replace(placeholder, get_token(request).encode())
+    return response
+
+
+def _fragment_key(scope, name):
+    return f'{KEY_PREFIX}:{scope}:{version(scope)}:fragment:{name}'
+
+
+def get_fragment(scope, name):
+    """
+    读取与用户无关的页面片段，登录用户和匿名访客共享
+    :param scope: 缓存范围
+    :param name: 片段名称
+    :return: 命中时返回 (片段数据, 标记为安全的HTML)，否则返回None；HTML中的CSRF占位符由render_page替换
+    """
+    if not enabled():
+        return None
+    cached = cache.get(_fragment_key(scope, name))
+    if cached is None:
+        _incr(_stat_key('fragment_miss'))
+        return None
+    _incr(_stat_key('fragment_hit'))
+    data, html = cached
+    return data, mark_safe(html)
+
+
+def set_fragment(scope, name, data, html):
+    """缓存与用户无关的页面片段，html中的CSRF Token需使用CSRF_PLACEHOLDER渲染"""
+    if enabled():
+        cache.set(_fragment_key(scope, name), (data, html), _timeout())
+
+
+def invalidate(*scopes):
+    """递增缓存范围的版本号，使其下所有缓存页面失效"""
+    for scope in scopes:
+        if not _init_version(scope):
+            try:
+                cache.incr(_version_key(scope))
+            except ValueError:
+                # 版本号恰好过期被淘汰
+                _init_version(scope)
+            cache.set(_mtime_key(scope), time.time(), timeout=None)
+        _incr(_stat_key('invalidation'))
+
+
+def invalidate_blog(blog_id, feeds=()):
+    """使博客详情页和指定排序的首页缓存失效"""
+    invalidate(blog_scope(blog_id), *(feed_scope(sort_by) for sort_by in feeds))
+
+
+def stats() -> dict:
+    """缓存命中、未命中和失效次数，用于监控"""
+    values = cache.get_many([_stat_key(name) for name in STAT_NAMES])
+    return {name: values.get(_stat_key(name), 0) for name in STAT_NAMES}
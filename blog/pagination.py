@@ -0,0 +1,115 @@
+import base64
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+# 每种排序方式对应的排序字段，所有排序都以id作为稳定的次级排序键
+FEED_SORT_FIELDS = {
+    'newest': 'create_time',
+    'most_likes': 'likes_count',
+    'most_views': 'views_count',
+}
+
+DEFAULT_SORT = 'newest'
+
+# 游标中的整数必须在数据库整数字段（64位有符号）范围内，超出范围的查询参数会导致数据库报错
+MAX_INT = 2 ** 63 - 1
+
+
+class InvalidCursor(ValueError):
+    """游标格式错误或与排序方式不匹配"""
+
+
+def normalize_sort(sort_by) -> str:
+    """未知的排序参数统一回退到按最新发布"""
+    return sort_by if sort_by in FEED_SORT_FIELDS else DEFAULT_SORT
+
+
+def encode_cursor(tag, value, pk) -> str:
+    """
+    将排序值和id编码为不透明的游标字符串
+    :param tag: 游标标记（排序方式），用于校验游标和请求是否匹配
+    :param value: 最后一条记录的排序字段值
+    :param pk: 最后一条记录的id
+    :return: url安全的游标字符串
+    """
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([tag, value, pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _is_db_int(value):
+    return isinstance(value, int) and not isinstance(value, bool) and -MAX_INT - 1 <= value <= MAX_INT
+
+
+def decode_cursor(cursor, tag, is_datetime=False):
+    """
+    解析游标字符串
+    :param cursor: 游标字符串
+    :param tag: 当前请求的游标标记（排序方式）
+    :param is_datetime: 排序字段是否为时间类型
+    :return: (排序字段值, id)
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_tag, value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if cursor_tag != tag or not _is_db_int(pk):
+            raise InvalidCursor('游标与排序方式不匹配')
+        if is_datetime:
+            value = datetime.fromisoformat(value)
+            # USE_TZ=False 时数据库不接受带时区的时间，反之亦然
+            if timezone.is_aware(value) != settings.USE_TZ:
+                raise InvalidCursor('游标时间的时区错误')
+        elif not _is_db_int(value):
+            raise InvalidCursor('游标排序值错误')
+    except InvalidCursor:
+        raise
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor(f'无效的游标: {e}')
+    return value, pk
+
+
+def keyset_paginate(queryset, field, cursor=None, page_size=12, tag=None):
+    """
+    基于游标（keyset）的倒序分页，按 (field, id) 排序，翻到第N页的开销与第一页相同
+    :param queryset: 查询集
+    :param field: 排序字段
+    :param cursor: 上一页返回的游标，为空时返回第一页
+    :param page_size: 每页数量
+    :param tag: 游标标记，默认为排序字段名
+    :return: (当前页记录列表, 下一页游标或None)
+    """
+    tag = tag or field
+    if cursor:
+        is_datetime = queryset.model._meta.get_field(field).get_internal_type() == 'DateTimeField'
+        value, pk = decode_cursor(cursor, tag, is_datetime)
+        # (field, id) 严格小于游标位置的记录
+        queryset = queryset.filter(
+            Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk})
+        )
+
+    # 多取一条用于判断是否还有下一页
+    items = list(queryset.order_by(f'-{field}', '-id')[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(tag, getattr(last, field), last.id)
+    return items, next_cursor
+
+
+def paginate_feed(queryset, sort_by, cursor=None, page_size=12):
+    """
+    首页和搜索结果的游标分页
+    :param queryset: 博客查询集
+    :param sort_by: 排序方式（newest、most_likes、most_views）
+    :param cursor: 上一页返回的游标，为空时返回第一页
+    :param page_size: 每页数量
+    :return: (当前页博客列表, 下一页游标或None)
+    """
+    sort_by = normalize_sort(sort_by)
+    return keyset_paginate(queryset, FEED_SORT_FIELDS[sort_by], cursor, page_size, tag=sort_by)
@@ -0,0 +1,163 @@
+"""
+写接口和登录的频率限制：按用户或按IP的滑动窗口计数，计数保存在缓存中。
+
+滑动窗口用相邻两个固定窗口近似：估计值 = 上一窗口计数 * 上一窗口仍在滑动窗口内的比例 + 当前窗口计数，
+每个请求只需一次 incr 和一次 get，不需要保存每个请求的时间戳。超出限制时返回429和Retry-After。
+
+RateLimitMiddleware 按 BLOG_RATE_LIMITS 中以URL名称配置的规则限制请求；
+没有按URL名称配置的视图可以使用 rate_limit 装饰器。
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+KEY_PREFIX = 'rl'
+# 只限制会修改数据的请求，浏览登录页等GET请求不计数
+SAFE_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+SCOPES = ('user', 'ip')
+
+
+def parse_rate(rate) -> tuple:
+    """
+    解析频率限制，如 '5/m'、'100/h'、'10/30s'
+    :return: (次数, 窗口秒数)
+    """
+    count, period = rate.split('/')
+    multiplier, unit = period[:-1], period[-1]
+    return int(count), int(multiplier or 1) * PERIODS[unit]
+
+
+def compile_rules(rates, name) -> tuple:
+    """
+    :param rates: {'user': '30/m', 'ip': '100/m'}，作用范围到频率限制
+    :param name: 计数键中使用的名称，通常为URL名称
+    :return: ((作用范围, 次数, 窗口秒数, 键前缀), ...)
+    """
+    rules = []
+    for scope, rate in rates.items():
+        if scope not in SCOPES:
+            raise ValueError(f'未知的频率限制范围: {scope}')
+        limit, window = parse_rate(rate)
+        rules.append((scope, limit, window, f'{KEY_PREFIX}:{name}:{scope}:{window}'))
+    return tuple(rules)
+
+
+def get_cache():
+    return caches[getattr(settings, 'BLOG_RATE_LIMIT_CACHE', 'default')]
+
+
+def client_ip(request) -> str:
+    """客户端IP；部署在反向代理之后时，需要由代理或中间件把真实IP写入REMOTE_ADDR"""
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _identity(request, scope) -> str:
+    # 未登录用户按IP计数
+    if scope == 'user':
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f'u{user.pk}'
+    return client_ip(request)
+
+
+def _retry_after(previous, current, limit, window, elapsed) -> int:
+    """下一个请求被允许（上一窗口计数 * 权重 + 当前窗口计数 + 1 <= 次数）之前需要等待的秒数"""
+    if previous and current < limit:
+        # 等上一窗口的权重降到剩余额度以内
+        allowed_at = window * (1 - (limit - current - 1) / previous)
+        if allowed_at < window:
+            return max(math.ceil(allowed_at - elapsed), 1)
+    # 等到下一个窗口，当前窗口成为上一窗口后，再等它的权重降到额度以内
+    return max(math.ceil(window - elapsed + window * (1 - (limit - 1) / current)), 1)
+
+
+def _hit(cache, key, limit, window, now) -> int:
+    """
+    计数一次请求并检查是否超出限制
+    先incr再判断，在Redis等共享缓存中计数是原子的，并发请求不会同时通过最后一个名额；
+    被拒绝的请求同样计数，持续重试的客户端会一直被限制
+    :return: 0表示允许；超出限制时返回需要等待的秒数
+    """
+    index, elapsed = divmod(now, window)
+    current_key = f'{key}:{int(index)}'
+    try:
+        current = cache.incr(current_key)
+    except ValueError:
+        # 窗口的第一个请求；并发时add失败的一方再incr
+        current = 1 if cache.add(current_key, 1, timeout=window * 2) else cache.incr(current_key)
+    # 当前窗口已经超出时不需要读取上一窗口
+    previous = cache.get(f'{key}:{int(index) - 1}', 0) if current <= limit else 0
+    if current > limit or previous * (1 - elapsed / window) + current > limit:
+        return _retry_after(previous, current, limit, window, elapsed)
+    return 0
+
+
+def check(request, rules, cache=None) -> int:
+    """
+    按规则检查请求
+    :return: 0表示允许；否则为Retry-After的秒数
+    """
+    cache = cache or get_cache()
+    now = time.time()
+    for scope, limit, window, prefix in rules:
+        wait = _hit(cache, f'{prefix}:{_identity(request, scope)}', limit, window, now)
+        if wait:
+            return wait
+    return 0
+
+
+def too_many_requests(retry_after) -> JsonResponse:
+    response = JsonResponse(
+        {'code': 429, 'msg': '请求过于频繁，请稍后再试', 'data': {'retry_after': retry_after}}, status=429
+    )
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def rate_limit(name=None, **rates):
+    """
+    视图的频率限制装饰器，例如 @rate_limit(user='10/m', ip='30/m')
+    :param name: 计数键中使用的名称，默认为视图函数的模块和名称
+    """
+    def decorator(view_func):
+        rules = compile_rules(rates, name or f'{view_func.__module__}.{view_func.__name__}')
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in SAFE_METHODS:
+                retry_after = check(request, rules)
+                if retry_after:
+                    return too_many_requests(retry_after)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class RateLimitMiddleware:
+    """按URL名称（如 blog:like_blog）应用 BLOG_RATE_LIMITS 中配置的频率限制，需放在认证中间件之后"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.rules = {
+            view_name: compile_rules(rates, view_name)
+            for view_name, rates in getattr(settings, 'BLOG_RATE_LIMITS', {}).items()
+        }
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method in SAFE_METHODS:
+            return None
+        rules = self.rules.get(request.resolver_match.view_name)
+        if not rules:
+            return None
+        retry_after = check(request, rules)
+        if retry_after:
+            return too_many_requests(retry_after)
+        return None
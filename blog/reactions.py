@@ -0,0 +1,91 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from . import counters
+from .models import Blog, BlogComment, BlogLike, CommentLike
+
+
+def _toggle_like(like_model, target_model, target_field, target_id, user):
+    """
+    切换点赞状态，并用一条原子的F()表达式UPDATE调整点赞计数
+    :param like_model: 点赞记录模型（BlogLike、CommentLike）
+    :param target_model: 被点赞的模型（Blog、BlogComment）
+    :param target_field: 点赞记录中指向被点赞对象的外键名
+    :param target_id: 被点赞对象的ID
+    :param user: 当前用户
+    :return: (是否已点赞, 最新点赞数)
+    """
+    lookup = {f'{target_field}_id': target_id, 'user': user}
+    with transaction.atomic():
+        deleted, _ = like_model.objects.filter(**lookup).delete()
+        if deleted:
+            is_liked, delta = False, -1
+        else:
+            try:
+                # 使用保存点，并发重复点赞时只回滚这一次插入
+                with transaction.atomic():
+                    like_model.objects.create(**lookup)
+                is_liked, delta = True, 1
+            except IntegrityError:
+                if not target_model.objects.filter(pk=target_id).exists():
+                    raise target_model.DoesNotExist
+                # 其他请求已经点赞成功，计数已由那个请求调整
+                is_liked, delta = True, 0
+
+        if counters.sharding_enabled():
+            # 开启分片计数时增量写入随机分片，避免热门对象的同一行成为锁热点
+            if delta:
+                counters.increment(target_field, target_id, delta)
+            # 被点赞对象不存在时抛出DoesNotExist，回滚点赞记录
+            return is_liked, counters.current_count(target_field, target_id)
+
+        target = target_model.objects.filter(pk=target_id)
+        if delta and not target.update(likes_count=Greatest(F('likes_count') + delta, 0)):
+            # 被点赞对象不存在，回滚点赞记录
+            raise target_model.DoesNotExist
+        likes_count = target.values_list('likes_count', flat=True).get()
+    return is_liked, likes_count
+
+
+def toggle_blog_like(blog_id, user):
+    """
+    点赞/取消点赞博客
+    :return: (是否已点赞, 最新点赞数)
+    """
+    return _toggle_like(BlogLike, Blog, 'blog', blog_id, user)
+
+
+def toggle_comment_like(comment_id, user):
+    """
+    点赞/取消点赞评论
+    :return: (是否已点赞, 最新点赞数)
+    """
+    return _toggle_like(CommentLike, BlogComment, 'comment', comment_id, user)
+
+
+def load_like_state(user, blog_id, comment_ids):
+    """
+    用一条UNION查询获取用户对博客和一组评论的点赞状态
+    :param user: 当前用户
+    :param blog_id: 博客ID
+    :param comment_ids: 评论ID列表
+    :return: (是否点赞了博客, 点赞过的评论ID列表)
+    """
+    blog_likes = BlogLike.objects.filter(blog_id=blog_id, user=user).annotate(
+        kind=Value('blog'), target_id=F('blog_id')
+    ).values_list('kind', 'target_id')
+    comment_likes = CommentLike.objects.filter(
+        user=user, comment_id__in=comment_ids, comment__blog_id=blog_id
+    ).annotate(
+        kind=Value('comment'), target_id=F('comment_id')
+    ).values_list('kind', 'target_id')
+
+    blog_liked = False
+    liked_comment_ids = []
+    for kind, target_id in blog_likes.union(comment_likes, all=True):
+        if kind == 'blog':
+            blog_liked = True
+        else:
+            liked_comment_ids.append(target_id)
+    return blog_liked, liked_comment_ids
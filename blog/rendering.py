@@ -0,0 +1,286 @@
+"""
+发布时的正文处理：只在保存博客时执行一次，详情页直接输出处理结果，不再逐次解析HTML。
+
+1. 按白名单清理富文本HTML：去除脚本、事件属性、危险的链接协议和样式
+2. 为 <img> 补充 width/height（本站上传的图片用Pillow读取尺寸）和 loading="lazy"，避免图片加载时页面跳动；
+   已生成派生图的图片补充srcset，并用 <picture> 提供WebP版本
+3. 为标题添加锚点，并提取文章中的图片列表和标题大纲
+"""
+import html
+import re
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from . import images
+from .content import summarize
+
+ALLOWED_TAGS = {
+    'p', 'br', 'hr', 'div', 'span', 'strong', 'b', 'em', 'i', 'u', 's', 'del', 'sub', 'sup',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'pre', 'code', 'ul', 'ol', 'li',
+    'a', 'img', 'video', 'table', 'thead', 'tbody', 'tr', 'th', 'td',
+}
+VOID_TAGS = {'br', 'hr', 'img'}
+# 连同内容一起丢弃的标签
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'noscript', 'template', 'textarea', 'select', 'title'}
+
+ALLOWED_ATTRS = {
+    'a': {'href', 'title', 'target'},
+    'img': {'src', 'alt', 'title', 'width', 'height'},
+    'video': {'src', 'poster', 'controls', 'width', 'height'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan'},
+    'ol': {'start'},
+    'pre': {'class'},
+    'code': {'class'},
+}
+URL_ATTRS = {'href', 'src', 'poster'}
+NUMBER_ATTRS = {'width', 'height', 'colspan', 'rowspan', 'start'}
+ALLOWED_URL_SCHEMES = {'http', 'https', 'mailto'}
+# 编辑器会生成的行内样式
+ALLOWED_STYLES = {
+    'color', 'background-color', 'text-align', 'text-indent', 'text-decoration',
+    'font-size', 'font-weight', 'font-style', 'line-height', 'width', 'height',
+}
+
+# 写入大纲并添加锚点的标题级别
+OUTLINE_TAGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4}
+
+CODE_CLASS_RE = re.compile(r'^language-[\w+#-]+$')
+NUMBER_RE = re.compile(r'^\d{1,5}$')
+CONTROL_CHARS_RE = re.compile(r'[\x00-\x20]+')
+UNSAFE_STYLE_RE = re.compile(r'url\s*\(|expression|javascript:|[\\<>]', re.IGNORECASE)
+WHITESPACE_RE = re.compile(r'\s+')
+# 正文中引用本站文件的属性
+URL_ATTR_RE = re.compile(r'''(?:src|href|poster)\s*=\s*["']([^"']+)["']''', re.IGNORECASE)
+
+# EXIF中的方向标签，取值5～8时图片需要旋转90度显示，宽高互换
+EXIF_ORIENTATION = 0x0112
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def _safe_url(value) -> bool:
+    """相对地址和白名单协议的地址才允许保留"""
+    compact = CONTROL_CHARS_RE.sub('', value)
+    scheme = urlsplit(compact).scheme
+    return not scheme or scheme.lower() in ALLOWED_URL_SCHEMES
+
+
+def _clean_style(value) -> str:
+    declarations = []
+    for declaration in value.split(';'):
+        name, sep, style_value = declaration.partition(':')
+        name, style_value = name.strip().lower(), style_value.strip()
+        if sep and name in ALLOWED_STYLES and style_value and not UNSAFE_STYLE_RE.search(style_value):
+            declarations.append(f'{name}: {style_value}')
+    return '; '.join(declarations)
+
+
+def local_media_name(src):
+    """本站上传文件在存储中的文件名，外部地址返回None"""
+    parts = urlsplit(src)
+    if parts.scheme or parts.netloc:
+        return None
+    path = parts.path
+    if settings.MEDIA_URL and path.startswith(settings.MEDIA_URL):
+        return path[len(settings.MEDIA_URL):]
+    return path.lstrip('/') or None
+
+
+def referenced_names(content):
+    """正文中引用的本站文件名，带域名的地址只要路径在MEDIA_URL下也算作引用"""
+    for url in URL_ATTR_RE.findall(content or ''):
+        name = local_media_name(url)
+        if name is None:
+            path = urlsplit(url).path
+            if settings.MEDIA_URL and path.startswith(settings.MEDIA_URL):
+                name = path[len(settings.MEDIA_URL):]
+        if name:
+            yield name
+
+
+def image_size(name):
+    """
+    读取本站上传图片的尺寸，只读取文件头；外部图片不读取，不发起网络请求
+    返回按EXIF方向旋转后的尺寸，与 images.generate 生成的派生图以及浏览器显示的方向一致
+    :param name: 图片在存储中的文件名
+    :return: (width, height)，无法读取时返回None
+    """
+    from PIL import Image
+    try:
+        with default_storage.open(name) as file, Image.open(file) as image:
+            width, height = image.size
+            if image.getexif().get(EXIF_ORIENTATION) in TRANSPOSED_ORIENTATIONS:
+                return height, width
+            return width, height
+    except Exception:
+        # 文件不存在、路径越界或不是有效图片时都保持原样
+        return None
+
+
+class ContentProcessor(HTMLParser):
+    """白名单清理HTML，同时改写图片、为标题添加锚点并收集图片和大纲"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.output = []
+        self.stack = []
+        self.skip_depth = 0
+        self.images = []
+        self.outline = []
+        self.heading = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.skip_depth or tag in DROP_CONTENT_TAGS:
+            if tag in DROP_CONTENT_TAGS:
+                self.skip_depth += 1
+            return
+        if tag not in ALLOWED_TAGS:
+            # 不在白名单中的标签只去除标签本身，保留其中的文本
+            return
+        attrs = self.clean_attrs(tag, attrs)
+        webp_srcset = ''
+        if tag == 'img':
+            if not attrs.get('src'):
+                return
+            webp_srcset = self.rewrite_image(attrs)
+        elif tag == 'a' and attrs.get('target'):
+            attrs['rel'] = 'noopener noreferrer'
+        elif tag in OUTLINE_TAGS:
+            attrs['id'] = f'heading-{len(self.outline) + 1}'
+            self.heading = {'level': OUTLINE_TAGS[tag], 'text': '', 'anchor': attrs['id']}
+            self.outline.append(self.heading)
+        if webp_srcset:
+            source_attrs = {'type': 'image/webp', 'srcset': webp_srcset, 'sizes': images.sizes_attr()}
+            self.output.append(f'<picture><source{self.format_attrs(source_attrs)}>')
+        self.output.append(f'<{tag}{self.format_attrs(attrs)}>')
+        if webp_srcset:
+            self.output.append('</picture>')
+        if tag not in VOID_TAGS:
+            self.stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.skip_depth:
+            if tag in DROP_CONTENT_TAGS:
+                self.skip_depth -= 1
+            return
+        if tag not in self.stack:
+            return
+        # 自动闭合中间未闭合的标签
+        while self.stack:
+            open_tag = self.stack.pop()
+            self.output.append(f'</{open_tag}>')
+            if open_tag in OUTLINE_TAGS:
+                self.heading = None
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        self.output.append(html.escape(data, quote=False))
+        if self.heading is not None:
+            self.heading['text'] += data
+
+    def clean_attrs(self, tag, attrs) -> dict:
+        allowed = ALLOWED_ATTRS.get(tag, set())
+        cleaned = {}
+        for name, value in attrs:
+            if name == 'style' and value:
+                style = _clean_style(value)
+                if style:
+                    cleaned['style'] = style
+                continue
+            if name not in allowed:
+                continue
+            if value is None:
+                # controls 等布尔属性
+                cleaned[name] = None
+                continue
+            value = value.strip()
+            if name in URL_ATTRS and not _safe_url(value):
+                continue
+            if name in NUMBER_ATTRS and not NUMBER_RE.match(value):
+                continue
+            if name == 'target' and value != '_blank':
+                continue
+            if name == 'class':
+                value = ' '.join(item for item in value.split() if CODE_CLASS_RE.match(item))
+                if not value:
+                    continue
+            cleaned[name] = value
+        return cleaned
+
+    def rewrite_image(self, attrs):
+        """
+        补充图片的尺寸、srcset和延迟加载属性
+        :return: WebP版本的srcset，没有WebP派生图时为空字符串
+        """
+        src = attrs['src']
+        name = local_media_name(src)
+        size = image_size(name) if name else None
+        webp_srcset = ''
+        if size:
+            if 'width' not in attrs or 'height' not in attrs:
+                attrs['width'], attrs['height'] = str(size[0]), str(size[1])
+            if images.supports_derivatives(name):
+                items = images.existing_variants(name, size[0])
+                if len(items) > 1:
+                    attrs['srcset'] = images.build_srcset(src, name, items)
+                    attrs['sizes'] = images.sizes_attr()
+                webp_srcset = images.build_srcset(src, name, items, webp=True)
+        attrs['loading'] = 'lazy'
+        attrs['decoding'] = 'async'
+        self.images.append({
+            'src': attrs['src'],
+            'alt': attrs.get('alt', ''),
+            'width': int(attrs['width']) if 'width' in attrs else None,
+            'height': int(attrs['height']) if 'height' in attrs else None,
+        })
+        return webp_srcset
+
+    @staticmethod
+    def format_attrs(attrs) -> str:
+        return ''.join(
+            f' {name}' if value is None else f' {name}="{html.escape(value)}"'
+            for name, value in attrs.items()
+        )
+
+    def result(self) -> str:
+        self.close()
+        self.output.extend(f'</{tag}>' for tag in reversed(self.stack))
+        self.stack = []
+        for heading in self.outline:
+            heading['text'] = WHITESPACE_RE.sub(' ', heading['text']).strip()
+        self.outline = [heading for heading in self.outline if heading['text']]
+        return ''.join(self.output)
+
+
+# process() 返回的字段，批量更新时使用
+PROCESSED_FIELDS = ['rendered_content', 'images', 'outline', 'excerpt', 'word_count', 'reading_time']
+
+
+def process(content) -> dict:
+    """
+    处理博客正文，结果直接对应Blog模型的字段
+    不访问数据库，可在进程池中并行执行；但会读取存储中本站图片的尺寸和已生成的派生图，
+    派生图生成完成后由 images.reprocess_referencing 重新处理引用它的博客
+    :param content: 编辑器提交的富文本HTML
+    :return: 包含rendered_content、images、outline以及摘要字段的字典
+    """
+    processor = ContentProcessor()
+    processor.feed(content or '')
+    rendered = processor.result()
+    return {
+        'rendered_content': rendered,
+        'images': processor.images,
+        'outline': processor.outline,
+        **summarize(rendered),
+    }
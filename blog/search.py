@@ -0,0 +1,445 @@
+"""
+站内搜索：基于倒排索引的全文检索，替代对正文的 icontains 全表扫描。
+
+分词：中日韩文字按相邻两字切分（二元分词），英文和数字按单词切分并转为小写。
+为了支持单字搜索，索引中额外保存连续文字中的单字。
+排序：BM25，标题中出现的词按 BLOG_SEARCH_TITLE_BOOST 加权。
+摘要：倒排记录中保存词在正文中的位置，正文纯文本按固定长度分段保存；生成搜索结果摘要时
+根据位置找出命中词最密集的片段，只读取该片段所在的一两个分段并高亮命中词，不读取整篇正文。
+索引由博客的保存信号增量更新（删除博客时倒排记录随外键级联删除），
+rebuild_search_index 命令用于首次建立或全量重建索引。
+缓存：搜索结果（按相关度排好序的博客ID和分数，不含渲染结果）按规范化后的检索词缓存，
+排序和分页在缓存结果之上进行；任何博客变化都会递增代数，旧代数的缓存不再被读取，自然过期。
+"""
+import hashlib
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .content import EXCERPT_LENGTH, html_to_text
+from .models import SearchDocument, SearchPassage, SearchPosting
+from .pagination import decode_cursor, encode_cursor
+
+# 搜索结果按相关度排序时的排序方式名称
+RELEVANCE = 'relevance'
+
+# BM25参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 与SearchPosting.token的长度一致，过长的英文单词截断后索引
+MAX_TOKEN_LENGTH = 32
+
+# 相关度分数编码到分页游标时保留的精度
+SCORE_SCALE = 10 ** 6
+
+# 每个词在正文中最多保存的位置数量
+MAX_POSITIONS = 20
+
+# 正文分段长度，与SearchPassage.text的长度一致
+PASSAGE_LENGTH = 200
+
+# 摘要长度与卡片摘要一致，命中词前保留的上下文字数
+SNIPPET_LENGTH = EXCERPT_LENGTH
+SNIPPET_CONTEXT = 20
+
+# 英文和数字包括全角形式，匹配后再统一为半角小写
+TOKEN_RE = re.compile(r'([㐀-䶿一-鿿豈-﫿]+)|([a-z0-9ａ-ｚ０-９]+)', re.IGNORECASE)
+
+
+def _title_boost():
+    return getattr(settings, 'BLOG_SEARCH_TITLE_BOOST', 3.0)
+
+
+def _max_results():
+    return getattr(settings, 'BLOG_SEARCH_MAX_RESULTS', 1000)
+
+
+def _cache_timeout():
+    return getattr(settings, 'BLOG_SEARCH_CACHE_TIMEOUT', 300)
+
+
+CACHE_PREFIX = 'blog:search'
+
+
+def _normalize(token) -> str:
+    # NFKC把全角字母数字和兼容汉字统一为标准形式；只规范化切分出的词，位置仍对应原文
+    return unicodedata.normalize('NFKC', token).lower()
+
+
+def _iter_tokens(text):
+    """
+    切分文本
+    :return: (检索词, 在原文中的起始位置, 结束位置) 的生成器
+    """
+    for match in TOKEN_RE.finditer(text or ''):
+        run, start = match.group(), match.start()
+        if match.group(1):
+            if len(run) == 1:
+                yield _normalize(run), start, start + 1
+            else:
+                for i in range(len(run) - 1):
+                    yield _normalize(run[i:i + 2]), start + i, start + i + 2
+        else:
+            yield _normalize(run)[:MAX_TOKEN_LENGTH], start, match.end()
+
+
+def tokenize(text):
+    """
+    将文本切分为检索词：连续的中日韩文字切分为二元词（只有一个字时保留单字），英文和数字按单词切分并转为小写
+    :param text: 纯文本
+    :return: 检索词列表（可能重复）
+    """
+    return [token for token, _, _ in _iter_tokens(text)]
+
+
+def _index_tokens(text):
+    """
+    建立索引使用的词：检索词加上连续文字中的单字，使单字搜索也能命中
+    :param text: 纯文本
+    :return: (词频Counter, {词: 位置列表}, 文档长度)，文档长度只统计检索词
+    """
+    counts = Counter()
+    positions = defaultdict(list)
+    length = 0
+    for token, start, _ in _iter_tokens(text):
+        counts[token] += 1
+        positions[token].append(start)
+        length += 1
+    for match in TOKEN_RE.finditer(text):
+        if match.group(1) and len(match.group()) > 1:
+            for i, char in enumerate(match.group()):
+                char = _normalize(char)
+                counts[char] += 1
+                positions[char].append(match.start() + i)
+    return counts, positions, length
+
+
+def _analyze(blog):
+    """
+    计算一篇博客的倒排记录、文档长度和正文分段
+    :return: ({词: (标题词频, 正文词频, 位置)}, 标题长度, 正文长度, 分段文本列表)
+    """
+    title_counts, _, title_length = _index_tokens(blog.title or '')
+    content_text = html_to_text(blog.content)
+    content_counts, content_positions, content_length = _index_tokens(content_text)
+    postings = {
+        token: (
+            title_counts[token],
+            content_counts[token],
+            ','.join(str(position) for position in sorted(content_positions.get(token, ()))[:MAX_POSITIONS]),
+        )
+        for token in title_counts.keys() | content_counts.keys()
+    }
+    passages = [content_text[i:i + PASSAGE_LENGTH] for i in range(0, len(content_text), PASSAGE_LENGTH)]
+    return postings, title_length, content_length, passages
+
+
+def index_blog(blog):
+    """
+    增量更新一篇博客的索引：只删除消失的词、插入新出现的词、更新词频或位置变化的词
+    :param blog: 博客对象
+    """
+    postings, title_length, content_length, passages = _analyze(blog)
+    with transaction.atomic():
+        existing = {
+            token: (posting_id, title_tf, content_tf, positions)
+            for posting_id, token, title_tf, content_tf, positions in SearchPosting.objects.filter(blog=blog)
+            .values_list('id', 'token', 'title_tf', 'content_tf', 'positions')
+        }
+        stale_ids = [value[0] for token, value in existing.items() if token not in postings]
+        if stale_ids:
+            SearchPosting.objects.filter(id__in=stale_ids).delete()
+
+        created = []
+        changed = []
+        for token, (title_tf, content_tf, positions) in postings.items():
+            if token not in existing:
+                created.append(SearchPosting(
+                    token=token, blog=blog, title_tf=title_tf, content_tf=content_tf, positions=positions
+                ))
+            elif existing[token][1:] != (title_tf, content_tf, positions):
+                changed.append(SearchPosting(
+                    id=existing[token][0], title_tf=title_tf, content_tf=content_tf, positions=positions
+                ))
+        SearchPosting.objects.bulk_create(created, batch_size=500)
+        SearchPosting.objects.bulk_update(changed, ['title_tf', 'content_tf', 'positions'], batch_size=500)
+
+        SearchDocument.objects.update_or_create(
+            blog=blog, defaults={'title_length': title_length, 'content_length': content_length}
+        )
+        _save_passages(blog, passages)
+    # 事务提交后再递增代数，避免其他请求在提交前按旧数据重新缓存
+    transaction.on_commit(bump_generation)
+
+
+def _save_passages(blog, passages):
+    """只写入内容变化的分段，删除多余的分段"""
+    existing = dict(SearchPassage.objects.filter(blog=blog).values_list('number', 'text'))
+    SearchPassage.objects.filter(blog=blog, number__gte=len(passages)).delete()
+    SearchPassage.objects.bulk_create([
+        SearchPassage(blog=blog, number=number, text=text)
+        for number, text in enumerate(passages) if number not in existing
+    ], batch_size=500)
+    for number, text in enumerate(passages):
+        if number in existing and existing[number] != text:
+            SearchPassage.objects.filter(blog=blog, number=number).update(text=text)
+
+
+def index_blogs(blogs):
+    """
+    批量重建一组博客的索引，用于全量重建：先删除这些博客的旧记录，再批量插入
+    :param blogs: 博客对象列表
+    :return: 写入的倒排记录数量
+    """
+    documents = []
+    postings = []
+    passages = []
+    for blog in blogs:
+        blog_postings, title_length, content_length, blog_passages = _analyze(blog)
+        documents.append(SearchDocument(blog=blog, title_length=title_length, content_length=content_length))
+        postings.extend(
+            SearchPosting(token=token, blog=blog, title_tf=title_tf, content_tf=content_tf, positions=positions)
+            for token, (title_tf, content_tf, positions) in blog_postings.items()
+        )
+        passages.extend(
+            SearchPassage(blog=blog, number=number, text=text) for number, text in enumerate(blog_passages)
+        )
+
+    blog_ids = [blog.id for blog in blogs]
+    with transaction.atomic():
+        SearchPosting.objects.filter(blog_id__in=blog_ids).delete()
+        SearchDocument.objects.filter(blog_id__in=blog_ids).delete()
+        SearchPassage.objects.filter(blog_id__in=blog_ids).delete()
+        SearchDocument.objects.bulk_create(documents, batch_size=500)
+        SearchPosting.objects.bulk_create(postings, batch_size=1000)
+        SearchPassage.objects.bulk_create(passages, batch_size=500)
+    transaction.on_commit(bump_generation)
+    return len(postings)
+
+
+def _generation_key():
+    return f'{CACHE_PREFIX}:gen'
+
+
+def generation() -> int:
+    """搜索结果缓存的代数"""
+    cache.add(_generation_key(), 1, timeout=None)
+    return cache.get(_generation_key(), 1)
+
+
+def bump_generation():
+    """博客变化时递增代数，之前缓存的所有搜索结果不再被读取"""
+    if not cache.add(_generation_key(), 1, timeout=None):
+        try:
+            cache.incr(_generation_key())
+        except ValueError:
+            cache.add(_generation_key(), 1, timeout=None)
+
+
+def normalize_query(keyword):
+    """
+    规范化搜索关键词：去除首尾空白、统一全角半角和大小写后切分为检索词
+    所有检索词都需命中，与顺序和重复无关，所以排序去重后作为缓存键
+    :return: 排序去重后的检索词列表
+    """
+    return sorted(set(tokenize(unicodedata.normalize('NFKC', keyword or '').strip().casefold())))
+
+
+def search(keyword):
+    """
+    搜索博客，所有检索词都出现的博客才会命中，按BM25相关度排序
+    结果按规范化后的检索词缓存，只保存博客ID和分数
+    :param keyword: 搜索关键词
+    :return: [(博客ID, 相关度分数)]，按分数从高到低排列，最多 BLOG_SEARCH_MAX_RESULTS 条
+    """
+    terms = normalize_query(keyword)
+    if not terms:
+        return []
+    timeout = _cache_timeout()
+    if not timeout:
+        return _rank(terms)
+
+    digest = hashlib.md5(' '.join(terms).encode()).hexdigest()
+    key = f'{CACHE_PREFIX}:{generation()}:{digest}'
+    ranked = cache.get(key)
+    if ranked is None:
+        ranked = _rank(terms)
+        cache.set(key, ranked, timeout)
+    return ranked
+
+
+def _rank(terms):
+    """在倒排索引中查询检索词并计算BM25分数"""
+    # 读取所有检索词的倒排列表，统计每个词的文档频率
+    postings = defaultdict(dict)
+    doc_freq = Counter()
+    rows = SearchPosting.objects.filter(token__in=terms).values_list('token', 'blog_id', 'title_tf', 'content_tf')
+    for token, blog_id, title_tf, content_tf in rows:
+        postings[blog_id][token] = (title_tf, content_tf)
+        doc_freq[token] += 1
+
+    candidates = [blog_id for blog_id, matched in postings.items() if len(matched) == len(terms)]
+    if not candidates:
+        return []
+
+    corpus = SearchDocument.objects.aggregate(
+        total=Count('blog_id'), avg_title=Avg('title_length'), avg_content=Avg('content_length')
+    )
+    lengths = {
+        blog_id: (title_length, content_length)
+        for blog_id, title_length, content_length in SearchDocument.objects.filter(blog_id__in=candidates)
+        .values_list('blog_id', 'title_length', 'content_length')
+    }
+
+    boost = _title_boost()
+    total_docs = corpus['total']
+    avg_length = boost * (corpus['avg_title'] or 0) + (corpus['avg_content'] or 0) or 1
+    idf = {
+        token: math.log(1 + (total_docs - doc_freq[token] + 0.5) / (doc_freq[token] + 0.5))
+        for token in terms
+    }
+
+    ranked = []
+    for blog_id in candidates:
+        title_length, content_length = lengths.get(blog_id, (0, 0))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * (boost * title_length + content_length) / avg_length)
+        score = 0.0
+        for token, (title_tf, content_tf) in postings[blog_id].items():
+            tf = boost * title_tf + content_tf
+            score += idf[token] * tf * (BM25_K1 + 1) / (tf + norm)
+        ranked.append((blog_id, score))
+
+    ranked.sort(key=lambda item: (-item[1], -item[0]))
+    return ranked[:_max_results()]
+
+
+def paginate_ranked(ranked, cursor=None, page_size=12):
+    """
+    对按相关度排好序的搜索结果做游标分页，游标记录上一页最后一条的 (分数, id)
+    :param ranked: search()的返回值
+    :param cursor: 上一页返回的游标，为空时返回第一页
+    :param page_size: 每页数量
+    :return: (当前页博客ID列表, 下一页游标或None)
+    """
+    # 按编码后的分数重新排序，保证分页顺序与游标比较的顺序一致
+    keys = sorted(((round(score * SCORE_SCALE), blog_id) for blog_id, score in ranked), reverse=True)
+    if cursor:
+        last = decode_cursor(cursor, RELEVANCE)
+        keys = [key for key in keys if key < last]
+
+    page = keys[:page_size]
+    next_cursor = None
+    if len(keys) > page_size:
+        next_cursor = encode_cursor(RELEVANCE, *page[-1])
+    return [blog_id for _, blog_id in page], next_cursor
+
+
+def _best_window(occurrences):
+    """
+    找出命中词最密集的片段
+    :param occurrences: 按位置排序的 [(位置, 词)]
+    :return: 片段中第一个命中词的位置
+    """
+    width = SNIPPET_LENGTH - SNIPPET_CONTEXT
+    counts = Counter()
+    best_key, best_start = None, occurrences[0][0]
+    left = 0
+    for offset, token in occurrences:
+        counts[token] += 1
+        while offset - occurrences[left][0] >= width:
+            left_token = occurrences[left][1]
+            counts[left_token] -= 1
+            if not counts[left_token]:
+                del counts[left_token]
+            left += 1
+        # 优先包含更多不同的检索词，其次是更多的命中次数
+        key = (len(counts), sum(counts.values()))
+        if best_key is None or key > best_key:
+            best_key, best_start = key, occurrences[left][0]
+    return best_start
+
+
+def highlight(text, terms):
+    """
+    转义文本并用<mark>标记其中的检索词
+    :param text: 纯文本片段
+    :param terms: 检索词集合
+    :return: 安全的HTML
+    """
+    spans = []
+    for token, start, end in _iter_tokens(text):
+        if token not in terms:
+            continue
+        # 相邻的二元词会重叠，合并为一段
+        if spans and start < spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], end)
+        else:
+            spans.append([start, end])
+
+    parts = []
+    last = 0
+    for start, end in spans:
+        parts.append(escape(text[last:start]))
+        parts.append(f'<mark>{escape(text[start:end])}</mark>')
+        last = end
+    parts.append(escape(text[last:]))
+    return mark_safe(''.join(parts))
+
+
+def build_snippets(keyword, blog_ids):
+    """
+    为一页搜索结果生成高亮摘要，只读取检索词的位置和命中片段所在的分段
+    :param keyword: 搜索关键词
+    :param blog_ids: 当前页的博客ID列表
+    :return: {博客ID: 摘要HTML}，只在标题中命中的博客没有摘要
+    """
+    terms = set(tokenize(keyword))
+    if not terms or not blog_ids:
+        return {}
+
+    occurrences = defaultdict(list)
+    rows = (
+        SearchPosting.objects.filter(token__in=terms, blog_id__in=blog_ids)
+        .exclude(positions='').values_list('blog_id', 'token', 'positions')
+    )
+    for blog_id, token, positions in rows:
+        occurrences[blog_id].extend((int(position), token) for position in positions.split(','))
+    if not occurrences:
+        return {}
+
+    # 每篇博客的片段最多跨越两个分段，所有博客的分段一次查询读取
+    windows = {}
+    passage_filter = Q()
+    for blog_id, blog_occurrences in occurrences.items():
+        blog_occurrences.sort()
+        start = max(0, _best_window(blog_occurrences) - SNIPPET_CONTEXT)
+        first, last = start // PASSAGE_LENGTH, (start + SNIPPET_LENGTH - 1) // PASSAGE_LENGTH
+        windows[blog_id] = start
+        passage_filter |= Q(blog_id=blog_id, number__range=(first, last))
+
+    passages = defaultdict(dict)
+    for blog_id, number, text in SearchPassage.objects.filter(passage_filter).values_list('blog_id', 'number', 'text'):
+        passages[blog_id][number] = text
+
+    snippets = {}
+    for blog_id, start in windows.items():
+        if not passages[blog_id]:
+            continue
+        numbers = sorted(passages[blog_id])
+        chunk = ''.join(passages[blog_id][number] for number in numbers)
+        offset = start - numbers[0] * PASSAGE_LENGTH
+        text = chunk[offset:offset + SNIPPET_LENGTH]
+        # 最后一个分段是满的，说明后面可能还有正文
+        has_more = len(chunk) > offset + SNIPPET_LENGTH or len(passages[blog_id][numbers[-1]]) == PASSAGE_LENGTH
+        snippet = highlight(text, terms)
+        snippets[blog_id] = mark_safe(f"{'…' if start else ''}{snippet}{'…' if has_more else ''}")
+    return snippets
@@ -0,0 +1,154 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from author.models import UserProfile
+
+from . import autocomplete, images, media_store, page_cache, rendering, search
+from .models import Blog, BlogCategory, BlogComment, BlogLike, CommentLike
+
+User = get_user_model()
+
+
+@receiver([post_save, post_delete], sender=Blog)
+def invalidate_blog_pages(sender, instance, **kwargs):
+    """博客发布、修改或删除时，使其详情页、所有首页排序和作者个人页的缓存失效"""
+    page_cache.invalidate_blog(instance.id, feeds=page_cache.ALL_FEEDS)
+    page_cache.invalidate(page_cache.user_scope(instance.author_id))
+
+
+@receiver(post_save, sender=Blog)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    """博客发布或修改时增量更新搜索索引，删除博客时倒排记录随外键级联删除"""
+    if update_fields is not None and not {'title', 'content'} & set(update_fields):
+        return
+    search.index_blog(instance)
+
+
+@receiver(post_delete, sender=Blog)
+def expire_search_results(sender, instance, **kwargs):
+    """删除博客时使缓存的搜索结果失效（修改博客时由索引更新递增代数）"""
+    transaction.on_commit(search.bump_generation)
+
+
+@receiver(pre_save, sender=Blog)
+def remember_media_references(sender, instance, update_fields=None, **kwargs):
+    """保存前读取旧正文引用的上传文件，保存后与新正文比较；只更新浏览量等字段时跳过"""
+    if update_fields is not None and 'content' not in update_fields:
+        return
+    old_content = Blog.objects.filter(pk=instance.pk).values_list('content', flat=True).first() if instance.pk else None
+    instance._media_references = set(rendering.referenced_names(old_content))
+
+
+@receiver(post_save, sender=Blog)
+def update_media_references(sender, instance, **kwargs):
+    """正文新引用的上传文件增加引用次数，不再引用的释放"""
+    old_names = instance.__dict__.pop('_media_references', None)
+    if old_names is None:
+        return
+    new_names = set(rendering.referenced_names(instance.content))
+    media_store.acquire(new_names - old_names)
+    _release_media(old_names - new_names)
+
+
+@receiver(post_delete, sender=Blog)
+def release_media_references(sender, instance, **kwargs):
+    """删除博客时释放正文引用的上传文件"""
+    _release_media(set(rendering.referenced_names(instance.content)))
+
+
+def _release_media(names):
+    # 引用次数减到0的图片连同其缩放图和WebP版本一起删除
+    for name in media_store.release_many(names):
+        transaction.on_commit(partial(images.delete_derivatives, name))
+
+
+@receiver(post_save, sender=Blog)
+def update_blog_suggestion(sender, instance, **kwargs):
+    """博客发布或修改标题时更新搜索框输入提示"""
+    autocomplete.update('blog', instance.id, instance.title, instance.views_count)
+
+
+@receiver(post_delete, sender=Blog)
+def remove_blog_suggestion(sender, instance, **kwargs):
+    autocomplete.remove('blog', instance.id)
+
+
+@receiver(post_save, sender=BlogCategory)
+def update_category_suggestion(sender, instance, **kwargs):
+    autocomplete.update('category', instance.id, instance.name)
+
+
+@receiver(post_delete, sender=BlogCategory)
+def remove_category_suggestion(sender, instance, **kwargs):
+    autocomplete.remove('category', instance.id)
+
+
+@receiver([post_save, post_delete], sender=BlogComment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    """评论变化时，使所属博客的详情页缓存失效"""
+    page_cache.invalidate_blog(instance.blog_id)
+
+
+@receiver([post_save, post_delete], sender=BlogLike)
+def invalidate_blog_like_pages(sender, instance, **kwargs):
+    """博客点赞变化时，使详情页和按点赞排序的首页缓存失效"""
+    page_cache.invalidate_blog(instance.blog_id, feeds=('most_likes',))
+
+
+@receiver([post_save, post_delete], sender=CommentLike)
+def invalidate_comment_like_pages(sender, instance, **kwargs):
+    """评论点赞变化时，使评论所属博客的详情页缓存失效"""
+    blog_id = BlogComment.objects.filter(pk=instance.comment_id).values_list('blog_id', flat=True).first()
+    if blog_id:
+        page_cache.invalidate_blog(blog_id)
+
+
+def _invalidate_authored_pages(user_id):
+    """
+    用户名和头像渲染在其博客和评论所在详情页的共享片段中，以及首页的博客卡片上，一并失效
+    修改资料的频率很低，按需查询用户发布的博客和评论过的博客
+    """
+    authored = set(Blog.objects.filter(author_id=user_id).values_list('id', flat=True))
+    commented = set(BlogComment.objects.filter(author_id=user_id).order_by().values_list('blog_id', flat=True).distinct())
+    scopes = [page_cache.blog_scope(blog_id) for blog_id in authored | commented]
+    if authored:
+        scopes.extend(page_cache.feed_scope(sort_by) for sort_by in page_cache.ALL_FEEDS)
+    page_cache.invalidate(*scopes)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_pages(sender, instance, created=False, update_fields=None, **kwargs):
+    """用户信息变化时，使其个人页和导航栏中带有该用户信息的页面验证信息失效"""
+    page_cache.invalidate(page_cache.user_scope(instance.pk))
+    # 新用户还没有博客和评论；登录时只更新last_login，页面内容不变
+    if created or (update_fields is not None and set(update_fields) == {'last_login'}):
+        return
+    _invalidate_authored_pages(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def update_user_suggestion(sender, instance, update_fields=None, **kwargs):
+    """用户名变化或账号停用时更新搜索框输入提示，登录时只更新last_login，跳过"""
+    if update_fields is not None and not {'username', 'is_active'} & set(update_fields):
+        return
+    if instance.is_active:
+        autocomplete.update('user', instance.pk, instance.username)
+    else:
+        autocomplete.remove('user', instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def remove_user_suggestion(sender, instance, **kwargs):
+    autocomplete.remove('user', instance.pk)
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_profile_pages(sender, instance, created=False, **kwargs):
+    """用户资料（头像、简介）变化时，同上"""
+    page_cache.invalidate(page_cache.user_scope(instance.user_id))
+    if not created:
+        _invalidate_authored_pages(instance.user_id)
@@ -1,3 +1,1049 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import re
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import (
+    autocomplete, chunked_upload, counters, images, media_store, page_cache, ratelimit, rendering, search, view_counter,
+)
+from .comment_tree import load_comment_page
+from .models import (
+    BlogCategory, Blog, BlogComment, BlogLike, ChunkedUpload, CommentLike, LikeCounterShard, StoredFile,
+)
+from .pagination import FEED_SORT_FIELDS, encode_cursor, paginate_feed
+from .reactions import toggle_blog_like, toggle_comment_like
+
+User = get_user_model()
 
 # Create your tests here.
+
+class CommentTreeTests(TestCase):
+    """评论树加载的测试"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='password123')
+        category = BlogCategory.objects.create(name='技术')
+        self.blog = Blog.objects.create(title='标题', content='<p>内容</p>', category=category, author=self.user)
+
+    def add_comments(self, count):
+        """添加count条顶级评论，每条评论带一条回复，并点赞其中一半"""
+        for i in range(count):
+            author = User.objects.create_user(username=f'user{BlogComment.objects.count()}', password='password123')
+            comment = BlogComment.objects.create(blog=self.blog, author=author, content=f'评论{i}')
+            reply = BlogComment.objects.create(blog=self.blog, author=author, content=f'回复{i}', parent_comment=comment)
+            if i % 2 == 0:
+                CommentLike.objects.create(comment=reply, user=self.user)
+
+    def count_detail_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('blog:blog_detail', kwargs={'blog_id': self.blog.id}))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_loads_page_with_reply_previews_and_like_status(self):
+        self.add_comments(3)
+        roots, next_cursor = load_comment_page(self.blog, self.user, page_size=2)
+        self.assertEqual(len(roots), 2)
+        self.assertIsNotNone(next_cursor)
+        for root in roots:
+            self.assertEqual(root.reply_count, 1)
+            self.assertEqual(len(root.children), 1)
+            self.assertFalse(root.is_liked)
+        self.assertEqual(sum(root.children[0].is_liked for root in roots), 1)
+
+        roots, next_cursor = load_comment_page(self.blog, self.user, cursor=next_cursor, page_size=2)
+        self.assertEqual(len(roots), 1)
+        self.assertIsNone(next_cursor)
+
+    def test_detail_query_count_is_constant(self):
+        self.client.force_login(self.user)
+        self.add_comments(2)
+        # 登录后的第一个请求把用户写入缓存，先请求其他页面，不计入比较
+        self.client.get(reverse('author:settings'))
+        small = self.count_detail_queries()
+        self.add_comments(30)
+        self.assertEqual(self.count_detail_queries(), small)
+
+    def test_comment_list_api_pages(self):
+        self.add_comments(5)
+        # 创建时间相同的评论按id区分先后
+        BlogComment.objects.update(create_time=BlogComment.objects.first().create_time)
+        url = reverse('blog:comment_list_api', kwargs={'blog_id': self.blog.id})
+        ids, params = [], {}
+        with mock.patch('blog.views.COMMENTS_PAGE_SIZE', 2):
+            while True:
+                data = self.client.get(url, params).json()['data']
+                ids += [comment['id'] for comment in data['comments']]
+                for comment in data['comments']:
+                    self.assertEqual(comment['reply_count'], 1)
+                    self.assertEqual(len(comment['replies']), 1)
+                    self.assertEqual(comment['replies'][0]['parent_id'], comment['id'])
+                    self.assertIsNone(comment['replies_cursor'])
+                if not data['next_cursor']:
+                    break
+                params['cursor'] = data['next_cursor']
+        roots = BlogComment.objects.filter(parent_comment__isnull=True).order_by('-create_time', '-id')
+        self.assertEqual(ids, list(roots.values_list('id', flat=True)))
+
+    def test_comment_replies_api_continues_after_preview(self):
+        root = BlogComment.objects.create(blog=self.blog, author=self.user, content='评论')
+        for i in range(7):
+            BlogComment.objects.create(blog=self.blog, author=self.user, content=f'回复{i}', parent_comment=root)
+        comment = self.client.get(
+            reverse('blog:comment_list_api', kwargs={'blog_id': self.blog.id})
+        ).json()['data']['comments'][0]
+        self.assertEqual(comment['reply_count'], 7)
+        ids = [reply['id'] for reply in comment['replies']]
+        self.assertEqual(len(ids), 3)
+
+        url = reverse('blog:comment_replies_api', kwargs={'comment_id': root.id})
+        params = {'cursor': comment['replies_cursor']}
+        with mock.patch('blog.views.COMMENTS_PAGE_SIZE', 3):
+            while params['cursor']:
+                data = self.client.get(url, params).json()['data']
+                ids += [reply['id'] for reply in data['replies']]
+                params['cursor'] = data['next_cursor']
+        self.assertEqual(ids, list(root.replies.order_by('-create_time', '-id').values_list('id', flat=True)))
+
+    def test_comment_apis_reject_invalid_parameters(self):
+        self.add_comments(1)
+        root = BlogComment.objects.get(parent_comment__isnull=True)
+        list_url = reverse('blog:comment_list_api', kwargs={'blog_id': self.blog.id})
+        replies_url = reverse('blog:comment_replies_api', kwargs={'comment_id': root.id})
+        feed_cursor = encode_cursor('newest', root.create_time, root.id)
+        for cursor in ('garbage', '!!!', feed_cursor, encode_cursor('create_time', 'x', root.id)):
+            for url in (list_url, replies_url):
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 400, cursor)
+                self.assertEqual(response.json()['code'], 400)
+        self.assertEqual(
+            self.client.get(reverse('blog:comment_list_api', kwargs={'blog_id': self.blog.id + 100})).status_code, 404
+        )
+        self.assertEqual(
+            self.client.get(reverse('blog:comment_replies_api', kwargs={'comment_id': root.id + 100})).status_code, 404
+        )
+
+
+class FeedPaginationTests(TestCase):
+    """首页游标分页的测试"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='author', password='password123')
+        category = BlogCategory.objects.create(name='技术')
+        self.blogs = [
+            Blog.objects.create(title=f'标题{i}', content='<p>内容</p>', category=category, author=user)
+            for i in range(7)
+        ]
+        # 排序字段有大量相同的值，只能依靠id区分先后
+        Blog.objects.update(create_time=self.blogs[0].create_time)
+        for blog, likes, views in zip(self.blogs, (3, 1, 3, 0, 3, 1, 0), (5, 5, 5, 2, 2, 9, 0)):
+            Blog.objects.filter(pk=blog.pk).update(likes_count=likes, views_count=views)
+
+    def feed_pages(self, sort_by, page_size=2):
+        """按接口返回的游标翻完所有页，:return: 每页的博客ID列表"""
+        pages = []
+        params = {'sort_by': sort_by}
+        with mock.patch('blog.views.FEED_PAGE_SIZE', page_size):
+            while True:
+                response = self.client.get(reverse('blog:feed_api'), params)
+                self.assertEqual(response.status_code, 200)
+                data = response.json()['data']
+                pages.append([blog['id'] for blog in data['blogs']])
+                if not data['next_cursor']:
+                    return pages
+                params['cursor'] = data['next_cursor']
+
+    def test_each_sort_pages_without_duplicates_or_gaps(self):
+        for sort_by, field in FEED_SORT_FIELDS.items():
+            expected = list(Blog.objects.order_by(f'-{field}', '-id').values_list('id', flat=True))
+            pages = self.feed_pages(sort_by)
+            self.assertEqual([blog_id for page in pages for blog_id in page], expected, sort_by)
+            self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+
+    def test_cursor_is_stable_across_ties(self):
+        blogs, cursor = paginate_feed(Blog.objects.all(), 'newest', page_size=3)
+        self.assertEqual(paginate_feed(Blog.objects.all(), 'newest', page_size=3)[1], cursor)
+        # 游标之后新发布的同一时间的博客（id更大）不会插入到后续页中
+        Blog.objects.create(
+            title='新博客', content='<p>内容</p>', category=self.blogs[0].category, author=self.blogs[0].author,
+        )
+        Blog.objects.update(create_time=self.blogs[0].create_time)
+        rest, _ = paginate_feed(Blog.objects.all(), 'newest', cursor=cursor, page_size=10)
+        self.assertEqual([blog.id for blog in rest], [blog.id for blog in reversed(self.blogs[:4])])
+
+    def test_invalid_cursors_return_400(self):
+        def cursor(*parts):
+            return base64.urlsafe_b64encode(json.dumps(list(parts)).encode()).decode()
+
+        newest = encode_cursor('newest', self.blogs[0].create_time, self.blogs[0].id)
+        cursors = [
+            'garbage', '!!!', cursor('newest'), cursor('newest', 'x', 1), cursor('newest', 1, 1),
+            cursor('most_likes', 1, 'x'), cursor('most_likes', '1', 1), cursor('most_likes', 1, 2 ** 70),
+            cursor('most_likes', -2 ** 70, 1), cursor('newest', '2026-01-01T00:00:00+08:00', 1),
+            base64.urlsafe_b64encode(b'\xff\xfe').decode(), base64.urlsafe_b64encode(b'{"a": 1}').decode(),
+        ]
+        for value in cursors:
+            for sort_by in ('newest', 'most_likes'):
+                params = {'sort_by': sort_by, 'cursor': value}
+                self.assertEqual(self.client.get(reverse('blog:feed_api'), params).status_code, 400, value)
+                self.assertEqual(self.client.get(reverse('blog:index'), params).status_code, 400, value)
+        # 与排序方式不匹配的游标
+        params = {'sort_by': 'most_views', 'cursor': newest}
+        self.assertEqual(self.client.get(reverse('blog:feed_api'), params).status_code, 400)
+        self.assertEqual(self.client.get(reverse('blog:search_blog'), params).status_code, 400)
+
+
+@override_settings(BLOG_VIEW_COUNTER_CACHE='default', BLOG_VIEW_COUNTER_FLUSH_INTERVAL=0)
+class ViewCounterTests(TestCase):
+    """浏览量缓冲计数的测试，使用本地内存缓存"""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username='author', password='password123')
+        category = BlogCategory.objects.create(name='技术')
+        self.blogs = [
+            Blog.objects.create(title=f'标题{i}', content='<p>内容</p>', category=category, author=self.user)
+            for i in range(3)
+        ]
+
+    def visit(self, blog, ip='10.0.0.1'):
+        return view_counter.record_view(self.factory.get('/', REMOTE_ADDR=ip), blog.id)
+
+    def views_count(self, blog):
+        return Blog.objects.values_list('views_count', flat=True).get(pk=blog.pk)
+
+    def test_repeated_visits_are_counted_once(self):
+        blog = self.blogs[0]
+        self.assertTrue(self.visit(blog))
+        self.assertFalse(self.visit(blog))
+        self.assertTrue(self.visit(blog, ip='10.0.0.2'))
+        # 同一访客访问其他博客单独去重
+        self.assertTrue(self.visit(self.blogs[1]))
+        self.assertEqual(view_counter.pending_views(blog.id), 2)
+        self.assertEqual(self.views_count(blog), 0)
+
+    def test_flush_writes_back_previous_generation(self):
+        blog = self.blogs[0]
+        self.visit(blog)
+        generation = view_counter.generation()
+        # 第一次刷新只切换代数，刚被替换下来的一代可能仍有并发写入，暂不写回
+        self.assertEqual(view_counter.flush(), 0)
+        self.assertEqual(view_counter.generation(), generation + 1)
+        self.assertEqual(view_counter.pending_views(blog.id), 1)
+
+        self.visit(blog, ip='10.0.0.2')
+        self.assertEqual(view_counter.flush(), 1)
+        self.assertEqual(self.views_count(blog), 1)
+        # 切换后写入的浏览量留在新一代中，下一次刷新才写回
+        self.assertEqual(view_counter.pending_views(blog.id), 1)
+
+        self.assertEqual(view_counter.flush(force=True), 1)
+        self.assertEqual(self.views_count(blog), 2)
+        self.assertEqual(view_counter.pending_views(blog.id), 0)
+        self.assertEqual(view_counter.flush(force=True), 0)
+
+    def test_flush_groups_updates_by_delta(self):
+        for blog, visitors in zip(self.blogs, (2, 2, 1)):
+            for i in range(visitors):
+                self.visit(blog, ip=f'10.0.0.{i}')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(view_counter.flush(force=True), 5)
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        # 增量相同的两篇博客合并为一条UPDATE
+        self.assertEqual(len(updates), 2)
+        self.assertEqual([self.views_count(blog) for blog in self.blogs], [2, 2, 1])
+
+
+class ReactionTests(TestCase):
+    """点赞切换和点赞计数修复的测试"""
+
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(username=f'user{i}', password='password123') for i in range(3)]
+        category = BlogCategory.objects.create(name='技术')
+        self.blog = Blog.objects.create(title='标题', content='<p>内容</p>', category=category, author=self.users[0])
+        self.comment = BlogComment.objects.create(blog=self.blog, author=self.users[0], content='评论')
+
+    def likes_count(self, model=Blog, pk=None):
+        return model.objects.values_list('likes_count', flat=True).get(pk=pk or self.blog.pk)
+
+    def test_like_then_unlike_restores_count(self):
+        self.assertEqual(toggle_blog_like(self.blog.id, self.users[0]), (True, 1))
+        self.assertEqual(toggle_blog_like(self.blog.id, self.users[1]), (True, 2))
+        self.assertEqual(toggle_blog_like(self.blog.id, self.users[0]), (False, 1))
+        self.assertEqual(self.likes_count(), 1)
+        self.assertEqual(toggle_comment_like(self.comment.id, self.users[0]), (True, 1))
+        self.assertEqual(toggle_comment_like(self.comment.id, self.users[0]), (False, 0))
+        self.assertEqual(self.likes_count(BlogComment, self.comment.pk), 0)
+
+    def test_count_never_goes_negative(self):
+        toggle_blog_like(self.blog.id, self.users[0])
+        # 计数与点赞记录不一致（例如被手动修改）时，取消点赞不会减成负数
+        Blog.objects.filter(pk=self.blog.pk).update(likes_count=0)
+        self.assertEqual(toggle_blog_like(self.blog.id, self.users[0]), (False, 0))
+        self.assertEqual(toggle_blog_like(self.blog.id, self.users[0]), (True, 1))
+        self.assertEqual(toggle_blog_like(self.blog.id, self.users[0]), (False, 0))
+        self.assertEqual(self.likes_count(), 0)
+
+    def test_missing_target_keeps_no_like(self):
+        with self.assertRaises(Blog.DoesNotExist):
+            toggle_blog_like(self.blog.id + 100, self.users[0])
+        self.assertFalse(BlogLike.objects.exists())
+
+    def test_reconcile_repairs_corrupted_counts(self):
+        for user in self.users:
+            toggle_blog_like(self.blog.id, user)
+        toggle_comment_like(self.comment.id, self.users[0])
+        Blog.objects.filter(pk=self.blog.pk).update(likes_count=10)
+        BlogComment.objects.filter(pk=self.comment.pk).update(likes_count=-2)
+
+        call_command('reconcile_like_counts', '--dry-run', stdout=io.StringIO())
+        self.assertEqual(self.likes_count(), 10)
+        out = io.StringIO()
+        call_command('reconcile_like_counts', stdout=out)
+        self.assertIn(f'id={self.blog.id}: 10 -> 3', out.getvalue())
+        self.assertEqual(self.likes_count(), 3)
+        self.assertEqual(self.likes_count(BlogComment, self.comment.pk), 1)
+
+    @override_settings(BLOG_LIKE_COUNTER_SHARDS=4)
+    def test_fold_preserves_total(self):
+        for user in self.users:
+            toggle_blog_like(self.blog.id, user)
+        self.assertEqual(toggle_blog_like(self.blog.id, self.users[0]), (False, 2))
+        # 增量写入分片，likes_count字段不变
+        self.assertEqual(self.likes_count(), 0)
+        # 计数已经正确，修复命令计入未合并的分片，不做修改
+        call_command('reconcile_like_counts', '--target', 'blog', stdout=io.StringIO())
+        self.assertEqual(self.likes_count(), 0)
+
+        self.assertEqual(counters.fold(), 1)
+        self.assertEqual(self.likes_count(), 2)
+        self.assertFalse(LikeCounterShard.objects.exclude(delta=0).exists())
+        self.assertEqual(counters.current_count('blog', self.blog.id), 2)
+        # 没有新的增量时不再合并
+        self.assertEqual(counters.fold(), 0)
+
+
+@override_settings(BLOG_PAGE_CACHE_TIMEOUT=60)
+class PageCacheTests(TestCase):
+    """匿名访客整页缓存的测试"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='author', password='password123')
+        category = BlogCategory.objects.create(name='技术')
+        self.blog = Blog.objects.create(title='标题', content='<p>内容</p>', category=category, author=user)
+
+    def csrf_token(self, response):
+        return re.search(r'<meta name="csrf-token" content="([^"]+)">', response.content.decode()).group(1)
+
+    def assert_csrf_usable(self, client, response):
+        """响应设置了csrftoken Cookie，页面中的Token可以通过CSRF校验"""
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+        token = self.csrf_token(response)
+        self.assertNotIn(page_cache.CSRF_PLACEHOLDER, response.content.decode())
+        login = client.post(reverse('author:login'), {'email': 'a@example.com', 'password': 'x'}, HTTP_X_CSRFTOKEN=token)
+        self.assertNotEqual(login.status_code, 403)
+        return token
+
+    def test_cached_pages_use_each_visitors_csrf_token(self):
+        for url in (reverse('blog:index'), reverse('blog:blog_detail', kwargs={'blog_id': self.blog.id})):
+            first, second = Client(enforce_csrf_checks=True), Client(enforce_csrf_checks=True)
+            first_token = self.assert_csrf_usable(first, first.get(url))
+            hits = page_cache.stats()['hit']
+            second_response = second.get(url)
+            self.assertEqual(page_cache.stats()['hit'], hits + 1)
+            self.assertNotEqual(self.assert_csrf_usable(second, second_response), first_token)
+
+
+@override_settings(BLOG_PAGE_CACHE_TIMEOUT=60, BLOG_VIEW_COUNTER_CACHE='default', BLOG_VIEW_COUNTER_FLUSH_INTERVAL=0)
+class SharedFragmentTests(TestCase):
+    """详情页共享片段和点赞状态接口的测试"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='password123')
+        self.reader = User.objects.create_user(username='reader', password='password123')
+        category = BlogCategory.objects.create(name='技术')
+        self.blog = Blog.objects.create(title='标题', content='<p>内容</p>', category=category, author=self.author)
+        self.comment = BlogComment.objects.create(blog=self.blog, author=self.reader, content='评论')
+        self.url = reverse('blog:blog_detail', kwargs={'blog_id': self.blog.id})
+        self.client.force_login(self.reader)
+
+    def get_detail(self):
+        """:return: (响应, 是否命中共享片段)"""
+        hits = page_cache.stats()['fragment_hit']
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response, page_cache.stats()['fragment_hit'] == hits + 1
+
+    def test_logged_in_users_share_the_fragment(self):
+        Client().get(self.url)
+        response, hit = self.get_detail()
+        self.assertTrue(hit)
+        self.assertContains(response, '<p>内容</p>', html=True)
+        # 导航栏中是当前用户，不来自共享片段
+        self.assertEqual(response.context['user'], self.reader)
+
+    def test_profile_changes_refresh_the_fragment(self):
+        self.get_detail()
+        self.assertTrue(self.get_detail()[1])
+        self.author.username = 'renamed-author'
+        self.author.save()
+        response, hit = self.get_detail()
+        self.assertFalse(hit)
+        self.assertContains(response, 'renamed-author')
+
+        # 评论者的资料同样渲染在片段中
+        self.reader.userprofile.bio = '简介'
+        self.reader.userprofile.save()
+        self.assertFalse(self.get_detail()[1])
+        # 登录只更新last_login，不影响片段
+        self.reader.save(update_fields=['last_login'])
+        self.assertTrue(self.get_detail()[1])
+
+    def test_view_count_flush_refreshes_the_fragment(self):
+        self.get_detail()
+        view_counter.flush(force=True)
+        response, hit = self.get_detail()
+        self.assertFalse(hit)
+        self.assertEqual(response.context['detail_body'].count('<div class="font-bold text-gray-700">1</div>'), 1)
+
+    def test_like_state_is_per_user(self):
+        toggle_blog_like(self.blog.id, self.reader)
+        toggle_comment_like(self.comment.id, self.reader)
+        url = reverse('blog:like_state_api', kwargs={'blog_id': self.blog.id})
+        params = {'comment_ids': f'{self.comment.id},{self.comment.id + 100}'}
+
+        data = self.client.get(url, params).json()['data']
+        self.assertEqual(data, {'blog_liked': True, 'liked_comment_ids': [self.comment.id]})
+        other = Client()
+        other.force_login(self.author)
+        self.assertEqual(other.get(url, params).json()['data'], {'blog_liked': False, 'liked_comment_ids': []})
+        self.assertEqual(Client().get(url, params).json()['data'], {'blog_liked': False, 'liked_comment_ids': []})
+        self.assertEqual(self.client.get(url, {'comment_ids': 'x'}).status_code, 400)
+
+
+@override_settings(BLOG_VIEW_COUNTER_CACHE='default', BLOG_VIEW_COUNTER_FLUSH_INTERVAL=0)
+class ConditionalGetTests(TestCase):
+    """详情页和首页ETag/Last-Modified的测试"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author', password='password123')
+        category = BlogCategory.objects.create(name='技术')
+        self.blog = Blog.objects.create(title='标题', content='<p>内容</p>', category=category, author=self.user)
+        self.detail_url = reverse('blog:blog_detail', kwargs={'blog_id': self.blog.id})
+        self.index_url = reverse('blog:index')
+
+    def test_matching_etag_returns_304_without_rendering(self):
+        # 详情页只查询博客的更新时间和最新评论时间，首页不查询数据库
+        for url, template, queries in ((self.detail_url, 'blog_detail.html', 1), (self.index_url, 'index.html', 0)):
+            etag = self.client.get(url)['ETag']
+            with self.assertNumQueries(queries), self.assertTemplateNotUsed(template):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], etag)
+
+    def test_comments_and_likes_change_etag(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        BlogComment.objects.create(blog=self.blog, author=self.user, content='评论')
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etags = [self.client.get(url)['ETag'] for url in (self.detail_url, self.index_url)]
+        toggle_blog_like(self.blog.id, self.user)
+        for url, etag in zip((self.detail_url, self.index_url), etags):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_users_get_different_etags(self):
+        other = User.objects.create_user(username='reader', password='password123')
+        first, second = Client(), Client()
+        first.force_login(self.user)
+        second.force_login(other)
+        for url in (self.detail_url, self.index_url):
+            etag = first.get(url)['ETag']
+            self.assertNotEqual(second.get(url)['ETag'], etag)
+            self.assertEqual(second.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_view_count_flush_updates_last_modified(self):
+        for offset, url in ((10, self.detail_url), (20, self.index_url)):
+            last_modified = self.client.get(url)['Last-Modified']
+            self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+            # 写回的浏览量改变了页面内容，只带If-Modified-Since的请求同样拿到新页面
+            with mock.patch('time.time', return_value=time.time() + offset):
+                view_counter.flush()
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['Last-Modified'], last_modified)
+
+
+class SearchTests(TestCase):
+    """倒排索引搜索的测试"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author', password='password123')
+        self.category = BlogCategory.objects.create(name='技术')
+
+    def create_blog(self, title, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Blog.objects.create(title=title, content=content, category=self.category, author=self.user)
+
+    def search_ids(self, keyword):
+        return [blog_id for blog_id, _ in search.search(keyword)]
+
+    def test_normalizes_full_width_and_case(self):
+        blog = self.create_blog('入门', '<p>使用ＤＪＡＮＧＯ和Python３开发</p>')
+        self.assertEqual(search.normalize_query('  Ｄjango  DJANGO '), ['django'])
+        self.assertEqual(self.search_ids('django'), [blog.id])
+        self.assertEqual(self.search_ids('ＰＹＴＨＯＮ３'), [blog.id])
+        self.assertEqual(self.search_ids('python3 Django'), [blog.id])
+        self.assertEqual(self.search_ids('flask'), [])
+
+    def test_single_character_cjk_query(self):
+        blog = self.create_blog('笔记', '<p>数据库索引</p>')
+        self.create_blog('其他', '<p>消息队列</p>')
+        self.assertEqual(search.tokenize('数据库'), ['数据', '据库'])
+        self.assertEqual(self.search_ids('索'), [blog.id])
+        self.assertEqual(self.search_ids('库索'), [blog.id])
+        # 所有检索词都需命中
+        self.assertEqual(self.search_ids('索引 队列'), [])
+
+    def test_ranks_title_and_repeated_matches_higher(self):
+        in_content = self.create_blog('笔记', '<p>介绍redis的用法，以及其他很多内容</p>')
+        in_title = self.create_blog('redis笔记', '<p>介绍缓存的用法，以及其他很多内容</p>')
+        frequent = self.create_blog('笔记', '<p>介绍redis的用法，以及redis很多redis</p>')
+        self.create_blog('笔记', '<p>与检索词无关</p>')
+        scores = dict(search.search('Redis'))
+        self.assertEqual(set(scores), {in_content.id, in_title.id, frequent.id})
+        # 长度相近时，标题命中和多次命中的博客排在只在正文中命中一次的博客之前
+        self.assertGreater(scores[in_title.id], scores[in_content.id])
+        self.assertGreater(scores[frequent.id], scores[in_content.id])
+        self.assertEqual(self.search_ids('Redis')[-1], in_content.id)
+
+    def test_reindexes_after_edit_and_delete(self):
+        blog = self.create_blog('标题', '<p>缓存穿透</p>')
+        self.assertEqual(self.search_ids('缓存'), [blog.id])
+
+        # 只更新浏览量等字段时不重新索引
+        with CaptureQueriesContext(connection) as queries:
+            blog.views_count = 5
+            blog.save(update_fields=['views_count'])
+        self.assertFalse(any('search' in query['sql'] for query in queries.captured_queries))
+
+        blog.content = '<p>消息队列</p>'
+        with self.captureOnCommitCallbacks(execute=True):
+            blog.save()
+        # 编辑后递增代数，缓存的旧结果不再被读取
+        self.assertEqual(self.search_ids('缓存'), [])
+        self.assertEqual(self.search_ids('队列'), [blog.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            blog.delete()
+        self.assertEqual(self.search_ids('队列'), [])
+
+
+class AutocompleteTests(TestCase):
+    """搜索框输入提示的测试"""
+
+    def setUp(self):
+        cache.clear()
+        autocomplete.reset()
+        self.addCleanup(autocomplete.reset)
+        self.user = User.objects.create_user(username='django_fan', password='password123')
+        self.category = BlogCategory.objects.create(name='Django')
+        self.blog = Blog.objects.create(
+            title='Django入门', content='<p>内容</p>', category=self.category, author=self.user, views_count=10,
+        )
+
+    def suggest(self, q, **params):
+        response = self.client.get(reverse('blog:autocomplete_api'), {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(item['type'], item['label']) for item in response.json()['data']['suggestions']]
+
+    def test_api_returns_matches_by_type(self):
+        self.assertEqual(
+            set(self.suggest('dj')), {('blog', 'Django入门'), ('category', 'Django'), ('user', 'django_fan')}
+        )
+        self.assertEqual(self.suggest('ＤＪ', type='user'), [('user', 'django_fan')])
+        # 标题中间的英文单词也能匹配
+        Blog.objects.create(title='学习 Python', content='<p>内容</p>', category=self.category, author=self.user)
+        self.assertEqual(self.suggest('pyth'), [('blog', '学习 Python')])
+        self.assertEqual(self.suggest(''), [])
+
+    def test_limit_is_clamped(self):
+        for i in range(12):
+            Blog.objects.create(title=f'Django{i}', content='<p>内容</p>', category=self.category, author=self.user)
+        self.assertEqual(len(self.suggest('django', limit=2)), 2)
+        self.assertEqual(len(self.suggest('django', limit=100)), autocomplete.MAX_SUGGESTIONS)
+        self.assertEqual(len(self.suggest('django', limit=0)), 1)
+        self.assertEqual(len(self.suggest('django', limit=-3)), 1)
+
+    def test_api_rejects_invalid_parameters(self):
+        url = reverse('blog:autocomplete_api')
+        self.assertEqual(self.client.get(url, {'q': 'dj', 'limit': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'q': 'dj', 'type': 'comment'}).status_code, 400)
+
+    def test_signals_update_loaded_index(self):
+        self.assertEqual(self.suggest('django入'), [('blog', 'Django入门')])
+        self.blog.title = 'Flask入门'
+        self.blog.save()
+        self.assertEqual(self.suggest('django入'), [])
+        self.assertEqual(self.suggest('flask'), [('blog', 'Flask入门')])
+        self.blog.delete()
+        self.assertEqual(self.suggest('flask'), [])
+
+        self.category.name = '后端'
+        self.category.save()
+        self.assertEqual(self.suggest('后', type='category'), [('category', '后端')])
+        self.category.delete()
+        self.assertEqual(self.suggest('后', type='category'), [])
+
+        self.user.username = 'pythonista'
+        self.user.save()
+        self.assertEqual(self.suggest('django', type='user'), [])
+        self.assertEqual(self.suggest('python', type='user'), [('user', 'pythonista')])
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        self.assertEqual(self.suggest('python', type='user'), [])
+        self.user.is_active = True
+        self.user.save(update_fields=['is_active'])
+        self.user.delete()
+        self.assertEqual(self.suggest('python', type='user'), [])
+
+
+class ContentSanitizerTests(TestCase):
+    """正文白名单清理的测试，处理结果在详情页中不转义直接输出"""
+
+    def render(self, content):
+        return rendering.process(content)['rendered_content']
+
+    def test_removes_unsafe_url_schemes(self):
+        for href in (
+            'javascript:alert(1)', 'JaVaScRiPt:alert(1)', ' javascript:alert(1)', 'java\tscript:alert(1)',
+            'jav&#x61;script:alert(1)', '&#106;avascript:alert(1)', 'javascript&colon;alert(1)',
+            'vbscript:msgbox(1)', 'data:text/html;base64,PHNjcmlwdD4=',
+        ):
+            with self.subTest(href=href):
+                self.assertEqual(self.render(f'<a href="{href}">链接</a>'), '<a>链接</a>')
+        self.assertNotIn('src', self.render('<img src="javascript:alert(1)">'))
+        self.assertEqual(self.render('<video poster="data:image/svg+xml,x"></video>'), '<video></video>')
+        self.assertEqual(
+            self.render('<a href="https://example.com/?a=1&amp;b=2">链接</a><a href="/blog/1/">站内</a>'),
+            '<a href="https://example.com/?a=1&amp;b=2">链接</a><a href="/blog/1/">站内</a>',
+        )
+
+    def test_removes_event_attributes_and_scripts(self):
+        rendered = self.render(
+            '<p onclick="alert(1)" id="x">段落</p><img src="/missing.png" onerror="alert(1)">'
+            '<script>alert(1)</script><svg onload="alert(1)"><style>p{}</style>文字</svg>'
+            '<iframe src="https://example.com"></iframe>'
+        )
+        self.assertNotIn('alert', rendered)
+        self.assertNotRegex(rendered, r'\son\w+=')
+        self.assertNotIn('iframe', rendered)
+        self.assertTrue(rendered.startswith('<p>段落</p><img src="/missing.png"'))
+        self.assertTrue(rendered.endswith('文字'))
+
+    def test_filters_inline_styles(self):
+        rendered = self.render(
+            '<p style="COLOR: red; position: fixed; background-image: url(x.png); '
+            'width: expression(alert(1)); font-size: 16px; color: java&#115;cript:x">文字</p>'
+        )
+        self.assertEqual(rendered, '<p style="color: red; font-size: 16px">文字</p>')
+        self.assertEqual(self.render('<span style="behavior: url(x.htc)">文字</span>'), '<span>文字</span>')
+
+    def test_escapes_attribute_values_and_text(self):
+        rendered = self.render('<a href="/a" title=\'x" onmouseover="alert(1)\'>链接</a>')
+        self.assertEqual(rendered, '<a href="/a" title="x&quot; onmouseover=&quot;alert(1)">链接</a>')
+        rendered = self.render('<img src="/missing.png" alt="&quot;&gt;&lt;script&gt;">')
+        self.assertIn('alt="&quot;&gt;&lt;script&gt;"', rendered)
+        self.assertEqual(self.render('<p>&lt;script&gt;alert(1)&lt;/script&gt;</p>'), '<p>&lt;script&gt;alert(1)&lt;/script&gt;</p>')
+        self.assertEqual(self.render('<code class="language-python evil">x</code>'), '<code class="language-python">x</code>')
+
+
+class ImageDerivativeTests(TestCase):
+    """上传图片派生图的测试"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name, BLOG_IMAGE_WIDTHS=(320,))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def save_jpeg(self, name, size, orientation=None):
+        from PIL import Image
+
+        image = Image.new('RGB', size, 'red')
+        exif = Image.Exif()
+        if orientation:
+            exif[rendering.EXIF_ORIENTATION] = orientation
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', exif=exif)
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def test_rotated_photo_sizes_match_generated_files(self):
+        from PIL import Image
+
+        # 横向存储、EXIF方向为6（顺时针旋转90度显示）的手机照片
+        name = self.save_jpeg('uploads/images/photo.jpg', (800, 400), orientation=6)
+        size = rendering.image_size(name)
+        self.assertEqual(size, (400, 800))
+
+        images.generate(name)
+        for target, plain_name, webp_name in images.variants(name, size[0]):
+            output_name = webp_name if plain_name == name else plain_name
+            with default_storage.open(output_name) as file, Image.open(file) as image:
+                self.assertEqual(image.size, (target, round(size[1] * target / size[0])))
+
+        rendered = rendering.process(f'<img src="{settings.MEDIA_URL}{name}">')['rendered_content']
+        self.assertIn('width="400" height="800"', rendered)
+        self.assertIn('_w320.jpg 320w', rendered)
+
+    def test_unrotated_photo_size(self):
+        name = self.save_jpeg('uploads/images/plain.jpg', (800, 400), orientation=1)
+        self.assertEqual(rendering.image_size(name), (800, 400))
+
+    def test_upload_response_lists_only_existing_variants(self):
+        from .views import _uploaded_image_data
+
+        name = self.save_jpeg('uploads/images/photo.jpg', (800, 400))
+        with mock.patch.object(images, 'schedule') as schedule:
+            data = _uploaded_image_data(name, 'photo.jpg')
+        schedule.assert_called_once_with(name)
+        # 派生图还在后台生成，srcset中只有原图
+        self.assertEqual(data['srcset'], f'{settings.MEDIA_URL}{name} 800w')
+        self.assertEqual(data['webp_srcset'], '')
+
+        images.generate(name)
+        with mock.patch.object(images, 'schedule'):
+            data = _uploaded_image_data(name, 'photo.jpg')
+        self.assertIn('_w320.jpg 320w', data['srcset'])
+        self.assertIn('_w320.webp 320w', data['webp_srcset'])
+
+    def test_generation_reprocesses_blogs_published_before_it_finished(self):
+        user = User.objects.create_user(username='author', password='password123')
+        category = BlogCategory.objects.create(name='技术')
+        name = self.save_jpeg('uploads/images/photo.jpg', (800, 400))
+        blog = Blog.objects.create(
+            title='标题', content=f'<p><img src="{settings.MEDIA_URL}{name}"></p>', category=category, author=user
+        )
+        self.assertNotIn('srcset', blog.rendered_content)
+        version = page_cache.version(page_cache.blog_scope(blog.id))
+
+        self.assertTrue(images._generate_logged(name))
+        blog.refresh_from_db()
+        self.assertIn('_w320.jpg 320w', blog.rendered_content)
+        self.assertIn('<picture>', blog.rendered_content)
+        self.assertGreater(page_cache.version(page_cache.blog_scope(blog.id)), version)
+        # 派生图都已存在时不再重新处理
+        self.assertEqual(images._generate_logged(name), [])
+
+
+class MediaReferenceTests(TestCase):
+    """博客正文引用的上传图片的引用计数"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root.name, BLOG_IMAGE_WIDTHS=(320,), BLOG_UPLOAD_GRACE_PERIOD=0
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username='author', password='password123')
+        self.category = BlogCategory.objects.create(name='技术')
+
+    def image_file(self, image_format, name):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (640, 320), 'blue').save(buffer, image_format)
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def img(self, name):
+        return f'<p><img src="{settings.MEDIA_URL}{name}"></p>'
+
+    def ref_count(self, name):
+        return StoredFile.objects.values_list('ref_count', flat=True).filter(name=name).first()
+
+    def save_blog(self, blog=None, content=''):
+        with self.captureOnCommitCallbacks(execute=True):
+            if blog is None:
+                return Blog.objects.create(title='标题', content=content, category=self.category, author=self.user)
+            blog.content = content
+            blog.save()
+            return blog
+
+    def test_uploads_are_counted_when_published(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('blog:upload_image'), {'image': self.image_file('GIF', 'a.gif')})
+        url = response.json()['data']['url']
+        name = url[len(settings.MEDIA_URL):]
+        self.assertEqual(self.ref_count(name), 0)
+
+        first = self.save_blog(content=self.img(name) + self.img(name))
+        second = self.save_blog(content=f'<p><a href="http://testserver{url}">原图</a></p>')
+        self.assertEqual(self.ref_count(name), 2)
+
+        # 只保存浏览量时不读取旧正文
+        with CaptureQueriesContext(connection) as queries:
+            first.views_count = 1
+            first.save(update_fields=['views_count'])
+        self.assertEqual(len(queries), 1)
+
+        self.save_blog(first, '<p>去掉图片</p>')
+        self.assertEqual(self.ref_count(name), 1)
+        self.assertTrue(default_storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertIsNone(self.ref_count(name))
+        self.assertFalse(default_storage.exists(name))
+
+    def test_released_image_derivatives_are_deleted(self):
+        name = media_store.store(self.image_file('JPEG', 'a.jpg'), 'uploads/images', 'jpg', acquire=False)
+        created = images.generate(name)
+        self.assertEqual(len(created), 3)
+        blog = self.save_blog(content=self.img(name))
+        self.assertEqual(self.ref_count(name), 1)
+
+        self.save_blog(blog, '<p>去掉图片</p>')
+        self.assertIsNone(self.ref_count(name))
+        for output_name in [name, *created]:
+            self.assertFalse(default_storage.exists(output_name))
+
+    def test_recent_uploads_are_kept_for_the_grace_period(self):
+        name = media_store.store(self.image_file('PNG', 'a.png'), 'uploads/images', 'png', acquire=False)
+        blog = self.save_blog(content=self.img(name))
+        with override_settings(BLOG_UPLOAD_GRACE_PERIOD=3600):
+            self.save_blog(blog, '<p>去掉图片</p>')
+        self.assertEqual(self.ref_count(name), 0)
+        self.assertTrue(default_storage.exists(name))
+
+    def test_files_without_reference_records_are_kept(self):
+        name = default_storage.save('uploads/old.png', self.image_file('PNG', 'old.png'))
+        blog = self.save_blog(content=self.img(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            blog.delete()
+        self.assertTrue(default_storage.exists(name))
+
+
+class ChunkedUploadTests(TestCase):
+    """可续传分片上传接口的测试"""
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root.name,
+            BLOG_CHUNKED_UPLOAD_DIR=os.path.join(media_root.name, 'parts'),
+            BLOG_CHUNKED_UPLOAD_CHUNK_SIZE=4096,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # 派生图在后台线程中生成，可能在临时目录删除之后才写入，测试中不生成
+        schedule = mock.patch.object(images, 'schedule')
+        schedule.start()
+        self.addCleanup(schedule.stop)
+        self.user = User.objects.create_user(username='author', password='password123')
+        self.client.force_login(self.user)
+
+    def png_bytes(self):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        # 随机像素无法压缩，得到跨越多个分片的文件
+        Image.frombytes('RGB', (80, 80), os.urandom(80 * 80 * 3)).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def init(self, data, filename='photo.png'):
+        response = self.client.post(reverse('blog:chunked_upload_init'), {'size': len(data), 'filename': filename})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']['upload_id']
+
+    def put(self, upload_id, data, start, end, total=None, **extra):
+        return self.client.put(
+            reverse('blog:chunked_upload_chunk', kwargs={'upload_id': upload_id}), data[start:end + 1],
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{total or len(data)}', **extra
+        )
+
+    def offset(self, upload_id):
+        return self.client.get(reverse('blog:chunked_upload_chunk', kwargs={'upload_id': upload_id})).json()['data']['offset']
+
+    def finalize(self, upload_id):
+        return self.client.post(reverse('blog:chunked_upload_finalize', kwargs={'upload_id': upload_id}))
+
+    def test_resumes_out_of_order_and_overlapping_chunks(self):
+        data = self.png_bytes()
+        self.assertGreater(len(data), 3 * 4096)
+        upload_id = self.init(data)
+
+        self.assertEqual(self.put(upload_id, data, 0, 4095).json()['data']['offset'], 4096)
+        # 跳过中间的字节：拒绝并返回服务器已接收的位置
+        response = self.put(upload_id, data, 8192, 12287)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['data']['offset'], 4096)
+        self.assertEqual(self.offset(upload_id), 4096)
+        # 重复发送已接收的分片不改变进度，与已接收部分重叠的分片从重叠处继续
+        self.assertEqual(self.put(upload_id, data, 0, 4095).json()['data']['offset'], 4096)
+        self.assertEqual(self.put(upload_id, data, 2048, 6143).json()['data']['offset'], 6144)
+        # 未上传完成时不能保存
+        self.assertEqual(self.finalize(upload_id).status_code, 409)
+
+        offset = self.offset(upload_id)
+        while offset < len(data):
+            offset = self.put(upload_id, data, offset, min(offset + 4096, len(data)) - 1).json()['data']['offset']
+        response = self.finalize(upload_id)
+        self.assertEqual(response.json()['errno'], 0)
+
+        name = response.json()['data']['url'][len(settings.MEDIA_URL):]
+        with default_storage.open(name) as file:
+            self.assertEqual(file.read(), data)
+        self.assertTrue(name.endswith('.png'))
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertFalse(os.path.exists(chunked_upload.part_path(upload_id)))
+        self.assertEqual(self.finalize(upload_id).status_code, 404)
+
+    def test_rejects_invalid_ranges(self):
+        data = self.png_bytes()
+        upload_id = self.init(data)
+        url = reverse('blog:chunked_upload_chunk', kwargs={'upload_id': upload_id})
+        missing = self.client.put(url, data[:100], content_type='application/octet-stream')
+        self.assertEqual(missing.status_code, 400)
+        self.assertEqual(self.put(upload_id, data, 0, 99, total=len(data) + 1).status_code, 416)
+        self.assertEqual(self.put(upload_id, data, 0, len(data)).status_code, 416)
+        self.assertEqual(self.put(upload_id, data, 0, 4096).status_code, 413)
+        # Content-Length与字节范围不符
+        self.assertEqual(self.put(upload_id, data, 0, 99, CONTENT_LENGTH='90').status_code, 400)
+        self.assertEqual(self.offset(upload_id), 0)
+
+        # 其他用户不能访问该上传
+        self.client.force_login(User.objects.create_user(username='other', password='password123'))
+        self.assertEqual(self.put(upload_id, data, 0, 99).status_code, 404)
+
+    def test_rejects_non_image_payload(self):
+        data = b'<?php system($_GET["c"]); ?>'.ljust(5000, b' ')
+        upload_id = self.init(data, filename='photo.png')
+        self.put(upload_id, data, 0, 4095)
+        self.put(upload_id, data, 4096, len(data) - 1)
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StoredFile.objects.exists())
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertFalse(os.path.exists(chunked_upload.part_path(upload_id)))
+
+    def test_limits_active_uploads_per_user(self):
+        for _ in range(chunked_upload.MAX_ACTIVE_UPLOADS):
+            self.init(b'x' * 100)
+        response = self.client.post(reverse('blog:chunked_upload_init'), {'size': 100})
+        self.assertEqual(response.status_code, 429)
+        response = self.client.post(reverse('blog:chunked_upload_init'), {'size': 100 * 1024 * 1024})
+        self.assertEqual(response.status_code, 400)
+
+    def test_sniffs_image_type_from_magic_bytes(self):
+        self.assertEqual(chunked_upload.sniff_image(b'\xff\xd8\xff\xe0\x00\x10JFIF'), 'jpg')
+        self.assertEqual(chunked_upload.sniff_image(b'\x89PNG\r\n\x1a\n\x00\x00'), 'png')
+        self.assertEqual(chunked_upload.sniff_image(b'GIF89a\x01\x00'), 'gif')
+        self.assertEqual(chunked_upload.sniff_image(b'RIFF\x24\x00\x00\x00WEBPVP8 '), 'webp')
+        self.assertIsNone(chunked_upload.sniff_image(b'RIFF\x24\x00\x00\x00WAVEfmt '))
+        self.assertIsNone(chunked_upload.sniff_image(b'<svg xmlns="'))
+        self.assertIsNone(chunked_upload.sniff_image(b''))
+
+
+class RateLimitTests(TestCase):
+    """写接口频率限制的测试，计数使用本地内存缓存"""
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(BLOG_RATE_LIMITS={'author:login': {'ip': '3/m'}})
+    def test_limited_endpoint_returns_429_with_retry_after(self):
+        url = reverse('author:login')
+        for _ in range(3):
+            self.assertEqual(self.client.post(url, {'email': 'a@example.com', 'password': 'x'}).status_code, 200)
+        response = self.client.post(url, {'email': 'a@example.com', 'password': 'x'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()['code'], 429)
+        retry_after = int(response['Retry-After'])
+        self.assertEqual(response.json()['data']['retry_after'], retry_after)
+        self.assertTrue(0 < retry_after <= 120)
+        # 只限制修改数据的请求，其他客户端IP单独计数
+        self.assertEqual(self.client.get(url).status_code, 200)
+        other = self.client.post(url, {'email': 'a@example.com', 'password': 'x'}, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(other.status_code, 200)
+
+    def test_chunk_uploads_are_limited(self):
+        user = User.objects.create_user(username='author', password='password123')
+        self.client.force_login(user)
+        url = reverse('blog:chunked_upload_chunk', kwargs={'upload_id': 'missing'})
+        with override_settings(BLOG_RATE_LIMITS={'blog:chunked_upload_chunk': {'user': '2/m'}}):
+            statuses = [self.client.put(url, b'x', HTTP_CONTENT_RANGE='bytes 0-0/1').status_code for _ in range(3)]
+            # 查询进度的GET请求不计数
+            self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(statuses, [404, 404, 429])
+
+    def test_decorated_view_is_limited(self):
+        @ratelimit.rate_limit(name='test-decorated', ip='2/m')
+        def view(request):
+            return HttpResponse('ok')
+
+        factory = RequestFactory()
+
+        def call(method):
+            request = getattr(factory, method)('/', REMOTE_ADDR='10.0.0.1')
+            request.user = AnonymousUser()
+            return view(request)
+
+        self.assertEqual([call('post').status_code for _ in range(2)], [200, 200])
+        response = call('post')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(json.loads(response.content)['data']['retry_after'], int(response['Retry-After']))
+        # GET不计数也不被限制
+        self.assertEqual([call('get').status_code for _ in range(3)], [200, 200, 200])
+
+    def test_sliding_window_across_two_windows(self):
+        limiter_cache = LocMemCache('rate-limit-tests', {})
+        rules = ratelimit.compile_rules({'ip': '4/m'}, 'test')
+        request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.1')
+        request.user = AnonymousUser()
+        start = 1_000_020.0  # 窗口的起点
+
+        def check(now):
+            with mock.patch('time.time', return_value=now):
+                return ratelimit.check(request, rules, limiter_cache)
+
+        self.assertEqual([check(start + i) for i in range(4)], [0, 0, 0, 0])
+        retry_after = check(start + 4)
+        self.assertGreater(retry_after, 0)
+        # 被拒绝的请求同样计数；等待Retry-After秒后的下一个请求被允许
+        self.assertEqual(check(start + 4 + retry_after), 0)
+        # 上一窗口计数的权重随时间线性下降；两个窗口之后计数完全重置
+        self.assertTrue(check(start + 4 + retry_after + 1))
+        self.assertEqual([check(start + 180 + i) for i in range(4)], [0, 0, 0, 0])
+        self.assertTrue(check(start + 184))
@@ -6,8 +6,17 @@ urlpatterns = [
     path('blog/<int:blog_id>/', views.blog_detail, name='blog_detail'),
     path('blog/pub-blog/', views.pub_blog, name='pub_blog'),
     path('blog/upload-image/', views.upload_image, name='upload_image'),
+    path('api/uploads/', views.chunked_upload_init, name='chunked_upload_init'),
+    path('api/uploads/<str:upload_id>/', views.chunked_upload_chunk, name='chunked_upload_chunk'),
+    path('api/uploads/<str:upload_id>/finalize/', views.chunked_upload_finalize, name='chunked_upload_finalize'),
     path('blog/comment/', views.pub_comment, name='comment_blog'),
     path('blog/like-comment/', views.like_comment, name='like_comment'),
     path('blog/like-blog/', views.like_blog, name='like_blog'),
     path('search/', views.search_blog, name='search_blog'),
+    path('api/feed/', views.feed_api, name='feed_api'),
+    path('api/blog/<int:blog_id>/comments/', views.comment_list_api, name='comment_list_api'),
+    path('api/comment/<int:comment_id>/replies/', views.comment_replies_api, name='comment_replies_api'),
+    path('api/blog/<int:blog_id>/like-state/', views.like_state_api, name='like_state_api'),
+    path('api/autocomplete/', views.autocomplete_api, name='autocomplete_api'),
+    path('api/page-cache-stats/', views.page_cache_stats, name='page_cache_stats'),
 ]
\ No newline at end of file
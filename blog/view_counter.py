@@ -0,0 +1,206 @@
+"""
+博客浏览量缓冲计数：按访客去重后先累加到缓存，再定期按增量批量写回 Blog.views_count。
+
+计数按“代”(generation)分组，刷新时先切换到新的一代，再写回已经没有写入的旧一代，
+所以并发访问不会丢失计数。只依赖 add/incr/get_many/delete_many，本地内存缓存和共享缓存都可以使用：
+本地内存缓存需要开启后台刷新线程，共享缓存可以由 flush_view_counts 命令定时刷新。
+"""
+import atexit
+import hashlib
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'blog:views'
+
+# 缓存中计数的保存时间，需要远大于刷新间隔，防止未刷新的计数过期
+COUNTER_TIMEOUT = 60 * 60 * 24
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def get_cache():
+    return caches[_setting('BLOG_VIEW_COUNTER_CACHE', 'default')]
+
+
+def _gen_key():
+    return f'{KEY_PREFIX}:gen'
+
+
+def _count_key(gen, blog_id):
+    return f'{KEY_PREFIX}:{gen}:count:{blog_id}'
+
+
+def _seq_key(gen):
+    return f'{KEY_PREFIX}:{gen}:seq'
+
+
+def _log_key(gen, index):
+    return f'{KEY_PREFIX}:{gen}:id:{index}'
+
+
+def _flush_time_key():
+    return f'{KEY_PREFIX}:flushed'
+
+
+def _current_generation(cache) -> int:
+    cache.add(_gen_key(), 0, timeout=None)
+    return cache.get(_gen_key(), 0)
+
+
+def _visitor_id(request) -> str:
+    """识别访客：优先使用会话，其次登录用户，最后使用IP和UA的摘要"""
+    session = getattr(request, 'session', None)
+    if session is not None and session.session_key:
+        return f's:{session.session_key}'
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'u:{user.pk}'
+    raw = f"{request.META.get('REMOTE_ADDR', '')}|{request.META.get('HTTP_USER_AGENT', '')}"
+    return 'a:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def _incr(cache, gen, blog_id):
+    key = _count_key(gen, blog_id)
+    # 本代第一次出现的博客：写入计数并追加到id日志中
+    if cache.add(key, 1, timeout=COUNTER_TIMEOUT):
+        index = _incr_or_create(cache, _seq_key(gen))
+        cache.set(_log_key(gen, index), blog_id, timeout=COUNTER_TIMEOUT)
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        # 计数在add和incr之间被清理（刚好被刷新），重新计入
+        _incr(cache, gen, blog_id)
+
+
+def _incr_or_create(cache, key) -> int:
+    cache.add(key, 0, timeout=COUNTER_TIMEOUT)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=COUNTER_TIMEOUT)
+        return cache.incr(key)
+
+
+def record_view(request, blog_id) -> bool:
+    """
+    记录一次浏览
+    :param request: 请求对象，用于识别访客并去重
+    :param blog_id: 博客ID
+    :return: 是否计入了浏览量（去重窗口内的重复访问返回False）
+    """
+    cache = get_cache()
+    window = _setting('BLOG_VIEW_DEDUP_WINDOW', 60 * 30)
+    dedup_key = f'{KEY_PREFIX}:seen:{blog_id}:{_visitor_id(request)}'
+    if not cache.add(dedup_key, 1, timeout=window):
+        return False
+
+    _incr(cache, _current_generation(cache), blog_id)
+    _ensure_flush_thread()
+    return True
+
+
+def generation() -> int:
+    """当前计数的代数，每次刷新递增，可作为浏览量展示的版本号"""
+    return _current_generation(get_cache())
+
+
+def last_flush() -> float:
+    """最近一次切换代数的时间戳，与generation对应，作为页面上浏览量的最后修改时间；从未刷新时为0"""
+    return get_cache().get(_flush_time_key(), 0)
+
+
+def pending_views(blog_id) -> int:
+    """获取尚未写回数据库的浏览量，用于详情页展示实时浏览量"""
+    cache = get_cache()
+    gen = _current_generation(cache)
+    counts = cache.get_many([_count_key(gen, blog_id), _count_key(gen - 1, blog_id)])
+    return sum(counts.values())
+
+
+def _drain_generation(cache, gen) -> dict:
+    """读取并清理某一代的全部计数，返回 {blog_id: 增量}"""
+    total = cache.get(_seq_key(gen)) or 0
+    if not total:
+        return {}
+    log_keys = [_log_key(gen, index) for index in range(1, total + 1)]
+    blog_ids = set(cache.get_many(log_keys).values())
+    count_keys = {_count_key(gen, blog_id): blog_id for blog_id in blog_ids}
+    counts = cache.get_many(list(count_keys))
+    cache.delete_many(log_keys + list(count_keys) + [_seq_key(gen)])
+    return {count_keys[key]: value for key, value in counts.items() if value}
+
+
+def flush(force=False) -> int:
+    """
+    将缓冲的浏览量写回数据库
+    :param force: 是否同时刷新刚被替换下来的当前代（进程退出时使用，可能与并发写入竞争）
+    :return: 写回的浏览量总数
+    """
+    from .models import Blog
+
+    cache = get_cache()
+    _current_generation(cache)
+    # 切换到新的一代，之后的浏览计入新一代；上一代已经没有写入，可以安全读取
+    gen = cache.incr(_gen_key())
+    cache.set(_flush_time_key(), time.time(), timeout=None)
+    generations = [gen - 2, gen - 1] if force else [gen - 2]
+
+    deltas = defaultdict(int)
+    for old_gen in generations:
+        if old_gen < 0:
+            continue
+        for blog_id, count in _drain_generation(cache, old_gen).items():
+            deltas[blog_id] += count
+
+    # 按增量分组，相同增量的博客合并为一条UPDATE语句
+    by_delta = defaultdict(list)
+    for blog_id, count in deltas.items():
+        by_delta[count].append(blog_id)
+    for count, blog_ids in by_delta.items():
+        Blog.objects.filter(id__in=blog_ids).update(views_count=F('views_count') + count)
+    return sum(deltas.values())
+
+
+_flush_thread = None
+_flush_thread_lock = threading.Lock()
+
+
+def _flush_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            flush()
+        except Exception:
+            logger.exception('浏览量刷新失败')
+
+
+def _flush_at_exit():
+    try:
+        flush(force=True)
+    except Exception:
+        logger.exception('进程退出时浏览量刷新失败')
+
+
+def _ensure_flush_thread():
+    """按需启动后台刷新线程，BLOG_VIEW_COUNTER_FLUSH_INTERVAL 为0时不启动"""
+    global _flush_thread
+    interval = _setting('BLOG_VIEW_COUNTER_FLUSH_INTERVAL', 0)
+    if not interval or _flush_thread is not None:
+        return
+    with _flush_thread_lock:
+        if _flush_thread is not None:
+            return
+        _flush_thread = threading.Thread(target=_flush_loop, args=(interval,), name='view-counter-flush', daemon=True)
+        _flush_thread.start()
+        atexit.register(_flush_at_exit)
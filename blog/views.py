@@ -1,131 +1,186 @@
-import uuid
-from datetime import datetime
+import json
 
-from django.contrib.auth.decorators import login_required
+from django.conf import settings
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.cache import cache
 from django.core.files.storage import default_storage
-from django.db.models import Q
+from django.db.models import Max
 from django.http import JsonResponse, HttpResponseBadRequest, HttpResponse
 from django.shortcuts import render, redirect, reverse
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 from django.views.decorators.http import require_http_methods, require_POST, require_GET
+from django.views.static import serve as static_serve
 
+from . import autocomplete, chunked_upload, conditional, counters, images, media_store, page_cache, rendering, search, view_counter
+from .comment_tree import load_comment_page, load_replies
 from .forms import BlogForm
-from .models import BlogCategory, Blog, BlogComment, CommentLike, BlogLike
+from .models import BlogCategory, Blog, BlogComment
+from .pagination import InvalidCursor, normalize_sort, paginate_feed
+from .reactions import load_like_state, toggle_blog_like, toggle_comment_like
 
 # Create your views here.
 
+# 首页/搜索每页展示的博客数量
+FEED_PAGE_SIZE = getattr(settings, 'BLOG_FEED_PAGE_SIZE', 12)
+# 详情页每页展示的顶级评论数量，以及每条评论预先展示的回复数量
+COMMENTS_PAGE_SIZE = getattr(settings, 'BLOG_COMMENTS_PAGE_SIZE', 20)
+REPLY_PREVIEW_SIZE = getattr(settings, 'BLOG_REPLY_PREVIEW_SIZE', 3)
+# 点赞状态接口一次最多查询的评论数量
+LIKE_STATE_MAX_COMMENTS = 200
+# 博客总数的缓存时间，发布或删除博客时会立即失效
+TOTAL_BLOGS_CACHE_TIMEOUT = 24 * 3600
+
 def index(request) -> HttpResponse:
     # 从前端获取排序参数，默认按最新发布
-    sort_by = request.GET.get('sort_by', 'newest')
-    if sort_by == 'most_likes':
-        blogs = Blog.objects.all().order_by('-likes_count')
-    elif sort_by == 'most_views':
-        blogs = Blog.objects.all().order_by('-views_count')
-    elif sort_by == 'newest':
-        blogs = Blog.objects.all().order_by('-create_time')
-    return render(request, 'index.html', {'blogs': blogs, 'sort_by': sort_by})
+    sort_by = normalize_sort(request.GET.get('sort_by', 'newest'))
 
+    # 内容未变化时直接返回304，不查询也不渲染
+    cache_scope = page_cache.feed_scope(sort_by)
+    etag, last_modified = _feed_validators(request, cache_scope)
+    not_modified = conditional.check(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
 
-@login_required(login_url='author:login')
-@require_POST
-def like_blog(request) -> JsonResponse:
+    # 匿名访客优先读取整页缓存
+    cached = page_cache.get_page(request, cache_scope)
+    if cached is not None:
+        return conditional.set_headers(cached, etag, last_modified)
+
+    try:
+        blogs, next_cursor = paginate_feed(_feed_queryset(), sort_by, request.GET.get('cursor'), FEED_PAGE_SIZE)
+    except InvalidCursor:
+        return HttpResponseBadRequest("无效的分页参数")
+    # 与无限滚动接口一致，加上尚未合并的点赞分片
+    counters.apply_pending('blog', blogs)
+    context = {
+        'blogs': blogs,
+        'sort_by': sort_by,
+        'next_cursor': next_cursor,
+        'total_blogs': _total_blogs(),
+    }
+    response = page_cache.render_page(request, cache_scope, 'index.html', context)
+    return conditional.set_headers(response, etag, last_modified)
+
+
+def _feed_validators(request, cache_scope):
     """
-    点赞/取消点赞博客
-    :param request: 请求对象
-    :return: JSON响应
+    首页的ETag和最后修改时间
+    所有排序的卡片上都展示点赞数和浏览量，点赞只递增按点赞排序的版本号，浏览量写回时递增计数代数，
+    所以都计入ETag；最后修改时间同样包含它们的变化时间，只带If-Modified-Since的请求也能看到新的浏览量
     """
-    try:
-        # 从POST数据获取博客ID
-        import json
-        data = json.loads(request.body)
-        blog_id = data.get('blog_id')
+    likes_scope = page_cache.feed_scope('most_likes')
+    etag = conditional.make_etag(
+        request, request.get_full_path(), page_cache.version(cache_scope),
+        page_cache.version(likes_scope), view_counter.generation(),
+    )
+    last_modified = max(
+        page_cache.last_modified(cache_scope), page_cache.last_modified(likes_scope), view_counter.last_flush(),
+    )
+    return etag, last_modified
+
+
+def _total_blogs() -> int:
+    """
+    博客总数，缓存在最新发布首页的版本号下
+    发布或删除博客时该版本号递增，计数随之失效，首页渲染不需要每次执行COUNT
+    """
+    key = f'{page_cache.KEY_PREFIX}:total:{page_cache.version(page_cache.feed_scope("newest"))}'
+    total = cache.get(key)
+    if total is None:
+        total = Blog.objects.count()
+        cache.set(key, total, TOTAL_BLOGS_CACHE_TIMEOUT)
+    return total
 
-        if not blog_id:
-            return JsonResponse({'code': 400, 'msg': '缺少博客ID'})
 
-        # 获取博客对象
-        blog = Blog.objects.get(pk=blog_id)
-
-        # 检查是否已经点赞
-        like_obj, created = BlogLike.objects.get_or_create(
-            blog=blog,
-            user=request.user
-        )
+def _feed_queryset():
+    """首页和搜索共用的博客列表查询集，一次性关联作者和头像信息，卡片使用预先计算的摘要，不读取正文"""
+    return Blog.objects.select_related('author', 'author__userprofile', 'category').defer('content')
 
-        # 如果已存在，则取消点赞
-        if not created:
-            like_obj.delete()
-            is_liked = False
-        else:
-            is_liked = True
 
-        # 获取当前点赞数并更新到博客模型
-        likes_count = BlogLike.objects.filter(blog=blog).count()
-        blog.likes_count = likes_count  # 更新博客模型中的点赞数
-        blog.save()  # 保存到数据库
+def _search_feed(keyword, sort_by, cursor):
+    """
+    通过倒排索引搜索博客并分页
+    :param keyword: 搜索关键词
+    :param sort_by: 排序方式，relevance按相关度排序，其余与首页相同
+    :param cursor: 上一页返回的游标
+    :return: (当前页博客列表, 下一页游标或None, 命中的博客总数)
+    """
+    ranked = search.search(keyword)
+    if sort_by == search.RELEVANCE:
+        blog_ids, next_cursor = search.paginate_ranked(ranked, cursor, FEED_PAGE_SIZE)
+        blogs_by_id = _feed_queryset().in_bulk(blog_ids)
+        blogs = [blogs_by_id[blog_id] for blog_id in blog_ids if blog_id in blogs_by_id]
+    else:
+        blogs, next_cursor = paginate_feed(
+            _feed_queryset().filter(id__in=[blog_id for blog_id, _ in ranked]), sort_by, cursor, FEED_PAGE_SIZE
+        )
 
-        # 返回成功响应
-        return JsonResponse({
-            'code': 200,
-            'msg': '操作成功',
-            'likes_count': likes_count,
-            'is_liked': is_liked
-        })
+    # 卡片展示命中词附近的高亮片段，只在标题中命中时展示原摘要
+    snippets = search.build_snippets(keyword, [blog.id for blog in blogs])
+    for blog in blogs:
+        blog.snippet = snippets.get(blog.id, '')
+    return blogs, next_cursor, len(ranked)
+
+
+def _search_sort(request, keyword) -> str:
+    """有搜索关键词时默认按相关度排序"""
+    sort_by = request.GET.get('sort_by', search.RELEVANCE if keyword else 'newest')
+    if keyword and sort_by == search.RELEVANCE:
+        return sort_by
+    return normalize_sort(sort_by)
+
+
+def _serialize_card(blog) -> dict:
+    """将博客卡片需要展示的字段序列化为字典，供无限滚动接口使用"""
+    profile = getattr(blog.author, 'userprofile', None)
+    return {
+        'id': blog.id,
+        'title': blog.title,
+        'excerpt': blog.excerpt,
+        # 搜索结果中的高亮摘要（已转义的HTML），非搜索结果为空
+        'snippet': getattr(blog, 'snippet', ''),
+        'url': reverse('blog:blog_detail', kwargs={'blog_id': blog.id}),
+        'author': {
+            'id': blog.author.id,
+            'username': blog.author.username,
+            'url': reverse('author:user_page', kwargs={'user_id': blog.author.id}),
+            # 首页卡片中的头像显示为32px
+            'avatar_url': profile.avatar_url(32) if profile and profile.avatar else None,
+            'avatar_srcset': profile.avatar_srcset(32) if profile else '',
+        },
+        'create_time': blog.create_time.strftime('%Y-%m-%d'),
+        'views_count': blog.views_count,
+        'likes_count': blog.likes_count,
+    }
 
-    except Blog.DoesNotExist:
-        return JsonResponse({'code': 404, 'msg': '博客不存在'})
-    except Exception as e:
-        return JsonResponse({'code': 500, 'msg': f'服务器错误: {str(e)}'})
 
-@login_required(login_url='author:login')
-@require_POST
-def like_comment(request) -> JsonResponse:
+@require_GET
+def feed_api(request) -> JsonResponse:
     """
-    点赞/取消点赞评论
-    :param request: 请求对象
+    首页/搜索结果的JSON分页接口，用于无限滚动
+    :param request: 请求对象，支持sort_by、cursor、Q参数
     :return: JSON响应
     """
+    keyword = request.GET.get('Q', '').strip()
+    sort_by = _search_sort(request, keyword)
     try:
-        # 从POST数据获取评论ID
-        import json
-        data = json.loads(request.body)
-        comment_id = data.get('comment_id')
-
-        if not comment_id:
-            return JsonResponse({'code': 400, 'msg': '缺少评论ID'})
-
-        # 获取评论对象
-        comment = BlogComment.objects.get(pk=comment_id)
-
-        # 检查是否已经点赞
-        like_obj, created = CommentLike.objects.get_or_create(
-            comment=comment,
-            user=request.user
-        )
-
-        # 如果已存在，则取消点赞
-        if not created:
-            like_obj.delete()
-            is_liked = False
+        if keyword:
+            blogs, next_cursor, _ = _search_feed(keyword, sort_by, request.GET.get('cursor'))
         else:
-            is_liked = True
-
-        # 获取当前点赞数并更新到评论模型
-        likes_count = CommentLike.objects.filter(comment=comment).count()
-        comment.likes_count = likes_count  # 更新评论模型中的点赞数
-        comment.save()  # 保存到数据库
-
-        # 返回成功响应
-        return JsonResponse({
-            'code': 200,
-            'msg': '操作成功',
-            'likes_count': likes_count,
-            'is_liked': is_liked
-        })
-
-    except BlogComment.DoesNotExist:
-        return JsonResponse({'code': 404, 'msg': '评论不存在'})
-    except Exception as e:
-        return JsonResponse({'code': 500, 'msg': f'服务器错误: {str(e)}'})
+            blogs, next_cursor = paginate_feed(_feed_queryset(), sort_by, request.GET.get('cursor'), FEED_PAGE_SIZE)
+    except InvalidCursor:
+        return JsonResponse({'code': 400, 'msg': '无效的分页参数'}, status=400)
+
+    counters.apply_pending('blog', blogs)
+    return JsonResponse({
+        'code': 200,
+        'msg': '获取成功',
+        'data': {
+            'blogs': [_serialize_card(blog) for blog in blogs],
+            'next_cursor': next_cursor,
+        }
+    })
 
 
 def blog_detail(request, blog_id) -> HttpResponse:
@@ -135,58 +190,258 @@ def blog_detail(request, blog_id) -> HttpResponse:
     :param blog_id: 博客ID
     :return: 渲染博客详情页面
     """
+    # 内容未变化时直接返回304，同样计入浏览量
+    cache_scope = page_cache.blog_scope(blog_id)
+    etag, last_modified = _detail_validators(request, blog_id)
+    if etag is not None:
+        not_modified = conditional.check(request, etag, last_modified)
+        if not_modified is not None:
+            view_counter.record_view(request, blog_id)
+            return not_modified
+
+    # 匿名访客优先读取整页缓存，命中时同样计入浏览量
+    cached = page_cache.get_page(request, cache_scope)
+    if cached is not None:
+        view_counter.record_view(request, blog_id)
+        return conditional.set_headers(cached, etag, last_modified)
+
+    # 正文和评论区与用户无关，所有用户共享同一份片段缓存；点赞状态由前端通过like_state_api覆盖。
+    # 片段中带有浏览量，与ETag一样按浏览量计数的代数区分，写回浏览量后重新渲染
+    fragment_name = f'body:{view_counter.generation()}'
+    fragment = page_cache.get_fragment(cache_scope, fragment_name)
+    if fragment is not None:
+        blog_title, detail_body = fragment
+    else:
+        try:
+            blog_title, body_html = _render_detail_body(blog_id)
+        except Blog.DoesNotExist:
+            return HttpResponseBadRequest("博客不存在")
+        page_cache.set_fragment(cache_scope, fragment_name, blog_title, body_html)
+        detail_body = mark_safe(body_html)
+
+    # 记录浏览量：按访客去重后缓冲到缓存，由后台线程或定时命令批量写回数据库
+    view_counter.record_view(request, blog_id)
+
+    context = {
+        'blog_id': blog_id,
+        'blog_title': blog_title,
+        'detail_body': detail_body,
+    }
+    response = page_cache.render_page(request, cache_scope, 'blog_detail.html', context)
+    return conditional.set_headers(response, etag, last_modified)
+
+
+def _detail_validators(request, blog_id):
+    """
+    详情页的ETag和最后修改时间，只查询博客的更新时间和最新评论时间，不加载正文
+    :return: (ETag, 最后修改时间)，博客不存在时返回 (None, None)
+    """
+    row = Blog.objects.filter(pk=blog_id).annotate(
+        latest_comment=Max('comments__create_time')
+    ).values_list('update_time', 'latest_comment').first()
+    if row is None:
+        return None, None
+    update_time, latest_comment = row
+    cache_scope = page_cache.blog_scope(blog_id)
+    etag = conditional.make_etag(
+        request, blog_id, update_time, latest_comment,
+        page_cache.version(cache_scope), view_counter.generation(),
+    )
+    # 点赞等不修改update_time的变化记录在缓存范围的失效时间中，浏览量的变化记录在计数的刷新时间中
+    last_modified = max(
+        update_time.timestamp(),
+        latest_comment.timestamp() if latest_comment else 0,
+        page_cache.last_modified(cache_scope),
+        view_counter.last_flush(),
+    )
+    return etag, last_modified
+
+
+def _render_detail_body(blog_id):
+    """
+    渲染详情页中与用户无关的部分（正文和第一页评论），点赞按钮均为未点赞状态
+    :param blog_id: 博客ID
+    :return: (博客标题, 使用CSRF占位符渲染的HTML)
+    """
+    # 修正查询方式，并使用正确的变量名
+    blog = Blog.objects.select_related('category', 'author', 'author__userprofile').get(pk=blog_id)
+
+    # 尚未预处理的旧博客在第一次访问时处理并保存，之后直接输出处理结果
+    if not blog.rendered_content and blog.content:
+        processed = rendering.process(blog.content)
+        Blog.objects.filter(pk=blog.pk).update(**processed)
+        for field, value in processed.items():
+            setattr(blog, field, value)
+
+    # 展示时加上尚未写回数据库的浏览量和尚未合并的点赞分片
+    blog.views_count += view_counter.pending_views(blog.id)
+    counters.apply_pending('blog', [blog])
+
+    # 只渲染第一页顶级评论及其最新几条回复，其余评论通过接口按需加载
+    comments, comments_next_cursor = load_comment_page(
+        blog, page_size=COMMENTS_PAGE_SIZE, preview_size=REPLY_PREVIEW_SIZE
+    )
+
+    context = {
+        'blog': blog,
+        'comments': comments,
+        'comments_count': blog.comments.count(),
+        'comments_next_cursor': comments_next_cursor,
+        'csrf_token': page_cache.CSRF_PLACEHOLDER,
+    }
+    return blog.title, render_to_string('blog_detail_body.html', context)
+
+
+@require_GET
+def like_state_api(request, blog_id) -> JsonResponse:
+    """
+    获取当前用户对博客及一组评论的点赞状态，用于覆盖共享缓存页面中的点赞按钮
+    :param request: 请求对象，comment_ids参数为逗号分隔的评论ID
+    :param blog_id: 博客ID
+    :return: JSON响应
+    """
     try:
-        # 修正查询方式，并使用正确的变量名
-        blog = Blog.objects.get(pk=blog_id)
+        comment_ids = [int(value) for value in request.GET.get('comment_ids', '').split(',') if value]
+    except ValueError:
+        return JsonResponse({'code': 400, 'msg': '评论ID格式错误'}, status=400)
+    if len(comment_ids) > LIKE_STATE_MAX_COMMENTS:
+        return JsonResponse({'code': 400, 'msg': f'一次最多查询{LIKE_STATE_MAX_COMMENTS}条评论'}, status=400)
+
+    blog_liked = False
+    liked_comment_ids = []
+    if request.user.is_authenticated:
+        blog_liked, liked_comment_ids = load_like_state(request.user, blog_id, comment_ids)
+
+    return JsonResponse({
+        'code': 200,
+        'msg': '获取成功',
+        'data': {
+            'blog_liked': blog_liked,
+            'liked_comment_ids': liked_comment_ids,
+        }
+    })
+
 
-        # 更新浏览量
-        blog.views_count += 1
-        blog.save()
+@require_GET
+@user_passes_test(lambda user: user.is_staff, login_url='author:login')
+def page_cache_stats(request) -> JsonResponse:
+    """
+    整页缓存的命中、未命中和失效次数，供监控使用（仅管理员可访问）
+    :param request: 请求对象
+    :return: JSON响应
+    """
+    return JsonResponse({'code': 200, 'msg': '获取成功', 'data': page_cache.stats()})
 
-        # 获取评论列表，包括回复
-        comments = BlogComment.objects.filter(blog=blog, parent_comment=None).order_by('-create_time')
 
-        # 准备上下文数据
-        context = {
-            'blog': blog,
-            'comments': comments,
+@require_GET
+def autocomplete_api(request) -> JsonResponse:
+    """
+    搜索框输入提示，从进程内的前缀索引中查询，不访问数据库
+    :param request: 请求对象，q为用户输入，limit为返回数量，type可以限定为blog、category、user
+    :return: JSON响应
+    """
+    kind = request.GET.get('type') or None
+    if kind is not None and kind not in autocomplete.KINDS:
+        return JsonResponse({'code': 400, 'msg': '提示类型错误'}, status=400)
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 8)), autocomplete.MAX_SUGGESTIONS))
+    except ValueError:
+        return JsonResponse({'code': 400, 'msg': '数量参数错误'}, status=400)
+
+    entries = autocomplete.get_index().lookup(request.GET.get('q', ''), limit=limit, kind=kind)
+    return JsonResponse({
+        'code': 200,
+        'msg': '获取成功',
+        'data': {
+            'suggestions': [
+                {'type': entry.kind, 'label': entry.label, 'url': autocomplete.entry_url(entry)}
+                for entry in entries
+            ]
         }
+    })
+
+def _serialize_comment(comment) -> dict:
+    """将评论序列化为字典，供评论分页接口使用"""
+    profile = getattr(comment.author, 'userprofile', None)
+    # 评论头像显示为36px，回复头像为24px
+    avatar_size = 24 if comment.parent_comment_id else 36
+    data = {
+        'id': comment.id,
+        'content': comment.content,
+        'create_time': comment.create_time.strftime('%Y年%m月%d日 %H:%M'),
+        'likes_count': comment.likes_count,
+        'is_liked': getattr(comment, 'is_liked', False),
+        'author': {
+            'id': comment.author.id,
+            'username': comment.author.username,
+            'url': reverse('author:user_page', kwargs={'user_id': comment.author.id}),
+            'avatar_url': profile.avatar_url(avatar_size) if profile and profile.avatar else None,
+            'avatar_srcset': profile.avatar_srcset(avatar_size) if profile else '',
+        },
+    }
+    if comment.parent_comment_id:
+        data['parent_id'] = comment.parent_comment_id
+        data['reply_to'] = comment.parent_comment.author.username
+    else:
+        data['reply_count'] = comment.reply_count
+        data['replies'] = [_serialize_comment(reply) for reply in comment.children]
+        data['replies_cursor'] = comment.replies_cursor
+    return data
 
-        # 如果用户已登录，获取点赞状态
-        if request.user.is_authenticated:
-            # 博客点赞状态
-            blog_is_liked = BlogLike.objects.filter(blog=blog, user=request.user).exists()
-            context['blog_is_liked'] = blog_is_liked
-
-            # 为每个评论和回复添加点赞状态属性
-            # 先获取所有评论的ID
-            all_comment_ids = []
-            def collect_comment_ids(comment_list):
-                for comment in comment_list:
-                    all_comment_ids.append(comment.id)
-                    if comment.replies.exists():
-                        collect_comment_ids(comment.replies.all())
-            collect_comment_ids(comments)
-
-            # 批量查询用户点赞的评论
-            user_liked_comments = set(CommentLike.objects.filter(
-                comment_id__in=all_comment_ids,
-                user=request.user
-            ).values_list('comment_id', flat=True))
-
-            # 为每个评论添加点赞状态属性
-            def add_like_status(comment_list):
-                for comment in comment_list:
-                    comment.is_liked = comment.id in user_liked_comments
-                    if comment.replies.exists():
-                        add_like_status(comment.replies.all())
-            add_like_status(comments)
 
+@require_GET
+def comment_list_api(request, blog_id) -> JsonResponse:
+    """
+    分页获取博客的顶级评论（附带最新几条回复）
+    :param request: 请求对象，支持cursor参数
+    :param blog_id: 博客ID
+    :return: JSON响应
+    """
+    try:
+        blog = Blog.objects.only('id').get(pk=blog_id)
+        comments, next_cursor = load_comment_page(
+            blog, request.user, request.GET.get('cursor'),
+            page_size=COMMENTS_PAGE_SIZE, preview_size=REPLY_PREVIEW_SIZE
+        )
     except Blog.DoesNotExist:
-        return HttpResponseBadRequest("博客不存在")
+        return JsonResponse({'code': 404, 'msg': '博客不存在'}, status=404)
+    except InvalidCursor:
+        return JsonResponse({'code': 400, 'msg': '无效的分页参数'}, status=400)
+
+    return JsonResponse({
+        'code': 200,
+        'msg': '获取成功',
+        'data': {
+            'comments': [_serialize_comment(comment) for comment in comments],
+            'next_cursor': next_cursor,
+        }
+    })
+
 
-    # 传递正确的变量名到模板
-    return render(request, 'blog_detail.html', context)
+@require_GET
+def comment_replies_api(request, comment_id) -> JsonResponse:
+    """
+    分页获取某条评论的回复
+    :param request: 请求对象，支持cursor参数
+    :param comment_id: 父评论ID
+    :return: JSON响应
+    """
+    try:
+        parent = BlogComment.objects.select_related('author').get(pk=comment_id)
+        replies, next_cursor = load_replies(parent, request.user, request.GET.get('cursor'), COMMENTS_PAGE_SIZE)
+    except BlogComment.DoesNotExist:
+        return JsonResponse({'code': 404, 'msg': '评论不存在'}, status=404)
+    except InvalidCursor:
+        return JsonResponse({'code': 400, 'msg': '无效的分页参数'}, status=400)
+
+    return JsonResponse({
+        'code': 200,
+        'msg': '获取成功',
+        'data': {
+            'replies': [_serialize_comment(reply) for reply in replies],
+            'next_cursor': next_cursor,
+        }
+    })
 
 @login_required(login_url='author:login')
 @require_http_methods(['GET', 'POST'])
@@ -244,40 +499,23 @@ def upload_image(request) -> JsonResponse:
         # 获取上传的文件
         file = request.FILES['image']
 
-        # 检查文件类型
-        allowed_extensions = ['jpg', 'jpeg', 'png', 'gif', 'webp']
-        file_extension = file.name.split('.')[-1].lower()
-        if file_extension not in allowed_extensions:
-            return JsonResponse({'code': 400, 'msg': '只允许上传jpg、jpeg、png、gif、webp格式的图片'})
-
         # 检查文件大小（限制为5MB）
         if file.size > 5 * 1024 * 1024:
             return JsonResponse({'code': 400, 'msg': '图片大小不能超过5MB'})
 
-        # 创建上传目录结构（按年月日）
-        today = datetime.now()
-        upload_dir = f'uploads/images/{today.year}/{today.month}/{today.day}'
-
-        # 生成唯一的文件名
-        unique_filename = f"{uuid.uuid4().hex}.{file_extension}"
-        file_path = f"{upload_dir}/{unique_filename}"
-
-        # 保存文件
-        with default_storage.open(file_path, 'wb+') as destination:
-            for chunk in file.chunks():
-                destination.write(chunk)
+        # 按文件头判断图片类型，不信任文件扩展名
+        file_extension = chunked_upload.sniff_image(file.read(16))
+        file.seek(0)
+        if file_extension is None:
+            return JsonResponse({'code': 400, 'msg': '只允许上传jpg、jpeg、png、gif、webp格式的图片'})
 
-        # 构建返回的URL
-        image_url = f"/{file_path}"
+        # 按内容摘要保存，相同的图片只保存一份；发布博客时才按正文引用计入引用次数
+        file_path = media_store.store(file, 'uploads/images', file_extension, acquire=False)
 
         # 返回成功响应
         return JsonResponse({
             'errno': 0,  # 0表示成功，非0表示失败
-            'data': {
-                'url': image_url,
-                'alt': file.name,
-                'href': image_url
-            }
+            'data': _uploaded_image_data(file_path, file.name)
         })
 
     except Exception as e:
@@ -285,6 +523,106 @@ def upload_image(request) -> JsonResponse:
         return JsonResponse({'code': 500, 'msg': f'上传失败: {str(e)}'})
 
 
+def _uploaded_image_data(file_path, alt) -> dict:
+    """
+    编辑器插入图片所需的数据
+    :param file_path: 图片在存储中的名称
+    :param alt: 图片的替代文本（原文件名）
+    """
+    image_url = default_storage.url(file_path)
+    data = {
+        'url': image_url,
+        'alt': alt,
+        'href': image_url
+    }
+
+    # 只读取图片头部得到尺寸，缩放和WebP派生图在后台线程池中生成，不阻塞上传请求；
+    # srcset只包含已经存在的派生图（重复上传的图片），发布时再按生成结果补充
+    size = rendering.image_size(file_path) if images.supports_derivatives(file_path) else None
+    if size:
+        items = images.existing_variants(file_path, size[0])
+        data.update({
+            'width': size[0],
+            'height': size[1],
+            'srcset': images.build_srcset(image_url, file_path, items),
+            'webp_srcset': images.build_srcset(image_url, file_path, items, webp=True),
+            'sizes': images.sizes_attr(),
+        })
+        images.schedule(file_path)
+    return data
+
+
+def _upload_error(error) -> JsonResponse:
+    data = {'offset': error.offset} if error.offset is not None else None
+    return JsonResponse({'code': error.status, 'msg': error.msg, 'data': data}, status=error.status)
+
+
+@login_required(login_url='author:login')
+@require_POST
+def chunked_upload_init(request) -> JsonResponse:
+    """
+    创建分片上传会话
+    :param request: 请求对象，POST参数size为文件总字节数，filename为原文件名
+    :return: 上传id、每个分片的最大字节数
+    """
+    try:
+        size = int(request.POST.get('size', ''))
+    except ValueError:
+        return JsonResponse({'code': 400, 'msg': '无效的文件大小'}, status=400)
+    try:
+        upload = chunked_upload.create(request.user, size, request.POST.get('filename', ''))
+    except chunked_upload.UploadError as e:
+        return _upload_error(e)
+    return JsonResponse({'code': 200, 'msg': 'ok', 'data': {
+        'upload_id': upload.id,
+        'offset': 0,
+        'chunk_size': chunked_upload.chunk_size(),
+    }})
+
+
+@login_required(login_url='author:login')
+@require_http_methods(['GET', 'PUT'])
+def chunked_upload_chunk(request, upload_id) -> JsonResponse:
+    """
+    GET查询已接收的字节数（续传时使用）；PUT上传一个分片，请求头Content-Range指定字节范围
+    请求体按缓冲区大小从流中读取并写入临时文件，不读取request.body
+    :param request: 请求对象
+    :param upload_id: 上传id
+    :return: 服务器已接收的字节数
+    """
+    try:
+        upload = chunked_upload.get(request.user, upload_id)
+        if request.method == 'PUT':
+            offset = chunked_upload.write_chunk(
+                upload,
+                request.headers.get('Content-Range'),
+                request,
+                int(request.headers.get('Content-Length') or 0),
+            )
+        else:
+            offset = upload.offset
+    except chunked_upload.UploadError as e:
+        return _upload_error(e)
+    return JsonResponse({'code': 200, 'msg': 'ok', 'data': {'offset': offset, 'size': upload.size}})
+
+
+@login_required(login_url='author:login')
+@require_POST
+def chunked_upload_finalize(request, upload_id) -> JsonResponse:
+    """
+    所有分片上传完成后校验图片类型并保存
+    :param request: 请求对象
+    :param upload_id: 上传id
+    :return: 与upload_image相同格式的图片数据
+    """
+    try:
+        upload = chunked_upload.get(request.user, upload_id)
+        file_path = chunked_upload.finalize(upload)
+    except chunked_upload.UploadError as e:
+        return _upload_error(e)
+    return JsonResponse({'errno': 0, 'data': _uploaded_image_data(file_path, upload.filename)})
+
+
 @require_POST
 @login_required(login_url='author:login')
 def pub_comment(request) -> HttpResponse:
@@ -326,78 +664,56 @@ def pub_comment(request) -> HttpResponse:
     except Exception as e:
         return HttpResponseBadRequest(f"评论失败: {str(e)}")
 
+def _get_post_param(request, name):
+    """从表单数据或JSON请求体中获取参数"""
+    value = request.POST.get(name)
+    if value is None and request.content_type == 'application/json':
+        try:
+            value = json.loads(request.body).get(name)
+        except (ValueError, AttributeError):
+            value = None
+    return value
+
+
+def _toggle_like_response(toggle, target_id, user, name) -> JsonResponse:
+    """调用点赞服务并返回统一格式的JSON响应"""
+    if not target_id:
+        return JsonResponse({'code': 400, 'msg': f'缺少{name}ID'})
+    try:
+        is_liked, likes_count = toggle(int(target_id), user)
+    except (TypeError, ValueError):
+        return JsonResponse({'code': 400, 'msg': f'{name}ID格式错误'})
+    except (Blog.DoesNotExist, BlogComment.DoesNotExist):
+        return JsonResponse({'code': 404, 'msg': f'{name}不存在'})
+
+    return JsonResponse({
+        'code': 200,
+        'msg': '操作成功',
+        'likes_count': likes_count,
+        'is_liked': is_liked
+    })
+
+
 @require_POST
 @login_required(login_url='author:login')
 def like_comment(request) -> JsonResponse:
     """
-    点赞评论
-    :param request: 请求对象
+    点赞/取消点赞评论
+    :param request: 请求对象，comment_id可以通过表单或JSON请求体传递
     :return: JSON响应
     """
-    comment_id = request.POST.get('comment_id')
-
-    if not comment_id:
-        return JsonResponse({'success': False, 'message': '评论ID不能为空'})
-
-    try:
-        comment = BlogComment.objects.get(pk=comment_id)
-
-        # 检查用户是否已经点赞
-        like, created = CommentLike.objects.get_or_create(comment=comment, user=request.user)
-
-        if created:
-            # 新增点赞
-            comment.likes_count += 1
-            comment.save()
-            return JsonResponse({'success': True, 'liked': True, 'likes_count': comment.likes_count})
-        else:
-            # 取消点赞
-            like.delete()
-            comment.likes_count = max(0, comment.likes_count - 1)
-            comment.save()
-            return JsonResponse({'success': True, 'liked': False, 'likes_count': comment.likes_count})
-
-    except BlogComment.DoesNotExist:
-        return JsonResponse({'success': False, 'message': '评论不存在'})
-    except Exception as e:
-        return JsonResponse({'success': False, 'message': str(e)})
+    return _toggle_like_response(toggle_comment_like, _get_post_param(request, 'comment_id'), request.user, '评论')
 
 
 @require_POST
 @login_required(login_url='author:login')
 def like_blog(request) -> JsonResponse:
     """
-    点赞博客
-    :param request: 请求对象
+    点赞/取消点赞博客
+    :param request: 请求对象，blog_id可以通过表单或JSON请求体传递
     :return: JSON响应
     """
-    blog_id = request.POST.get('blog_id')
-
-    if not blog_id:
-        return JsonResponse({'success': False, 'message': '博客ID不能为空'})
-
-    try:
-        blog = Blog.objects.get(pk=blog_id)
-
-        # 检查用户是否已经点赞
-        like, created = BlogLike.objects.get_or_create(blog=blog, user=request.user)
-
-        if created:
-            # 新增点赞
-            blog.likes_count += 1
-            blog.save()
-            return JsonResponse({'success': True, 'liked': True, 'likes_count': blog.likes_count})
-        else:
-            # 取消点赞
-            like.delete()
-            blog.likes_count = max(0, blog.likes_count - 1)
-            blog.save()
-            return JsonResponse({'success': True, 'liked': False, 'likes_count': blog.likes_count})
-
-    except Blog.DoesNotExist:
-        return JsonResponse({'success': False, 'message': '博客不存在'})
-    except Exception as e:
-        return JsonResponse({'success': False, 'message': str(e)})
+    return _toggle_like_response(toggle_blog_like, _get_post_param(request, 'blog_id'), request.user, '博客')
 
 @require_GET
 def search_blog(request) -> HttpResponse:
@@ -406,16 +722,37 @@ def search_blog(request) -> HttpResponse:
     :param request: 请求对象
     :return: 搜索结果页面
     """
-    # 获取搜索关键词
+    # 获取搜索关键词，如果没有关键词，显示所有博客
     keyword = request.GET.get('Q', '').strip()
+    sort_by = _search_sort(request, keyword)
 
-    if keyword:
-        # 使用Q对象进行多字段搜索
-        blogs = Blog.objects.filter(
-            Q(title__icontains=keyword) | Q(content__icontains=keyword)
-        ).order_by('-create_time')
-    else:
-        # 如果没有关键词，显示所有博客
-        blogs = Blog.objects.all().order_by('-create_time')
-
-    return render(request, 'index.html', {'blogs': blogs, 'keyword': keyword})
\ No newline at end of file
+    try:
+        if keyword:
+            # 通过倒排索引搜索，不再对正文做 icontains 全表扫描
+            blogs, next_cursor, total_blogs = _search_feed(keyword, sort_by, request.GET.get('cursor'))
+        else:
+            blogs, next_cursor = paginate_feed(_feed_queryset(), sort_by, request.GET.get('cursor'), FEED_PAGE_SIZE)
+            total_blogs = _total_blogs()
+    except InvalidCursor:
+        return HttpResponseBadRequest("无效的分页参数")
+    counters.apply_pending('blog', blogs)
+
+    context = {
+        'blogs': blogs,
+        'keyword': keyword,
+        'sort_by': sort_by,
+        'next_cursor': next_cursor,
+        'total_blogs': total_blogs,
+    }
+    return render(request, 'index.html', context)
+
+
+def serve_media(request, path, document_root=None, show_indexes=False) -> HttpResponse:
+    """
+    开发环境中提供媒体文件，按内容摘要命名的文件内容不会改变，设置长期缓存
+    生产环境由Web服务器提供媒体文件时，应对同样的路径设置 Cache-Control: immutable
+    """
+    response = static_serve(request, path, document_root=document_root, show_indexes=show_indexes)
+    if response.status_code == 200 and media_store.is_immutable(path):
+        response['Cache-Control'] = f'public, max-age={media_store.immutable_max_age()}, immutable'
+    return response
@@ -29,4 +29,74 @@ document.addEventListener('DOMContentLoaded', function() {
     if (mainContent) {
         mainContent.classList.add('fade-in');
     }
-});
\ No newline at end of file
+});
+// 搜索框输入提示：输入停顿后查询提示接口，点击提示直接跳转
+function initSearchSuggestions() {
+    const input = document.getElementById('search-input');
+    const menu = document.getElementById('search-suggestions');
+    if (!input || !menu) return;
+
+    const typeLabels = {blog: '博客', category: '分类', user: '作者'};
+    let timer = null;
+    let lastQuery = '';
+
+    function hideMenu() {
+        menu.classList.remove('show');
+        menu.innerHTML = '';
+    }
+
+    function renderSuggestions(suggestions) {
+        menu.innerHTML = '';
+        suggestions.forEach(item => {
+            const li = document.createElement('li');
+            const link = document.createElement('a');
+            link.className = 'dropdown-item d-flex justify-content-between';
+            link.href = item.url;
+
+            const label = document.createElement('span');
+            label.className = 'text-truncate';
+            label.textContent = item.label;
+            const type = document.createElement('small');
+            type.className = 'text-muted ms-2';
+            type.textContent = typeLabels[item.type] || '';
+
+            link.append(label, type);
+            li.appendChild(link);
+            menu.appendChild(li);
+        });
+        menu.classList.toggle('show', suggestions.length > 0);
+    }
+
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        const query = input.value.trim();
+        if (!query) {
+            lastQuery = '';
+            hideMenu();
+            return;
+        }
+        timer = setTimeout(() => {
+            lastQuery = query;
+            const params = new URLSearchParams({q: query});
+            fetch(`${input.dataset.autocompleteUrl}?${params.toString()}`)
+                .then(response => response.json())
+                .then(result => {
+                    // 忽略过期的响应
+                    if (query !== lastQuery || result.code !== 200) return;
+                    renderSuggestions(result.data.suggestions);
+                })
+                .catch(error => console.error('获取输入提示失败:', error));
+        }, 150);
+    });
+
+    input.addEventListener('keydown', function(e) {
+        if (e.key === 'Escape') hideMenu();
+    });
+
+    // 延迟隐藏，保证点击提示时链接能够生效
+    input.addEventListener('blur', function() {
+        setTimeout(hideMenu, 200);
+    });
+}
+
+document.addEventListener('DOMContentLoaded', initSearchSuggestions);
@@ -27,28 +27,29 @@ function updateReadingProgress() {
     progressBar.style.width = progress + '%';
 }
 
-// 回复功能
+// 回复功能（使用事件委托，动态加载的评论同样生效）
 function initReplyFunctionality() {
-    // 显示回复表单
-    document.querySelectorAll('.reply-btn').forEach(btn => {
-        btn.addEventListener('click', function() {
-            const commentId = this.getAttribute('data-comment-id');
+    document.addEventListener('click', function(e) {
+        // 显示回复表单
+        const replyBtn = e.target.closest('.reply-btn');
+        if (replyBtn) {
+            const commentId = replyBtn.getAttribute('data-comment-id');
             const replyForm = document.getElementById(`reply-form-${commentId}`);
             if (replyForm) {
                 replyForm.classList.toggle('hidden');
             }
-        });
-    });
+            return;
+        }
 
-    // 取消回复
-    document.querySelectorAll('.cancel-reply').forEach(btn => {
-        btn.addEventListener('click', function() {
-            const commentId = this.getAttribute('data-comment-id');
+        // 取消回复
+        const cancelBtn = e.target.closest('.cancel-reply');
+        if (cancelBtn) {
+            const commentId = cancelBtn.getAttribute('data-comment-id');
             const replyForm = document.getElementById(`reply-form-${commentId}`);
             if (replyForm) {
                 replyForm.classList.add('hidden');
             }
-        });
+        }
     });
 }
 
@@ -205,96 +206,338 @@ function initBlogLikeFunctionality() {
     });
 }
 
-// 评论点赞功能 - 刷新页面
+// 评论点赞功能 - 刷新页面（使用事件委托，动态加载的评论同样生效）
 function initCommentLikeFunctionality() {
-    // 获取所有评论点赞按钮
-    const likeButtons = document.querySelectorAll('.like-comment-btn');
+    document.addEventListener('click', function(e) {
+        const button = e.target.closest('.like-comment-btn');
+        if (!button) return;
 
-    likeButtons.forEach(button => {
-        button.addEventListener('click', function(e) {
-            e.preventDefault(); // 防止意外的默认行为
+        e.preventDefault(); // 防止意外的默认行为
 
-            // 获取评论ID
-            const commentId = this.dataset.commentId || this.getAttribute('data-comment-id');
+        // 获取评论ID
+        const commentId = button.dataset.commentId || button.getAttribute('data-comment-id');
+
+        // 增强的ID验证
+        if (!commentId || commentId.trim() === '' || isNaN(Number(commentId))) {
+            console.error('无效的评论ID:', commentId);
+            alert('无法获取评论信息，请刷新页面重试');
+            return;
+        }
+
+        // 将ID转换为数字
+        const numericCommentId = Number(commentId);
 
-            // 增强的ID验证
-            if (!commentId || commentId.trim() === '' || isNaN(Number(commentId))) {
-                console.error('无效的评论ID:', commentId);
-                alert('无法获取评论信息，请刷新页面重试');
+        try {
+            // 保存滚动位置
+            saveScrollPosition();
+
+            const xhr = new XMLHttpRequest();
+
+            // 设置请求
+            xhr.open('POST', '/blog/like-comment/', true);
+
+            // 获取并设置CSRF Token
+            const csrfToken = getCSRFToken();
+            if (!csrfToken) {
+                console.error('无法获取CSRF Token');
+                alert('无法完成操作，请刷新页面重试');
                 return;
             }
+            xhr.setRequestHeader('X-CSRFToken', csrfToken);
 
-            // 将ID转换为数字
-            const numericCommentId = Number(commentId);
+            // 响应处理
+            xhr.onreadystatechange = function() {
+                if (xhr.readyState === XMLHttpRequest.DONE) {
+                    try {
+                        // 请求完成后刷新页面
+                        window.location.reload();
+                    } catch (error) {
+                        console.error('处理评论点赞响应时发生异常:', error);
+                        alert('操作处理失败');
+                    }
+                }
+            };
 
-            try {
-                // 保存滚动位置
-                saveScrollPosition();
+            // 错误处理 - 仍然尝试刷新，因为点赞可能已成功
+            xhr.onerror = function() {
+                console.error('评论点赞网络请求错误');
+                // 即使出错也尝试刷新页面
+                window.location.reload();
+            };
 
-                const xhr = new XMLHttpRequest();
+            // 超时处理 - 仍然尝试刷新
+            xhr.ontimeout = function() {
+                console.error('评论点赞请求超时');
+                // 即使超时也尝试刷新页面
+                window.location.reload();
+            };
 
-                // 设置请求
-                xhr.open('POST', '/blog/like-comment/', true);
+            xhr.timeout = 10000; // 10秒超时
 
-                // 获取并设置CSRF Token
-                const csrfToken = getCSRFToken();
-                if (!csrfToken) {
-                    console.error('无法获取CSRF Token');
-                    alert('无法完成操作，请刷新页面重试');
+            // 发送请求
+            const formData = new FormData();
+            formData.append('comment_id', numericCommentId);
+            console.log('发送评论点赞请求数据:', { comment_id: numericCommentId });
+
+            xhr.send(formData);
+
+        } catch (error) {
+            console.error('发送评论点赞请求时发生错误:', error);
+            alert('请求处理失败');
+        }
+    });
+}
+
+// 转义HTML特殊字符，防止XSS
+function escapeHTML(text) {
+    const div = document.createElement('div');
+    div.textContent = text == null ? '' : String(text);
+    return div.innerHTML;
+}
+
+// 评论区配置（博客ID、评论提交地址、默认头像）
+function getCommentConfig() {
+    const list = document.getElementById('comment-list');
+    return list ? list.dataset : {};
+}
+
+// 头像HTML，与模板中的结构保持一致
+function buildAvatarHTML(author, size, defaultAvatar) {
+    const src = author.avatar_url || defaultAvatar;
+    const alt = author.avatar_url ? author.username : '默认头像';
+    const srcset = author.avatar_srcset ? ` srcset="${escapeHTML(author.avatar_srcset)}"` : '';
+    return `<a href="${escapeHTML(author.url)}">
+                <img src="${escapeHTML(src)}"${srcset} alt="${escapeHTML(alt)}" width="${size}" height="${size}" class="d-inline-block align-text-top rounded-circle">
+            </a>`;
+}
+
+// 点赞图标，与模板中的结构保持一致
+function buildLikeIconHTML(isLiked) {
+    if (isLiked) {
+        return `<svg width="14" height="14" viewBox="0 0 24 24" fill="#ff4d6d" xmlns="http://www.w3.org/2000/svg" class="mr-1 inline">
+                    <path d="M12 21.35l-1.45-1.32C5.4 15.36 2 12.28 2 8.5 2 5.42 4.42 3 7.5 3c1.74 0 3.41.81 4.5 2.09C13.09 3.81 14.76 3 16.5 3 19.58 3 22 5.42 22 8.5c0 3.78-3.4 6.86-8.55 11.54L12 21.35z"/>
+                </svg>`;
+    }
+    return `<svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="#999" stroke-width="2" stroke-linecap="round" stroke-linejoin="round" xmlns="http://www.w3.org/2000/svg" class="mr-1 inline">
+                <path d="M20.84 4.61a5.5 5.5 0 0 0-7.78 0L12 5.67l-1.06-1.06a5.5 5.5 0 0 0-7.78 7.78l1.06 1.06L12 21.23l7.78-7.78 1.06-1.06a5.5 5.5 0 0 0 0-7.78z"/>
+            </svg>`;
+}
+
+// 构建一条回复
+function buildReplyElement(reply, config) {
+    const element = document.createElement('div');
+    element.className = 'p-3 border-l-2 border-gray-200 bg-gray-50 rounded-r-lg';
+    element.innerHTML = `
+        <div class="flex justify-between items-start">
+            <div class="flex items-center">
+                ${buildAvatarHTML(reply.author, 24, config.defaultAvatar)}
+                <div class="ml-2">
+                    <div class="text-sm font-medium">${escapeHTML(reply.author.username)}</div>
+                    <div class="text-xs text-muted">${escapeHTML(reply.create_time)}</div>
+                </div>
+            </div>
+        </div>
+        <div class="mt-2">
+            <p class="text-sm">回复 @${escapeHTML(reply.reply_to)}: ${escapeHTML(reply.content)}</p>
+        </div>
+        <div class="mt-2 flex space-x-4">
+            <button class="text-xs text-gray-500 hover:text-blue-500 transition-colors reply-btn" data-comment-id="${reply.id}">
+                回复
+            </button>
+        </div>`;
+    return element;
+}
+
+// 构建一条顶级评论（包括回复表单和最新几条回复）
+function buildCommentElement(comment, config) {
+    const element = document.createElement('div');
+    element.className = 'p-4 border border-gray-100 rounded-xl shadow-sm hover:shadow-md transition-shadow';
+    const moreReplies = comment.reply_count > comment.replies.length
+        ? `<div class="mt-2 pl-12">
+               <button class="text-sm text-gray-500 hover:text-blue-500 transition-colors load-replies-btn"
+                       data-comment-id="${comment.id}"
+                       data-cursor="${escapeHTML(comment.replies_cursor || '')}"
+                       data-replies-url="/api/comment/${comment.id}/replies/">
+                   查看全部 ${comment.reply_count} 条回复
+               </button>
+           </div>`
+        : '';
+    element.innerHTML = `
+        <div class="d-flex justify-between items-start">
+            <div class="d-flex items-center">
+                ${buildAvatarHTML(comment.author, 36, config.defaultAvatar)}
+                <div class="ml-3">
+                    <div class="font-medium">${escapeHTML(comment.author.username)}</div>
+                    <div class="text-xs text-muted">${escapeHTML(comment.create_time)}</div>
+                </div>
+            </div>
+        </div>
+        <div class="mt-3 pl-12">
+            <p>${escapeHTML(comment.content)}</p>
+            <div class="mt-2 flex space-x-4">
+                <button class="text-sm hover:text-pink-500 transition-colors like-comment-btn" data-comment-id="${comment.id}">
+                    ${buildLikeIconHTML(comment.is_liked)}
+                    <span class="like-count">${comment.likes_count}</span>
+                </button>
+                <button class="text-sm text-gray-500 hover:text-blue-500 transition-colors reply-btn" data-comment-id="${comment.id}">
+                    回复
+                </button>
+            </div>
+            <div class="reply-form mt-3 hidden" id="reply-form-${comment.id}">
+                <form action="${escapeHTML(config.commentUrl)}" method="post" class="p-3 bg-gray-50 rounded-lg">
+                    <input type="hidden" name="csrfmiddlewaretoken" value="${escapeHTML(getCSRFToken() || '')}">
+                    <input type="hidden" name="blog_id" value="${escapeHTML(config.blogId)}">
+                    <input type="hidden" name="parent_id" value="${comment.id}">
+                    <textarea class="form-control form-control-sm" rows="2" placeholder="回复 @${escapeHTML(comment.author.username)}..." name="content" required></textarea>
+                    <div class="mt-2 text-end">
+                        <button type="button" class="btn btn-sm btn-outline-secondary mr-2 cancel-reply" data-comment-id="${comment.id}">取消</button>
+                        <button type="submit" class="btn btn-sm btn-primary">回复</button>
+                    </div>
+                </form>
+            </div>
+            <div class="mt-4 pl-12 space-y-4 replies-list${comment.replies.length ? '' : ' d-none'}" id="replies-${comment.id}"></div>
+            ${moreReplies}
+        </div>`;
+    const repliesList = element.querySelector('.replies-list');
+    comment.replies.forEach(reply => repliesList.appendChild(buildReplyElement(reply, config)));
+    return element;
+}
+
+// 加载更多顶级评论
+function initLoadMoreComments() {
+    const button = document.getElementById('load-more-comments');
+    const list = document.getElementById('comment-list');
+    if (!button || !list) return;
+
+    let loading = false;
+    button.addEventListener('click', function() {
+        if (loading || !button.dataset.cursor) return;
+        loading = true;
+
+        const params = new URLSearchParams({cursor: button.dataset.cursor});
+        fetch(`${button.dataset.commentsUrl}?${params.toString()}`)
+            .then(response => response.json())
+            .then(result => {
+                if (result.code !== 200) {
+                    console.error('加载评论失败:', result.msg);
                     return;
                 }
-                xhr.setRequestHeader('X-CSRFToken', csrfToken);
-
-                // 响应处理
-                xhr.onreadystatechange = function() {
-                    if (xhr.readyState === XMLHttpRequest.DONE) {
-                        try {
-                            // 请求完成后刷新页面
-                            window.location.reload();
-                        } catch (error) {
-                            console.error('处理评论点赞响应时发生异常:', error);
-                            alert('操作处理失败');
-                        }
-                    }
-                };
-
-                // 错误处理 - 仍然尝试刷新，因为点赞可能已成功
-                xhr.onerror = function() {
-                    console.error('评论点赞网络请求错误');
-                    // 即使出错也尝试刷新页面
-                    window.location.reload();
-                };
-
-                // 超时处理 - 仍然尝试刷新
-                xhr.ontimeout = function() {
-                    console.error('评论点赞请求超时');
-                    // 即使超时也尝试刷新页面
-                    window.location.reload();
-                };
-
-                xhr.timeout = 10000; // 10秒超时
-
-                // 发送请求
-                const formData = new FormData();
-                formData.append('comment_id', numericCommentId);
-                console.log('发送评论点赞请求数据:', { comment_id: numericCommentId });
-
-                xhr.send(formData);
-
-            } catch (error) {
-                console.error('发送评论点赞请求时发生错误:', error);
-                alert('请求处理失败');
-            }
-        });
+                const config = getCommentConfig();
+                result.data.comments.forEach(comment => {
+                    list.appendChild(buildCommentElement(comment, config));
+                });
+                if (result.data.next_cursor) {
+                    button.dataset.cursor = result.data.next_cursor;
+                } else {
+                    button.parentElement.remove();
+                }
+            })
+            .catch(error => console.error('加载评论请求错误:', error))
+            .finally(() => {
+                loading = false;
+            });
+    });
+}
+
+// 按需加载某条评论的剩余回复（使用事件委托，动态加载的评论同样生效）
+function initLoadReplies() {
+    document.addEventListener('click', function(e) {
+        const button = e.target.closest('.load-replies-btn');
+        if (!button || button.dataset.loading) return;
+        button.dataset.loading = '1';
+
+        const params = new URLSearchParams();
+        if (button.dataset.cursor) {
+            params.append('cursor', button.dataset.cursor);
+        }
+        fetch(`${button.dataset.repliesUrl}?${params.toString()}`)
+            .then(response => response.json())
+            .then(result => {
+                if (result.code !== 200) {
+                    console.error('加载回复失败:', result.msg);
+                    return;
+                }
+                const config = getCommentConfig();
+                const repliesList = document.getElementById(`replies-${button.dataset.commentId}`);
+                repliesList.classList.remove('d-none');
+                result.data.replies.forEach(reply => {
+                    repliesList.appendChild(buildReplyElement(reply, config));
+                });
+                if (result.data.next_cursor) {
+                    button.dataset.cursor = result.data.next_cursor;
+                    button.textContent = '加载更多回复';
+                } else {
+                    button.parentElement.remove();
+                }
+            })
+            .catch(error => console.error('加载回复请求错误:', error))
+            .finally(() => {
+                delete button.dataset.loading;
+            });
     });
 }
 
+// 博客点赞图标（24px），与模板中的结构保持一致
+function buildBlogLikeIconHTML(isLiked) {
+    if (isLiked) {
+        return `<svg width="24" height="24" viewBox="0 0 24 24" fill="#ff4d6d" xmlns="http://www.w3.org/2000/svg">
+                    <path d="M12 21.35l-1.45-1.32C5.4 15.36 2 12.28 2 8.5 2 5.42 4.42 3 7.5 3c1.74 0 3.41.81 4.5 2.09C13.09 3.81 14.76 3 16.5 3 19.58 3 22 5.42 22 8.5c0 3.78-3.4 6.86-8.55 11.54L12 21.35z"/>
+                </svg>`;
+    }
+    return `<svg width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="#999" stroke-width="2" stroke-linecap="round" stroke-linejoin="round" xmlns="http://www.w3.org/2000/svg">
+                <path d="M20.84 4.61a5.5 5.5 0 0 0-7.78 0L12 5.67l-1.06-1.06a5.5 5.5 0 0 0-7.78 7.78l1.06 1.06L12 21.23l7.78-7.78 1.06-1.06a5.5 5.5 0 0 0 0-7.78z"/>
+            </svg>`;
+}
+
+// 把评论点赞按钮的图标切换为指定状态
+function setCommentLikeIcon(button, isLiked) {
+    const icon = button.querySelector('svg');
+    if (icon) {
+        icon.outerHTML = buildLikeIconHTML(isLiked);
+    }
+}
+
+// 点赞状态覆盖：页面是所有用户共享的缓存，当前用户的点赞状态通过接口获取后再应用到按钮上
+function applyLikeOverlay() {
+    const overlay = document.getElementById('like-overlay');
+    if (!overlay) return;
+
+    const commentIds = Array.from(document.querySelectorAll('.like-comment-btn[data-comment-id]'))
+        .map(button => button.dataset.commentId);
+    const params = new URLSearchParams({comment_ids: commentIds.join(',')});
+
+    fetch(`${overlay.dataset.url}?${params.toString()}`)
+        .then(response => response.json())
+        .then(result => {
+            if (result.code !== 200) {
+                console.error('获取点赞状态失败:', result.msg);
+                return;
+            }
+            if (result.data.blog_liked) {
+                const likeIcon = document.querySelector('.like-button .like-icon');
+                if (likeIcon) {
+                    likeIcon.innerHTML = buildBlogLikeIconHTML(true);
+                }
+            }
+            const likedIds = new Set(result.data.liked_comment_ids.map(String));
+            document.querySelectorAll('.like-comment-btn[data-comment-id]').forEach(button => {
+                if (likedIds.has(button.dataset.commentId)) {
+                    setCommentLikeIcon(button, true);
+                }
+            });
+        })
+        .catch(error => console.error('获取点赞状态请求错误:', error));
+}
+
 // 页面加载完成后执行
 window.addEventListener('DOMContentLoaded', function() {
     highlightCode();
     initReplyFunctionality();
     initBlogLikeFunctionality();
     initCommentLikeFunctionality();
+    initLoadMoreComments();
+    initLoadReplies();
+    applyLikeOverlay();
     
     // 恢复滚动位置
     restoreScrollPosition();
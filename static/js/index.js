@@ -0,0 +1,88 @@
+// 转义HTML特殊字符，防止XSS
+function escapeHTML(text) {
+    const div = document.createElement('div');
+    div.textContent = text == null ? '' : String(text);
+    return div.innerHTML;
+}
+
+// 根据接口返回的数据构建博客卡片，结构与index.html中的卡片保持一致
+// 搜索结果的snippet是服务端转义并高亮过的HTML，直接插入
+function buildBlogCard(blog, defaultAvatar) {
+    const col = document.createElement('div');
+    col.className = 'col';
+
+    const avatar = blog.author.avatar_url
+        ? `<a href="${escapeHTML(blog.author.url)}">
+               <img src="${escapeHTML(blog.author.avatar_url)}" srcset="${escapeHTML(blog.author.avatar_srcset || '')}" alt="" width="32" height="32" class="d-inline-block align-text-top rounded-circle">
+           </a>`
+        : `<img src="${escapeHTML(defaultAvatar)}" alt="默认头像" width="32" height="32" class="d-inline-block align-text-top rounded-circle">`;
+
+    col.innerHTML = `
+        <div class="card h-100 fade-in">
+            <div class="card-header">
+                <a href="${escapeHTML(blog.url)}" class="text-white hover:text-pink-200">${escapeHTML(blog.title)}</a>
+            </div>
+            <div class="card-body">
+                <p class="card-text text-muted">${blog.snippet || escapeHTML(blog.excerpt)}</p>
+            </div>
+            <div class="card-footer text-body-secondary">
+                <div class="d-flex justify-content-between items-center">
+                    <div class="d-flex align-items-center">
+                        ${avatar}
+                        <span class="ms-2 text-secondary">${escapeHTML(blog.author.username)}</span>
+                    </div>
+                    <div class="text-sm">${escapeHTML(blog.create_time)}</div>
+                </div>
+            </div>
+        </div>`;
+    return col;
+}
+
+// 加载更多：使用游标分页接口追加博客卡片，没有JS时按钮退化为普通的翻页链接
+function initLoadMore() {
+    const button = document.getElementById('load-more-btn');
+    const list = document.getElementById('blog-list');
+    if (!button || !list) return;
+
+    let loading = false;
+
+    button.addEventListener('click', function(e) {
+        e.preventDefault();
+        if (loading || !button.dataset.cursor) return;
+        loading = true;
+
+        const params = new URLSearchParams({
+            sort_by: button.dataset.sortBy,
+            cursor: button.dataset.cursor
+        });
+        if (button.dataset.keyword) {
+            params.append('Q', button.dataset.keyword);
+        }
+
+        fetch(`${button.dataset.feedUrl}?${params.toString()}`, {
+            headers: {'X-Requested-With': 'XMLHttpRequest'}
+        })
+            .then(response => response.json())
+            .then(result => {
+                if (result.code !== 200) {
+                    console.error('加载博客失败:', result.msg);
+                    return;
+                }
+                result.data.blogs.forEach(blog => {
+                    list.appendChild(buildBlogCard(blog, button.dataset.defaultAvatar));
+                });
+                if (result.data.next_cursor) {
+                    button.dataset.cursor = result.data.next_cursor;
+                } else {
+                    // 没有更多数据时隐藏按钮
+                    button.parentElement.remove();
+                }
+            })
+            .catch(error => console.error('加载博客请求错误:', error))
+            .finally(() => {
+                loading = false;
+            });
+    });
+}
+
+document.addEventListener('DOMContentLoaded', initLoadMore);
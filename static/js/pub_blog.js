@@ -3,6 +3,70 @@ window.onload = function () {
     const { createEditor, createToolbar } = window.wangEditor;
     let editor = null;
     
+    const csrfToken = document.querySelector('input[name="csrfmiddlewaretoken"]').value;
+    const UPLOAD_RETRIES = 5;
+
+    async function uploadRequest(url, options) {
+        const response = await fetch(url, {
+            ...options,
+            headers: { 'X-CSRFToken': csrfToken, ...(options.headers || {}) }
+        });
+        const res = await response.json();
+        return { status: response.status, res };
+    }
+
+    // 分片上传图片：创建上传 -> 逐个PUT字节范围 -> 完成
+    async function chunkedUpload(file) {
+        const form = new FormData();
+        form.append('size', file.size);
+        form.append('filename', file.name);
+        const init = await uploadRequest('/api/uploads/', { method: 'POST', body: form });
+        if (init.res.code !== 200) {
+            throw new Error(init.res.msg);
+        }
+        const { upload_id: uploadId, chunk_size: chunkSize } = init.res.data;
+        const chunkUrl = `/api/uploads/${uploadId}/`;
+
+        let offset = 0;
+        let failures = 0;
+        while (offset < file.size) {
+            const end = Math.min(offset + chunkSize, file.size) - 1;
+            try {
+                const { res } = await uploadRequest(chunkUrl, {
+                    method: 'PUT',
+                    headers: { 'Content-Range': `bytes ${offset}-${end}/${file.size}` },
+                    body: file.slice(offset, end + 1)
+                });
+                if (res.code === 200) {
+                    failures = 0;
+                } else if (!res.data || res.data.offset === undefined || ++failures > UPLOAD_RETRIES) {
+                    throw new Error(res.msg);
+                }
+                // 不连续或数据不完整时，服务器同样返回已接收的字节数，从该位置继续
+                offset = res.data.offset;
+            } catch (error) {
+                if (error instanceof TypeError && ++failures <= UPLOAD_RETRIES) {
+                    // 网络错误：等待后向服务器查询已接收的位置再继续
+                    await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+                    try {
+                        const { res } = await uploadRequest(chunkUrl, { method: 'GET' });
+                        offset = res.data.offset;
+                    } catch (ignored) {
+                        // 下一轮重试
+                    }
+                    continue;
+                }
+                throw error;
+            }
+        }
+
+        const done = await uploadRequest(`${chunkUrl}finalize/`, { method: 'POST' });
+        if (done.res.errno !== 0) {
+            throw new Error(done.res.msg);
+        }
+        return done.res.data;
+    }
+
     // 初始化富文本编辑器
     function initEditor() {
         const editorConfig = {
@@ -15,25 +79,16 @@ window.onload = function () {
             // 配置上传图片的功能
             MENU_CONF: {
                 uploadImage: {
-                    server: '/api/upload-image/', // 图片上传接口
-                    timeout: 5000, // 5秒超时
-                    fieldName: 'image',
-                    metaWithUrl: true,
-                    // 自定义上传参数
-                    meta: {
-                        csrfmiddlewaretoken: document.querySelector('input[name="csrfmiddlewaretoken"]').value
-                    },
-                    // 上传成功回调
-                    onSuccess(file, res) {
-                        editor.insertText(' '); // 在图片前插入一个空格
-                        editor.insertImage(res.data.url); // 插入图片
-                        editor.insertText(' '); // 在图片后插入一个空格
-                        return false; // 阻止默认行为
-                    },
-                    // 上传失败回调
-                    onFailed(file, res) {
-                        alert('上传图片失败: ' + (res.msg || '未知错误'));
-                        return false;
+                    // 分片上传：网络中断后从服务器已接收的位置继续，而不是重新上传整个文件
+                    async customUpload(file, insertFn) {
+                        try {
+                            const data = await chunkedUpload(file);
+                            editor.insertText(' '); // 在图片前插入一个空格
+                            insertFn(data.url, data.alt, data.href); // 插入图片
+                            editor.insertText(' '); // 在图片后插入一个空格
+                        } catch (error) {
+                            alert('上传图片失败: ' + (error.message || '未知错误'));
+                        }
                     }
                 }
             }